@@ -16,6 +16,15 @@ class GitHubTrendingApp {
     this.currentSearch = "";
     this.currentSort = "stars";
 
+    // 分片模式：清单及已加载的分片（文件名 -> 解码后的项目列表）
+    this.manifest = null;
+    this.shardCache = {};
+    this.pageData = null;
+
+    // 预先计算的搜索索引及由其得到的各排序方式下的名次
+    this.searchIndex = null;
+    this.searchRanks = null;
+
     this.init();
   }
 
@@ -148,9 +157,23 @@ class GitHubTrendingApp {
     this.showLoadingState();
 
     try {
-      // 尝试加载处理后的数据文件
       const timestamp = forceRefresh ? `?t=${Date.now()}` : "";
-      let response = await fetch(`data/processed_trending.json${timestamp}`);
+
+      // 优先使用分片：只加载清单和当前页
+      if (await this.loadManifest(timestamp)) {
+        this.hideErrorState();
+        await this.renderShards();
+        this.loadSearchIndex(timestamp);
+        return;
+      }
+
+      // 其次是紧凑载荷，再次是处理后的数据文件
+      let response = await fetch(`data/processed_trending.min.json${timestamp}`);
+
+      if (!response.ok) {
+        console.warn("紧凑载荷不存在，尝试加载处理后的数据...");
+        response = await fetch(`data/processed_trending.json${timestamp}`);
+      }
 
       // 如果处理后的数据不存在，尝试加载原始数据
       if (!response.ok) {
@@ -168,18 +191,232 @@ class GitHubTrendingApp {
       this.data = this.processDataFormat(rawData);
       this.hideErrorState();
       this.render();
+      // 首屏按星标排序无需索引，渲染后再在后台加载
+      this.loadSearchIndex(timestamp);
     } catch (error) {
       console.error("数据加载失败:", error);
       this.showErrorState();
     }
   }
 
+  /**
+   * 加载分片清单
+   *
+   * @returns {Promise<boolean>} 清单是否可用
+   */
+  async loadManifest(timestamp) {
+    try {
+      const response = await fetch(`data/shards/manifest.json${timestamp}`);
+      if (!response.ok) {
+        return false;
+      }
+      this.manifest = await response.json();
+    } catch (error) {
+      console.warn("分片清单加载失败，改为加载完整数据:", error);
+      this.manifest = null;
+      return false;
+    }
+
+    // 分片内容随清单更新，以处理时间作为缓存版本
+    this.shardVersion = encodeURIComponent(
+      this.manifest.metadata.processed_at || this.manifest.metadata.last_updated || ""
+    );
+    this.shardCache = {};
+    this.itemsPerPage = this.manifest.page_size || this.itemsPerPage;
+    this.data = {
+      metadata: this.manifest.metadata,
+      repositories: [],
+      languages: this.manifest.languages.map((scope) => scope.name),
+    };
+    return true;
+  }
+
+  /**
+   * 当前语言筛选对应的分片范围
+   */
+  currentScope() {
+    if (!this.currentLanguage) {
+      return this.manifest.all;
+    }
+    return (
+      this.manifest.languages.find(
+        (scope) => scope.name === this.currentLanguage
+      ) || { count: 0, pages: 0, files: [], stars: 0, current_period_stars: 0, language_count: 0 }
+    );
+  }
+
+  /**
+   * 加载单个分片（已加载的直接复用）
+   */
+  async loadShard(file) {
+    if (!this.shardCache[file]) {
+      const response = await fetch(`data/shards/${file}?v=${this.shardVersion}`);
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+      this.shardCache[file] = this.decodePayload(await response.json()).repositories;
+    }
+    return this.shardCache[file];
+  }
+
+  /**
+   * 分片模式下渲染
+   *
+   * 按星标排序且未搜索时只加载当前页的分片；搜索或按其他方式排序时
+   * 需要当前范围内的全部项目，加载该范围的所有分片后按完整数据的方式处理
+   */
+  async renderShards() {
+    const scope = this.currentScope();
+
+    try {
+      if (this.currentSearch || this.currentSort !== "stars") {
+        // 索引中的下标对应全部项目的顺序，有索引时加载全部分片再由索引筛选
+        const files = this.searchIndex ? this.manifest.all.files : scope.files;
+        const pages = await Promise.all(files.map((file) => this.loadShard(file)));
+        this.pageData = null;
+        this.data.repositories = pages.flat();
+        this.render();
+        return;
+      }
+
+      const file = scope.files[this.currentPage - 1];
+      this.pageData = file ? await this.loadShard(file) : [];
+      this.filteredData = [];
+      this.updateStats();
+      this.updateLanguageFilter();
+      this.renderProjects();
+      this.updatePagination();
+      this.updateLastUpdated();
+      this.hideLoadingState();
+    } catch (error) {
+      console.error("分片加载失败:", error);
+      this.showErrorState();
+    }
+  }
+
+  /**
+   * 当前筛选结果的项目总数
+   */
+  totalItems() {
+    return this.pageData ? this.currentScope().count : this.filteredData.length;
+  }
+
+  /**
+   * 加载搜索索引（索引不存在或加载失败时退回逐条扫描）
+   */
+  async loadSearchIndex(timestamp = "") {
+    try {
+      const response = await fetch(`data/processed_trending.index.json${timestamp}`);
+      if (!response.ok) {
+        return;
+      }
+      const index = await response.json();
+
+      // 由各排序方式下的顺序得到每条记录的名次，排序结果时只需比较名次
+      const ranks = {};
+      Object.entries(index.orders).forEach(([name, order]) => {
+        const rank = new Int32Array(index.count);
+        order.forEach((id, position) => {
+          rank[id] = position;
+        });
+        ranks[name] = rank;
+      });
+
+      this.searchIndex = index;
+      this.searchRanks = ranks;
+    } catch (error) {
+      console.warn("搜索索引加载失败，使用逐条筛选:", error);
+    }
+  }
+
+  /**
+   * 搜索索引是否与当前数据对应
+   */
+  canUseSearchIndex() {
+    const index = this.searchIndex;
+    if (!index || !this.data) {
+      return false;
+    }
+    const processedAt = (this.data.metadata && this.data.metadata.processed_at) || null;
+    return (
+      index.count === this.data.repositories.length &&
+      (index.processed_at || null) === processedAt
+    );
+  }
+
+  /**
+   * 将文本切分为小写词项（与生成索引时的分词规则一致）
+   */
+  tokenize(text) {
+    return (text || "").toLowerCase().match(/[\p{L}\p{N}]+/gu) || [];
+  }
+
+  /**
+   * 查找以 prefix 开头的所有词项对应的记录
+   *
+   * 词项按字典序排列，二分查找前缀范围的起点
+   */
+  matchPrefix(prefix) {
+    const terms = this.searchIndex.terms;
+    let low = 0;
+    let high = terms.length;
+    while (low < high) {
+      const mid = (low + high) >> 1;
+      if (terms[mid] < prefix) {
+        low = mid + 1;
+      } else {
+        high = mid;
+      }
+    }
+
+    const ids = new Set();
+    for (let i = low; i < terms.length && terms[i].startsWith(prefix); i++) {
+      this.searchIndex.postings[i].forEach((id) => ids.add(id));
+    }
+    return ids;
+  }
+
+  /**
+   * 使用搜索索引筛选和排序，开销只与结果数量有关
+   */
+  queryIndex() {
+    const index = this.searchIndex;
+    let ids = null;
+
+    if (this.currentLanguage) {
+      ids = new Set(index.languages[this.currentLanguage] || []);
+    }
+
+    // 每个搜索词按前缀匹配，多个词之间取交集
+    this.tokenize(this.currentSearch).forEach((term) => {
+      const matches = this.matchPrefix(term);
+      if (ids === null) {
+        ids = matches;
+      } else {
+        ids = new Set([...ids].filter((id) => matches.has(id)));
+      }
+    });
+
+    const sortKey = index.orders[this.currentSort] ? this.currentSort : "stars";
+    let ordered;
+    if (ids === null) {
+      ordered = index.orders[sortKey];
+    } else {
+      const rank = this.searchRanks[sortKey];
+      ordered = [...ids].sort((a, b) => rank[a] - rank[b]);
+    }
+    return ordered.map((id) => this.data.repositories[id]);
+  }
+
   /**
    * 处理数据格式兼容性
    */
   processDataFormat(rawData) {
     // 检查数据格式
-    if (rawData.metadata && rawData.repositories) {
+    if (rawData.rows && rawData.fields) {
+      // 紧凑载荷格式
+      return this.decodePayload(rawData);
+    } else if (rawData.metadata && rawData.repositories) {
       // 已经是处理后的格式
       return rawData;
     } else if (Array.isArray(rawData)) {
@@ -206,11 +443,59 @@ class GitHubTrendingApp {
     }
   }
 
+  /**
+   * 解码紧凑载荷
+   *
+   * 记录为按 fields 顺序排列的数组，语言和颜色按下标引用，
+   * full_name、*_text、language_color 等派生字段在此计算
+   */
+  decodePayload(payload) {
+    const column = {};
+    payload.fields.forEach((field, index) => {
+      column[field] = index;
+    });
+
+    const repositories = payload.rows.map((row) => {
+      const author = row[column.author];
+      const name = row[column.name];
+      const languageIndex = row[column.language];
+      const stars = row[column.stars];
+      const forks = row[column.forks];
+      const currentPeriodStars = row[column.current_period_stars];
+
+      return {
+        author,
+        name,
+        full_name: `${author}/${name}`,
+        url: row[column.url] || `https://github.com/${author}/${name}`,
+        description: row[column.description],
+        language: payload.languages[languageIndex],
+        stars,
+        forks,
+        current_period_stars: currentPeriodStars,
+        stars_text: this.formatNumber(stars),
+        forks_text: this.formatNumber(forks),
+        trending_stars_text: this.formatNumber(currentPeriodStars),
+        language_color: payload.colors[languageIndex],
+      };
+    });
+
+    return {
+      metadata: payload.metadata,
+      repositories,
+      languages: payload.language_filter || payload.languages,
+    };
+  }
+
   /**
    * 筛选和渲染数据
    */
   filterAndRender() {
     this.currentPage = 1;
+    if (this.manifest) {
+      this.renderShards();
+      return;
+    }
     this.filterData();
     this.render();
   }
@@ -219,6 +504,11 @@ class GitHubTrendingApp {
    * 排序和渲染数据
    */
   sortAndRender() {
+    if (this.manifest) {
+      this.currentPage = 1;
+      this.renderShards();
+      return;
+    }
     this.sortData();
     this.renderProjects();
   }
@@ -229,6 +519,11 @@ class GitHubTrendingApp {
   filterData() {
     if (!this.data) return;
 
+    if (this.canUseSearchIndex()) {
+      this.filteredData = this.queryIndex();
+      return;
+    }
+
     this.filteredData = this.data.repositories.filter((repo) => {
       // 语言筛选
       if (this.currentLanguage && repo.language !== this.currentLanguage) {
@@ -257,6 +552,11 @@ class GitHubTrendingApp {
   sortData() {
     if (!this.filteredData.length) return;
 
+    if (this.canUseSearchIndex()) {
+      this.filteredData = this.queryIndex();
+      return;
+    }
+
     this.filteredData.sort((a, b) => {
       switch (this.currentSort) {
         case "stars":
@@ -293,18 +593,25 @@ class GitHubTrendingApp {
    * 更新统计信息
    */
   updateStats() {
-    const totalProjects = this.filteredData.length;
-    const totalStars = this.filteredData.reduce(
-      (sum, repo) => sum + repo.stars,
-      0
-    );
-    const languageCount = new Set(
-      this.filteredData.map((repo) => repo.language)
-    ).size;
-    const trendingStars = this.filteredData.reduce(
-      (sum, repo) => sum + repo.current_period_stars,
-      0
-    );
+    let totalProjects, totalStars, languageCount, trendingStars;
+
+    if (this.pageData) {
+      // 分片模式下只加载了当前页，使用清单中预先汇总的统计
+      const scope = this.currentScope();
+      totalProjects = scope.count;
+      totalStars = scope.stars;
+      languageCount = scope.language_count;
+      trendingStars = scope.current_period_stars;
+    } else {
+      totalProjects = this.filteredData.length;
+      totalStars = this.filteredData.reduce((sum, repo) => sum + repo.stars, 0);
+      languageCount = new Set(this.filteredData.map((repo) => repo.language))
+        .size;
+      trendingStars = this.filteredData.reduce(
+        (sum, repo) => sum + repo.current_period_stars,
+        0
+      );
+    }
 
     document.getElementById("totalProjects").textContent =
       this.formatNumber(totalProjects);
@@ -342,6 +649,7 @@ class GitHubTrendingApp {
       option.textContent = language;
       languageFilter.appendChild(option);
     });
+    languageFilter.value = this.currentLanguage;
   }
 
   /**
@@ -351,7 +659,7 @@ class GitHubTrendingApp {
     const projectsGrid = document.getElementById("projectsGrid");
     const emptyState = document.getElementById("emptyState");
 
-    if (this.filteredData.length === 0) {
+    if (this.totalItems() === 0) {
       projectsGrid.style.display = "none";
       emptyState.style.display = "block";
       return;
@@ -360,10 +668,11 @@ class GitHubTrendingApp {
     emptyState.style.display = "none";
     projectsGrid.style.display = "grid";
 
-    // 计算分页数据
+    // 计算分页数据（分片模式下当前页已单独加载）
     const startIndex = (this.currentPage - 1) * this.itemsPerPage;
     const endIndex = startIndex + this.itemsPerPage;
-    const pageData = this.filteredData.slice(startIndex, endIndex);
+    const pageData =
+      this.pageData || this.filteredData.slice(startIndex, endIndex);
 
     // 生成项目卡片HTML
     projectsGrid.innerHTML = pageData
@@ -443,7 +752,7 @@ class GitHubTrendingApp {
     const nextBtn = document.getElementById("nextPage");
     const pageInfo = document.getElementById("pageInfo");
 
-    const totalPages = Math.ceil(this.filteredData.length / this.itemsPerPage);
+    const totalPages = Math.ceil(this.totalItems() / this.itemsPerPage);
 
     if (totalPages <= 1) {
       pagination.style.display = "none";
@@ -463,9 +772,7 @@ class GitHubTrendingApp {
   previousPage() {
     if (this.currentPage > 1) {
       this.currentPage--;
-      this.renderProjects();
-      this.updatePagination();
-      this.scrollToTop();
+      this.showPage();
     }
   }
 
@@ -473,13 +780,24 @@ class GitHubTrendingApp {
    * 下一页
    */
   nextPage() {
-    const totalPages = Math.ceil(this.filteredData.length / this.itemsPerPage);
+    const totalPages = Math.ceil(this.totalItems() / this.itemsPerPage);
     if (this.currentPage < totalPages) {
       this.currentPage++;
+      this.showPage();
+    }
+  }
+
+  /**
+   * 显示当前页（分片模式下按需加载该页的分片）
+   */
+  async showPage() {
+    if (this.pageData) {
+      await this.renderShards();
+    } else {
       this.renderProjects();
       this.updatePagination();
-      this.scrollToTop();
     }
+    this.scrollToTop();
   }
 
   /**
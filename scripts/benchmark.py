@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据流水线性能测试
+
+功能：按 get_mock_data 的数据结构生成指定规模（如 100 / 1万 / 100万 条）的仓库数据，
+      测量获取、处理、清理各阶段核心函数的耗时、吞吐量和峰值内存，
+      并与保存的基准结果比较，耗时超出阈值时报告性能退化：
+
+    python benchmark.py                                  # 默认规模 100、10000
+    python benchmark.py --sizes 100 10000 1000000        # 包含100万条
+    python benchmark.py --cases merge_data process_data  # 只测部分用例
+    python benchmark.py --save-baseline                  # 把本次结果保存为基准
+
+每个用例在独立的子进程中运行，峰值内存（RSS）互不影响；
+fetch 用例启动本地模拟API服务（mock_server.py），端到端测量 fetch_trending_repositories。
+基准结果与机器相关，更换运行环境后应重新保存。
+"""
+
+import json
+import logging
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from multiprocessing import get_context
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows没有resource模块，不统计峰值内存
+    resource = None
+
+from cleanup_data import DataCleanup
+from fetch_trending import GitHubTrendingFetcher
+from mock_server import LANGUAGES, MockTrendingServer
+from process_data import GitHubDataProcessor
+from repo_index import SORTED_BY
+from repo_record import load_records
+from storage import JSONStorage
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+DEFAULT_SIZES = [100, 10000]
+DEFAULT_REPEAT = 5
+# 最短耗时超过基准的比例视为性能退化（最短耗时受机器负载干扰最小）
+DEFAULT_THRESHOLD = 0.2
+# 与基准相差不足此秒数时不视为退化（小规模用例的计时噪声）
+MIN_REGRESSION_SECONDS = 0.005
+
+# fetch 用例的查询（每个查询返回 size 条记录）
+FETCH_QUERIES = [(language, "weekly") for language in LANGUAGES]
+# fetch 用例单个响应的记录数上限（更大的规模没有实际意义）
+FETCH_MAX_SIZE = 100000
+
+# 与 get_mock_data 相同的项目描述模板
+DESCRIPTIONS = [
+    "{name} is an open-source project for developers",
+    "A powerful {language} library for building amazing applications",
+    "The official {name} repository with latest features and updates",
+    "{name}: Modern solution for {language} development",
+    "Open source {name} project maintained by {author}"
+]
+
+
+def generate_repositories(count: int, seed: int = 0, now: Optional[datetime] = None) -> List[Dict]:
+    """
+    生成确定性的仓库数据（字段与 GitHubTrendingFetcher.get_mock_data 相同，另带出现时间戳）
+
+    last_seen 分布在最近60天内，约一半记录会被30天的清理规则淘汰。
+
+    Args:
+        count: 记录数
+        seed: 随机种子（相同种子生成相同数据）
+        now: 时间戳的参考时间
+
+    Returns:
+        仓库数据列表
+    """
+    rng = random.Random(seed)
+    now = now or datetime.now()
+    repositories = []
+    for i in range(count):
+        author = f"author{rng.randint(1, max(count // 4, 1))}"
+        name = f"project{seed}-{i}"
+        language = rng.choice(LANGUAGES)
+        stars = rng.randint(10000, 250000)
+        last_seen = now - timedelta(seconds=rng.randint(0, 60 * 86400))
+        first_seen = last_seen - timedelta(seconds=rng.randint(0, 30 * 86400))
+        repositories.append({
+            "author": author,
+            "name": name,
+            "full_name": f"{author}/{name}",
+            "url": f"https://github.com/{author}/{name}",
+            "description": rng.choice(DESCRIPTIONS).format(name=name.capitalize(), language=language, author=author),
+            "language": language,
+            "stars": stars,
+            "forks": max(int(stars * rng.uniform(0.1, 0.3)), 100),
+            "currentPeriodStars": rng.randint(10, 500),
+            "builtBy": [{"username": f"dev{rng.randint(1, 50)}", "href": "https://github.com/dev"}],
+            "first_seen": first_seen.isoformat(),
+            "last_seen": last_seen.isoformat(),
+            "seen_count": rng.randint(1, 20)
+        })
+    return repositories
+
+
+def generate_dataset(count: int, seed: int = 0) -> Dict:
+    """生成 trending.json 格式的数据集（与获取脚本写出的一样按 last_seen 从新到旧排列）"""
+    repositories = sorted(generate_repositories(count, seed), key=lambda repo: repo["last_seen"], reverse=True)
+    return {
+        "metadata": {
+            "last_updated": datetime.now().isoformat(),
+            "count": count,
+            "source": "GitHub Trending API",
+            "sorted_by": SORTED_BY
+        },
+        "repositories": repositories
+    }
+
+
+def generate_fetch_batch(existing: List[Dict], count: int, seed: int = 1) -> List[Dict]:
+    """生成一次获取的新数据：一半为已有项目（统计数据变化），一半为新项目"""
+    rng = random.Random(seed)
+    overlap = min(count // 2, len(existing))
+    batch = []
+    for repo in rng.sample(existing, overlap):
+        repo = {key: value for key, value in repo.items() if key not in ("first_seen", "last_seen", "seen_count")}
+        repo["stars"] += rng.randint(0, 1000)
+        batch.append(repo)
+    for repo in generate_repositories(count - overlap, seed=seed + 1000):
+        for key in ("first_seen", "last_seen", "seen_count"):
+            del repo[key]
+        batch.append(repo)
+    rng.shuffle(batch)
+    return batch
+
+
+def _copy_dataset(dataset: Dict) -> Dict:
+    """复制数据集（被测函数会原地修改记录，每轮使用新的副本）"""
+    return load_records({
+        "metadata": dict(dataset["metadata"]),
+        "repositories": [dict(repo) for repo in dataset["repositories"]]
+    })
+
+
+def _time_runs(setup: Callable[[], Any], body: Callable[[Any], Any], repeat: int) -> List[float]:
+    """执行 repeat 轮，每轮先调用 setup（不计时），再计时执行 body"""
+    timings = []
+    for _ in range(repeat):
+        state = setup()
+        start = time.perf_counter()
+        body(state)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def bench_merge_data(size: int, workdir: str, repeat: int) -> Dict:
+    """合并：现有 size 条记录 + 新获取 size/10 条（一半重复）"""
+    dataset = generate_dataset(size)
+    batch = generate_fetch_batch(dataset["repositories"], max(size // 10, 1))
+
+    def setup():
+        return GitHubTrendingFetcher(storage=JSONStorage()), _copy_dataset(dataset), [dict(r) for r in batch]
+
+    timings = _time_runs(setup, lambda s: s[0].merge_data(s[2], s[1], max_total=size, upsert=True), repeat)
+    return {"timings": timings, "records": size}
+
+
+def bench_remove_duplicates(size: int, workdir: str, repeat: int) -> Dict:
+    """去重：对 size 条现有记录过滤 size/10 条新数据（含建立仓库索引）"""
+    dataset = generate_dataset(size)
+    batch = generate_fetch_batch(dataset["repositories"], max(size // 10, 1))
+
+    def setup():
+        return GitHubTrendingFetcher(storage=JSONStorage()), _copy_dataset(dataset)
+
+    timings = _time_runs(setup, lambda s: s[0].remove_duplicates(batch, s[1]), repeat)
+    return {"timings": timings, "records": size}
+
+
+def bench_process_data(size: int, workdir: str, repeat: int) -> Dict:
+    """处理：全量清洗和格式化 size 条记录"""
+    dataset = generate_dataset(size)
+    processor = GitHubDataProcessor(storage=JSONStorage())
+
+    timings = _time_runs(lambda: _copy_dataset(dataset), processor.process_data, repeat)
+    return {"timings": timings, "records": size}
+
+
+def bench_cleanup_trending_data(size: int, workdir: str, repeat: int) -> Dict:
+    """清理：读取、按时间和数量淘汰、写回 trending.json（含文件读写）"""
+    dataset = generate_dataset(size)
+    storage = JSONStorage()
+    cleanup = DataCleanup(data_dir=workdir, storage=storage, history_dir=os.path.join(workdir, "history"))
+
+    timings = _time_runs(
+        lambda: storage.save(dataset, cleanup.trending_file),
+        lambda _: cleanup.cleanup_trending_data(max_days=30, max_items=max(size // 2, 1)),
+        repeat
+    )
+    return {"timings": timings, "records": size, "file_bytes": os.path.getsize(cleanup.trending_file)}
+
+
+def bench_json_save(size: int, workdir: str, repeat: int) -> Dict:
+    """保存：JSONStorage.save 写入 size 条记录"""
+    dataset = load_records(generate_dataset(size))
+    storage = JSONStorage()
+    filename = os.path.join(workdir, "trending.json")
+
+    timings = _time_runs(lambda: None, lambda _: storage.save(dataset, filename), repeat)
+    return {"timings": timings, "records": size, "file_bytes": os.path.getsize(filename)}
+
+
+def bench_json_load(size: int, workdir: str, repeat: int) -> Dict:
+    """加载：JSONStorage.load 读取 size 条记录并转换为 RepositoryRecord（与各脚本的加载方式相同）"""
+    storage = JSONStorage()
+    filename = os.path.join(workdir, "trending.json")
+    storage.save(generate_dataset(size), filename)
+
+    timings = _time_runs(lambda: None, lambda _: load_records(storage.load(filename)), repeat)
+    return {"timings": timings, "records": size, "file_bytes": os.path.getsize(filename)}
+
+
+def bench_fetch(size: int, workdir: str, repeat: int) -> Dict:
+    """获取：经本地模拟API端到端执行 fetch_trending_repositories（每个查询返回 size 条记录）"""
+    server = MockTrendingServer(count=size)
+    server.start_background()
+    try:
+        fetcher = GitHubTrendingFetcher(base_url=server.base_url, storage=JSONStorage())
+        # 预先生成响应体，计时只包含请求、传输和解析
+        for language, since in FETCH_QUERIES:
+            server.payload(language, since)
+
+        def body(_):
+            for language, since in FETCH_QUERIES:
+                if fetcher.fetch_trending_repositories(language, since) is None:
+                    raise RuntimeError(f"获取失败: language={language}, since={since}")
+
+        timings = _time_runs(lambda: None, body, repeat)
+    finally:
+        server.shutdown()
+        server.server_close()
+    return {"timings": timings, "records": size * len(FETCH_QUERIES), "requests": server.request_count}
+
+
+# 用例名称 -> 测试函数
+CASES: Dict[str, Callable[[int, str, int], Dict]] = {
+    "fetch": bench_fetch,
+    "merge_data": bench_merge_data,
+    "remove_duplicates": bench_remove_duplicates,
+    "process_data": bench_process_data,
+    "cleanup_trending_data": bench_cleanup_trending_data,
+    "json_save": bench_json_save,
+    "json_load": bench_json_load
+}
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """当前进程的峰值内存（MB）"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux以KB为单位，macOS以字节为单位
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_case(case: str, size: int, repeat: int, verbose: bool = False) -> Dict:
+    """
+    运行单个用例（在子进程中调用）
+
+    Returns:
+        结果：耗时中位数/最小值、吞吐量（记录/秒）、峰值内存等
+    """
+    if not verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    workdir = tempfile.mkdtemp(prefix="hotweek-bench-")
+    try:
+        result = CASES[case](size, workdir, repeat)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    timings = result.pop("timings")
+    median = statistics.median(timings)
+    return {
+        "case": case,
+        "size": size,
+        "repeat": repeat,
+        "median": median,
+        "min": min(timings),
+        "throughput": result["records"] / median if median > 0 else None,
+        # 峰值内存包含生成测试数据的开销
+        "peak_rss_mb": _peak_rss_mb(),
+        **result
+    }
+
+
+def run_benchmarks(cases: List[str], sizes: List[int], repeat: int, verbose: bool = False) -> Dict[str, Dict]:
+    """
+    依次在独立子进程中运行各用例
+
+    Returns:
+        "用例/规模" -> 结果
+    """
+    results = {}
+    context = get_context("spawn")
+    for size in sizes:
+        for case in cases:
+            if case == "fetch" and size > FETCH_MAX_SIZE:
+                logger.info(f"跳过 {case}/{size}: 单个响应超过 {FETCH_MAX_SIZE} 条记录")
+                continue
+            logger.info(f"运行 {case}/{size} ...")
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                results[f"{case}/{size}"] = executor.submit(run_case, case, size, repeat, verbose).result()
+    return results
+
+
+def compare_with_baseline(results: Dict[str, Dict], baseline: Dict[str, Dict],
+                          threshold: float = DEFAULT_THRESHOLD) -> List[str]:
+    """
+    与基准结果比较
+
+    Returns:
+        最短耗时超出基准 threshold 比例的用例列表
+    """
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if not base or not base.get("min"):
+            continue
+        change = result["min"] / base["min"] - 1
+        result["baseline_min"] = base["min"]
+        result["change"] = change
+        if change > threshold and result["min"] - base["min"] > MIN_REGRESSION_SECONDS:
+            regressions.append(key)
+    return regressions
+
+
+def load_baseline(filename: str) -> Dict[str, Dict]:
+    """加载基准结果（文件不存在时返回空字典）"""
+    if not os.path.exists(filename):
+        return {}
+    with open(filename, 'r', encoding='utf-8') as f:
+        return json.load(f).get("results", {})
+
+
+def save_results(results: Dict[str, Dict], filename: str) -> None:
+    """保存测试结果"""
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": sys.platform,
+        "results": results
+    }
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+def log_report(results: Dict[str, Dict], regressions: List[str]) -> None:
+    """输出结果表格"""
+    logger.info(f"{'用例':<28}{'最短(s)':>10}{'中位数(s)':>12}{'吞吐量(条/s)':>16}{'峰值内存(MB)':>14}{'对比基准':>10}")
+    for key, result in results.items():
+        throughput = f"{result['throughput']:,.0f}" if result["throughput"] else "-"
+        rss = f"{result['peak_rss_mb']:.1f}" if result["peak_rss_mb"] is not None else "-"
+        change = f"{result['change']:+.1%}" if "change" in result else "-"
+        mark = "  <- 退化" if key in regressions else ""
+        logger.info(f"{key:<28}{result['min']:>10.4f}{result['median']:>12.4f}{throughput:>16}{rss:>14}{change:>10}{mark}")
+
+
+def main():
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="数据流水线性能测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="数据规模（记录数）")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES), help="要运行的用例")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="每个用例的计时轮数")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="基准结果文件")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果保存为基准")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="耗时超出基准的比例阈值（默认0.2，即20%%）")
+    parser.add_argument("--output", default=None, help="另存本次结果的JSON文件")
+    parser.add_argument("--verbose", action="store_true", help="显示被测函数的日志")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.cases, args.sizes, args.repeat, args.verbose)
+
+    regressions = [] if args.save_baseline else compare_with_baseline(
+        results, load_baseline(args.baseline), args.threshold
+    )
+    log_report(results, regressions)
+
+    if args.output:
+        save_results(results, args.output)
+        logger.info(f"测试结果已保存到: {args.output}")
+
+    if args.save_baseline:
+        # 保留基准中本次未运行的用例
+        save_results({**load_baseline(args.baseline), **results}, args.baseline)
+        logger.info(f"基准结果已保存到: {args.baseline}")
+        return 0
+
+    if regressions:
+        logger.error(f"性能退化（超出基准 {args.threshold:.0%}）: {', '.join(regressions)}")
+        return 1
+
+    logger.info("性能测试完成")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+API端点熔断器
+
+功能：按API端点（scheme://host）记录连续失败（网络异常或5xx），连续失败达到阈值后熔断：
+    - open（熔断）：冷却期内不发请求，直接失败，由调用方使用上次成功的缓存数据；
+    - half-open（半开）：冷却期结束后只放行一个探测请求（使用较短的超时），
+      成功则恢复为 closed，失败则重新熔断并加倍冷却时间（不超过 MAX_RESET_TIMEOUT）；
+      探测的持有者记录在状态文件中，同时运行的多个进程（调度器和手工执行的获取脚本）也只探测一次；
+    - closed（正常）：请求照常发送，成功时清零失败计数。
+
+状态保存在 ../cache/circuit_breaker.json，跨运行保持，端点不可用时每次运行只需几毫秒。
+查看或重置状态：
+
+    python circuit_breaker.py [--reset]
+"""
+
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional, Set
+from urllib.parse import urlsplit
+
+from locks import FileLock
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE_FILE = "../cache/circuit_breaker.json"
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# 连续失败多少次后熔断
+FAILURE_THRESHOLD = 3
+# 熔断冷却时间（秒），半开探测失败时加倍
+RESET_TIMEOUT = 5 * 60
+MAX_RESET_TIMEOUT = 60 * 60
+# 半开探测请求的超时（秒）
+PROBE_TIMEOUT = 5
+# 探测的租约（秒）：持有探测的进程崩溃后，其他进程在租约到期后重新探测
+PROBE_LEASE = 60
+
+
+def endpoint_of(url: str) -> str:
+    """URL所属的端点（scheme://host[:port]）"""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class CircuitBreaker:
+    """按端点的熔断器（线程安全，状态持久化）"""
+
+    def __init__(self, state_file: Optional[str] = DEFAULT_STATE_FILE, failure_threshold: int = FAILURE_THRESHOLD,
+                 reset_timeout: float = RESET_TIMEOUT, max_reset_timeout: float = MAX_RESET_TIMEOUT):
+        """
+        初始化熔断器
+
+        Args:
+            state_file: 状态文件（为None时只在内存中保存）
+            failure_threshold: 连续失败多少次后熔断
+            reset_timeout: 熔断冷却时间（秒）
+            max_reset_timeout: 冷却时间上限（秒）
+        """
+        self.state_file = state_file
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max(max_reset_timeout, reset_timeout)
+        self._lock = threading.Lock()
+        # 状态文件的进程间锁：修改状态时重新加载其他进程写入的状态
+        self._file_lock = FileLock(f"{state_file}.lock") if state_file else None
+        self._endpoints: Dict[str, Dict] = self._load()
+        # 本实例正在进行的半开探测，以及记录在状态文件中的探测持有者标识
+        self._probing: Set[str] = set()
+        self._owner = f"{socket.gethostname()}:{os.getpid()}:{id(self):x}"
+
+    def _load(self) -> Dict[str, Dict]:
+        if not self.state_file or not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f).get("endpoints", {})
+        except (OSError, ValueError, AttributeError) as e:
+            logger.warning(f"无法读取熔断器状态 {self.state_file}，按正常状态处理: {e}")
+            return {}
+
+    def _save(self) -> None:
+        """原子写入状态文件（调用方持有锁）"""
+        if not self.state_file:
+            return
+        try:
+            directory = os.path.dirname(self.state_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_filename = f"{self.state_file}.{os.getpid()}.tmp"
+            with open(tmp_filename, 'w', encoding='utf-8') as f:
+                json.dump({"updated_at": datetime.now().isoformat(), "endpoints": self._endpoints}, f,
+                          ensure_ascii=False, indent=2)
+            os.replace(tmp_filename, self.state_file)
+        except OSError as e:
+            logger.warning(f"写入熔断器状态失败: {e}")
+
+    @contextmanager
+    def _shared_state(self):
+        """持有状态文件锁并重新加载状态，供进程间的读取-修改-写入（调用方持有线程锁）"""
+        if self._file_lock is None:
+            yield
+            return
+        with self._file_lock:
+            self._endpoints = self._load()
+            yield
+
+    def _entry(self, endpoint: str) -> Dict:
+        return self._endpoints.setdefault(endpoint, {
+            "state": CLOSED,
+            "failures": 0,
+            "reset_timeout": self.reset_timeout,
+            "open_until": 0.0,
+            "last_error": None,
+            "probe_owner": None,
+            "probe_until": 0.0
+        })
+
+    def _set_state(self, endpoint: str, entry: Dict, state: str) -> None:
+        entry["state"] = state
+        if state != HALF_OPEN:
+            entry.update(probe_owner=None, probe_until=0.0)
+        REGISTRY.set("hotweek_circuit_state", STATE_VALUES[state], endpoint=endpoint)
+
+    def state(self, url: str) -> str:
+        """端点当前的状态（closed / open / half_open）"""
+        entry = self._endpoints.get(endpoint_of(url))
+        return entry["state"] if entry else CLOSED
+
+    def is_probe(self, url: str) -> bool:
+        """本进程对该端点的下一个请求是否为半开探测"""
+        return endpoint_of(url) in self._probing
+
+    def allow_request(self, url: str, now: Optional[float] = None) -> bool:
+        """
+        是否允许向该端点发送请求
+
+        熔断冷却期结束时转为半开，并只放行一个探测请求：探测的持有者和租约写入状态文件，
+        其他进程在探测结束或租约到期前同样被拒绝。
+        """
+        endpoint = endpoint_of(url)
+        now = now or time.time()
+        with self._lock:
+            entry = self._endpoints.get(endpoint)
+            if entry is None or entry["state"] == CLOSED:
+                return True
+            with self._shared_state():
+                entry = self._endpoints.get(endpoint)
+                if entry is None or entry["state"] == CLOSED:
+                    # 其他进程的探测已成功
+                    return True
+                if entry["state"] == OPEN:
+                    if now < entry["open_until"]:
+                        return False
+                    self._set_state(endpoint, entry, HALF_OPEN)
+                    logger.info(f"熔断冷却结束，发送探测请求: {endpoint}")
+                elif endpoint in self._probing or (entry.get("probe_owner") and now < entry.get("probe_until", 0.0)):
+                    return False
+                entry.update(probe_owner=self._owner, probe_until=now + PROBE_LEASE)
+                self._probing.add(endpoint)
+                self._save()
+                return True
+
+    def record_success(self, url: str) -> None:
+        """端点有响应（非5xx）"""
+        endpoint = endpoint_of(url)
+        with self._lock:
+            self._probing.discard(endpoint)
+            entry = self._endpoints.get(endpoint)
+            if entry is None or (entry["state"] == CLOSED and not entry["failures"]):
+                return
+            with self._shared_state():
+                entry = self._endpoints.get(endpoint)
+                if entry is None or (entry["state"] == CLOSED and not entry["failures"]):
+                    return
+                if entry["state"] != CLOSED:
+                    logger.info(f"API端点已恢复: {endpoint}")
+                entry.update(failures=0, reset_timeout=self.reset_timeout, open_until=0.0, last_error=None)
+                self._set_state(endpoint, entry, CLOSED)
+                self._save()
+
+    def record_failure(self, url: str, error: str = "", now: Optional[float] = None) -> None:
+        """端点请求失败（网络异常或5xx）"""
+        endpoint = endpoint_of(url)
+        now = now or time.time()
+        with self._lock:
+            probing = endpoint in self._probing
+            self._probing.discard(endpoint)
+            with self._shared_state():
+                entry = self._entry(endpoint)
+                entry["failures"] += 1
+                entry["last_error"] = error
+                if entry["state"] == HALF_OPEN or probing:
+                    # 探测失败，冷却时间加倍
+                    entry["reset_timeout"] = min(entry["reset_timeout"] * 2, self.max_reset_timeout)
+                elif entry["state"] == OPEN or entry["failures"] < self.failure_threshold:
+                    self._save()
+                    return
+                entry["open_until"] = now + entry["reset_timeout"]
+                self._set_state(endpoint, entry, OPEN)
+                self._save()
+            logger.error(f"API端点连续失败 {entry['failures']} 次，熔断 {entry['reset_timeout']:.0f} 秒: {endpoint}")
+
+    def describe(self) -> str:
+        """各端点的状态（供命令行输出）"""
+        lines = []
+        now = time.time()
+        for endpoint, entry in sorted(self._endpoints.items()):
+            line = f"  {endpoint}: {entry['state']}，连续失败 {entry['failures']} 次"
+            if entry["state"] == OPEN:
+                line += f"，{max(entry['open_until'] - now, 0):.0f} 秒后探测"
+            if entry.get("last_error"):
+                line += f"，最近错误: {entry['last_error']}"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def reset(self) -> None:
+        """清除所有端点的状态"""
+        with self._lock, self._shared_state():
+            self._endpoints.clear()
+            self._probing.clear()
+            self._save()
+
+
+def main():
+    """主函数：查看或重置熔断器状态"""
+    import argparse
+
+    # 配置日志（作为库导入时由调用方配置）
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    parser = argparse.ArgumentParser(description="API端点熔断器状态")
+    parser.add_argument(
+        "--state-file",
+        default=DEFAULT_STATE_FILE,
+        help="熔断器状态文件"
+    )
+    parser.add_argument(
+        "--reset",
+        action="store_true",
+        help="清除所有端点的熔断状态"
+    )
+    args = parser.parse_args()
+
+    breaker = CircuitBreaker(args.state_file)
+    if args.reset:
+        breaker.reset()
+        logger.info("熔断器状态已清除")
+    elif breaker.describe():
+        logger.info("各API端点状态:\n" + breaker.describe())
+    else:
+        logger.info("还没有API端点的失败记录")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
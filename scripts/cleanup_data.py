@@ -4,12 +4,24 @@
 用于定期清理旧数据，避免数据文件过大
 """
 
-import json
+import atexit
+import heapq
 import os
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from itertools import islice
+from typing import Callable, Dict, List, Optional, Set, Tuple
 import logging
 
+from frontend_payload import (MANIFEST_FILE, payload_filename, search_index_filename, shard_dirname, write_payload,
+                              write_search_index, write_shards)
+from locks import LockTimeout, acquire_data_lock
+from metrics import REGISTRY, timed
+from profiling import StageProfiler, add_profile_arguments
+from repo_index import SORTED_BY
+from repo_record import load_records
+from snapshot_log import DEFAULT_LOG_DIR, SnapshotLog
+from storage import JSONStreamReader, get_storage
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -21,16 +33,20 @@ logger = logging.getLogger(__name__)
 class DataCleanup:
     """数据清理类"""
     
-    def __init__(self, data_dir: str = "../data"):
+    def __init__(self, data_dir: str = "../data", storage=None, history_dir: str = DEFAULT_LOG_DIR):
         """
         初始化数据清理器
         
         Args:
             data_dir: 数据目录路径
+            storage: 数据存储后端（默认由环境变量 HOTWEEK_STORAGE 决定）
+            history_dir: 历史快照日志目录
         """
         self.data_dir = data_dir
+        self.storage = storage or get_storage()
         self.trending_file = os.path.join(data_dir, "trending.json")
         self.processed_file = os.path.join(data_dir, "processed_trending.json")
+        self.snapshot_log = SnapshotLog(history_dir)
     
     def load_data(self, filename: str) -> Optional[Dict]:
         """
@@ -40,12 +56,11 @@ class DataCleanup:
             filename: 文件名
             
         Returns:
-            数据字典或None
+            数据字典或None（其中的仓库数据为 RepositoryRecord）
         """
         try:
-            if os.path.exists(filename):
-                with open(filename, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+            if self.storage.exists(filename):
+                return load_records(self.storage.load(filename))
             return None
         except Exception as e:
             logger.error(f"加载文件失败 {filename}: {str(e)}")
@@ -63,11 +78,7 @@ class DataCleanup:
             保存是否成功
         """
         try:
-            # 确保目录存在
-            os.makedirs(os.path.dirname(filename), exist_ok=True)
-            
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            self.storage.save(data, filename)
             
             logger.info(f"数据已保存到: {filename}")
             return True
@@ -75,18 +86,22 @@ class DataCleanup:
             logger.error(f"保存文件失败 {filename}: {str(e)}")
             return False
     
-    def cleanup_trending_data(self, max_days: int = 30, max_items: int = 200) -> bool:
+    @timed()
+    def cleanup_trending_data(self, max_days: int = 30, max_items: Optional[int] = None) -> bool:
         """
         清理trending.json数据
         
+        按每条记录的 last_seen 时间淘汰超过 max_days 天未再出现的项目；
+        没有时间戳的旧记录以文件的 last_updated 作为其最近出现时间。
+        
         Args:
             max_days: 最大保留天数
-            max_items: 最大保留项目数
+            max_items: 最大保留项目数（可选的硬上限，超出时淘汰最久未出现的项目）
             
         Returns:
             清理是否成功
         """
-        logger.info(f"开始清理trending数据: 保留最近{max_days}天，最多{max_items}个项目")
+        logger.info(f"开始清理trending数据: 保留最近{max_days}天，最多{max_items or '不限'}个项目")
         
         data = self.load_data(self.trending_file)
         if not data:
@@ -104,34 +119,228 @@ class DataCleanup:
             logger.info("没有数据需要清理")
             return True
         
+        data = self.clean_trending_data(data, max_days=max_days, max_items=max_items)
+        cleaned_repositories = data['repositories']
+        if len(cleaned_repositories) == original_count:
+            logger.info("没有需要淘汰的项目，跳过写入")
+            return True
+        
+        # 保存清理后的数据
+        if self.save_data(data, self.trending_file):
+            logger.info(f"trending数据清理完成: {original_count} -> {len(cleaned_repositories)} 个项目")
+            return True
+        else:
+            logger.error("trending数据清理失败")
+            return False
+    
+    @timed()
+    def clean_trending_data(self, data: Dict, max_days: int = 30, max_items: Optional[int] = None) -> Dict:
+        """
+        在内存中清理trending数据（不读写文件）
+        
+        获取脚本写出的列表按 last_seen 从新到旧排列（元数据 sorted_by），此时直接从尾部淘汰，
+        耗时只与淘汰数量有关；旧格式数据按堆选出淘汰项目。
+        
+        Args:
+            data: trending数据
+            max_days: 最大保留天数
+            max_items: 最大保留项目数（None表示不限）
+            
+        Returns:
+            清理后的数据
+        """
+        repositories = data.get('repositories', [])
+        original_count = len(repositories)
+        
         # 计算截止日期
         cutoff_date = datetime.now() - timedelta(days=max_days)
+        fallback_seen = data.get('metadata', {}).get('last_updated', '')
         
-        # 过滤数据（这里简化处理，实际应该根据时间戳过滤）
-        # 由于我们的数据没有时间戳，我们按顺序保留最新的数据
-        cleaned_repositories = repositories[:max_items]
+        # 按最近出现时间淘汰
+        keep = None
+        if data.get('metadata', {}).get('sorted_by') == SORTED_BY:
+            keep = self._sorted_keep_count(lambda i: repositories[i].get('last_seen'), original_count,
+                                           cutoff_date.isoformat(), max_items)
+        if keep is not None:
+            cleaned_repositories = repositories[:keep] if keep < original_count else repositories
+        else:
+            evicted = self._select_evictions(repositories, cutoff_date.isoformat(), max_items, fallback_seen)
+            cleaned_repositories = [repo for i, repo in enumerate(repositories) if i not in evicted]
+        REGISTRY.inc("hotweek_records_total", original_count - len(cleaned_repositories), stage="evicted")
         
         # 更新元数据
-        data['metadata'] = {
+        metadata = self._cleaned_metadata(data.get('metadata', {}), original_count, len(cleaned_repositories),
+                                          max_days=max_days, max_items=max_items)
+        return {**data, 'metadata': metadata, 'repositories': cleaned_repositories}
+    
+    def _cleaned_metadata(self, metadata: Dict, original_count: int, cleaned_count: int, **limits) -> Dict:
+        """
+        清理后的元数据
+        
+        保留原有字段（获取指纹 fetch_fingerprint、排序标记 sorted_by、处理时间等），
+        淘汰不改变剩余记录的相对顺序，这些字段清理后仍然成立。
+        
+        Args:
+            metadata: 原有元数据
+            original_count: 清理前的记录数
+            cleaned_count: 清理后的记录数
+            limits: 本次清理的参数（max_days、max_items）
+            
+        Returns:
+            新的元数据
+        """
+        return {
+            **metadata,
             "last_updated": datetime.now().isoformat(),
-            "count": len(cleaned_repositories),
+            "count": cleaned_count,
             "source": "GitHub Trending API",
             "cleaned": True,
             "original_count": original_count,
-            "cleaned_count": len(cleaned_repositories),
-            "max_days": max_days,
-            "max_items": max_items
+            "cleaned_count": cleaned_count,
+            **limits
         }
-        data['repositories'] = cleaned_repositories
+    
+    def _sorted_keep_count(self, seen_at: Callable[[int], Optional[str]], count: int, cutoff: str,
+                           max_items: Optional[int]) -> Optional[int]:
+        """
+        列表已按 last_seen 从新到旧排列时，从尾部开始确定保留的记录数（O(淘汰数)）
         
-        # 保存清理后的数据
-        if self.save_data(data, self.trending_file):
-            logger.info(f"trending数据清理完成: {original_count} -> {len(cleaned_repositories)} 个项目")
+        Args:
+            seen_at: 按下标返回记录的 last_seen
+            count: 记录总数
+            cutoff: 截止时间（ISO格式）
+            max_items: 最大保留项目数（None表示不限）
+            
+        Returns:
+            保留的记录数（保留前缀）；尾部遇到没有 last_seen 的记录时返回None，由调用方按堆淘汰
+        """
+        keep = count
+        while keep:
+            last_seen = seen_at(keep - 1)
+            if not last_seen:
+                return None
+            if not (last_seen < cutoff or (max_items is not None and keep > max_items)):
+                break
+            keep -= 1
+        return keep
+    
+    def _select_evictions(self, repositories: List[Dict], cutoff: str, max_items: Optional[int],
+                          fallback_seen: str = '') -> Set[int]:
+        """
+        选出需要淘汰的记录下标
+        
+        以 (last_seen, 下标) 建最小堆，从最久未出现的记录开始弹出，
+        弹出次数只与淘汰数量有关（O(淘汰数 · log n)）。
+        
+        Args:
+            repositories: 仓库列表
+            cutoff: 截止时间（ISO格式），last_seen 早于它的记录被淘汰
+            max_items: 最大保留项目数（None表示不限）
+            fallback_seen: 记录没有 last_seen 时使用的时间
+            
+        Returns:
+            需要淘汰的下标集合
+        """
+        return self._select_evictions_by_seen(
+            [repo.get('last_seen') for repo in repositories], cutoff, max_items, fallback_seen
+        )
+    
+    def _select_evictions_by_seen(self, seen_values: List[Optional[str]], cutoff: str, max_items: Optional[int],
+                                  fallback_seen: str = '') -> Set[int]:
+        """按每条记录的 last_seen 值选出需要淘汰的记录下标（参数含义同 _select_evictions）"""
+        heap = []
+        # 完全没有时间信息的记录不按时间淘汰，只在超出数量上限时优先淘汰
+        undated = []
+        for i, last_seen in enumerate(seen_values):
+            last_seen = last_seen or fallback_seen
+            if last_seen:
+                heap.append((last_seen, i))
+            else:
+                undated.append(i)
+        heapq.heapify(heap)
+        
+        evicted = set()
+        while heap or undated:
+            over_limit = max_items is not None and len(seen_values) - len(evicted) > max_items
+            if over_limit and undated:
+                evicted.add(undated.pop())
+                continue
+            if not heap or not (heap[0][0] < cutoff or over_limit):
+                break
+            evicted.add(heapq.heappop(heap)[1])
+        
+        return evicted
+    
+    @timed()
+    def cleanup_trending_data_stream(self, max_days: int = 30, max_items: Optional[int] = None) -> bool:
+        """
+        流式清理trending.json数据（结果与 cleanup_trending_data 相同）
+        
+        第一遍只读取每条记录的 last_seen 并选出淘汰的下标（按 last_seen 排序的文件从尾部淘汰），
+        第二遍逐条读取并写出保留的记录，不把整个文件载入内存；没有需要淘汰的记录时不重写文件。
+        
+        Args:
+            max_days: 最大保留天数
+            max_items: 最大保留项目数
+            
+        Returns:
+            清理是否成功
+        """
+        logger.info(f"开始流式清理trending数据: 保留最近{max_days}天，最多{max_items or '不限'}个项目")
+        
+        if not self.storage.exists(self.trending_file):
+            logger.warning("trending.json文件不存在或为空")
+            return False
+        
+        try:
+            reader = JSONStreamReader(self.trending_file)
+            seen_values = [repo.get('last_seen') for repo in self.storage.iter_repositories(self.trending_file, reader)]
+            original_count = len(seen_values)
+            if original_count == 0:
+                logger.info("没有数据需要清理")
+                return True
+            
+            # SQLite后端按行读取记录，不经过读取器，需单独读取其他字段
+            fields = reader.fields or self.storage.load_fields(self.trending_file)
+            fallback_seen = fields.get('metadata', {}).get('last_updated', '')
+            cutoff_date = datetime.now() - timedelta(days=max_days)
+            sorted_by = fields.get('metadata', {}).get('sorted_by')
+            keep = None
+            if sorted_by == SORTED_BY:
+                keep = self._sorted_keep_count(seen_values.__getitem__, original_count,
+                                               cutoff_date.isoformat(), max_items)
+            if keep is not None:
+                evicted = set()
+                cleaned_count = keep
+            else:
+                evicted = self._select_evictions_by_seen(seen_values, cutoff_date.isoformat(), max_items,
+                                                         fallback_seen)
+                cleaned_count = original_count - len(evicted)
+            del seen_values
+            
+            if cleaned_count == original_count:
+                logger.info("没有需要淘汰的项目，跳过写入")
+                return True
+            REGISTRY.inc("hotweek_records_total", original_count - cleaned_count, stage="evicted")
+            metadata = self._cleaned_metadata(fields.get('metadata', {}), original_count, cleaned_count,
+                                              max_days=max_days, max_items=max_items)
+            if keep is not None:
+                kept = islice(self.storage.iter_repositories(self.trending_file), keep)
+            else:
+                kept = (
+                    repo for i, repo in enumerate(self.storage.iter_repositories(self.trending_file))
+                    if i not in evicted
+                )
+            extra = {key: value for key, value in fields.items() if key != 'metadata'}
+            self.storage.save_stream(kept, self.trending_file, header={'metadata': metadata}, trailer=lambda: extra)
+            
+            logger.info(f"trending数据清理完成: {original_count} -> {cleaned_count} 个项目（流式）")
             return True
-        else:
-            logger.error("trending数据清理失败")
+        except Exception as e:
+            logger.error(f"trending数据清理失败: {str(e)}")
             return False
     
+    @timed()
     def cleanup_processed_data(self, max_items: int = 50) -> bool:
         """
         清理processed_trending.json数据
@@ -160,29 +369,133 @@ class DataCleanup:
             logger.info("没有数据需要清理")
             return True
         
-        # 保留最新的数据
-        cleaned_repositories = repositories[:max_items]
-        
-        # 更新元数据
-        data['metadata'] = {
-            "last_updated": datetime.now().isoformat(),
-            "count": len(cleaned_repositories),
-            "source": "GitHub Trending API",
-            "cleaned": True,
-            "original_count": original_count,
-            "cleaned_count": len(cleaned_repositories),
-            "max_items": max_items
-        }
-        data['repositories'] = cleaned_repositories
+        data = self.clean_processed_data(data, max_items=max_items)
+        cleaned_repositories = data['repositories']
         
         # 保存清理后的数据
         if self.save_data(data, self.processed_file):
+            self._refresh_payload(data)
             logger.info(f"processed数据清理完成: {original_count} -> {len(cleaned_repositories)} 个项目")
             return True
         else:
             logger.error("processed数据清理失败")
             return False
     
+    def clean_processed_data(self, data: Dict, max_items: int = 50) -> Dict:
+        """
+        在内存中清理processed数据（不读写文件）
+        
+        Args:
+            data: processed数据
+            max_items: 最大保留项目数
+            
+        Returns:
+            清理后的数据
+        """
+        repositories = data.get('repositories', [])
+        original_count = len(repositories)
+        
+        # 保留最新的数据
+        cleaned_repositories = repositories[:max_items]
+        REGISTRY.inc("hotweek_records_total", original_count - len(cleaned_repositories), stage="trimmed")
+        
+        # 更新元数据
+        metadata = self._cleaned_metadata(data.get('metadata', {}), original_count, len(cleaned_repositories),
+                                          max_items=max_items)
+        return {**data, 'metadata': metadata, 'repositories': cleaned_repositories}
+    
+    @timed()
+    def cleanup_processed_data_stream(self, max_items: int = 50) -> bool:
+        """
+        流式清理processed_trending.json数据（结果与 cleanup_processed_data 相同）
+        
+        第一遍只统计记录数，第二遍写出前 max_items 条后即停止读取。
+        
+        Args:
+            max_items: 最大保留项目数
+            
+        Returns:
+            清理是否成功
+        """
+        logger.info(f"开始流式清理processed数据: 最多保留{max_items}个项目")
+        
+        if not self.storage.exists(self.processed_file):
+            logger.warning("processed_trending.json文件不存在或为空")
+            return False
+        
+        try:
+            original_count, fields = self._scan(self.processed_file)
+            if original_count == 0:
+                logger.info("没有数据需要清理")
+                return True
+            
+            cleaned_count = min(original_count, max_items)
+            REGISTRY.inc("hotweek_records_total", original_count - cleaned_count, stage="trimmed")
+            metadata = self._cleaned_metadata(fields.get('metadata', {}), original_count, cleaned_count,
+                                              max_items=max_items)
+            kept = islice(self.storage.iter_repositories(self.processed_file), max_items)
+            extra = {key: value for key, value in fields.items() if key != 'metadata'}
+            self.storage.save_stream(kept, self.processed_file, header={'metadata': metadata}, trailer=lambda: extra)
+            if self._has_payload():
+                # 清理后最多 max_items 条记录，可以直接载入
+                self._refresh_payload(self.storage.load(self.processed_file))
+            
+            logger.info(f"processed数据清理完成: {original_count} -> {cleaned_count} 个项目（流式）")
+            return True
+        except Exception as e:
+            logger.error(f"processed数据清理失败: {str(e)}")
+            return False
+    
+    def _has_payload(self) -> bool:
+        """是否生成过前端载荷、分片或搜索索引"""
+        return (os.path.exists(payload_filename(self.processed_file))
+                or os.path.exists(search_index_filename(self.processed_file))
+                or os.path.exists(os.path.join(shard_dirname(self.processed_file), MANIFEST_FILE)))
+    
+    def _refresh_payload(self, data: Dict) -> None:
+        """已生成过前端载荷、分片或搜索索引时，按清理后的数据重新生成，保持与processed数据一致"""
+        filename = payload_filename(self.processed_file)
+        if os.path.exists(filename):
+            write_payload(data, filename)
+        shard_dir = shard_dirname(self.processed_file)
+        if os.path.exists(os.path.join(shard_dir, MANIFEST_FILE)):
+            write_shards(data, shard_dir)
+        index_filename = search_index_filename(self.processed_file)
+        if os.path.exists(index_filename):
+            write_search_index(data, index_filename)
+    
+    def _scan(self, filename: str) -> Tuple[int, Dict]:
+        """
+        流式扫描数据文件
+        
+        Returns:
+            (记录数, 除 repositories 以外的顶层字段)
+        """
+        reader = JSONStreamReader(filename)
+        count = sum(1 for _ in self.storage.iter_repositories(filename, reader))
+        # SQLite后端按行读取记录，不经过读取器，需单独读取其他字段
+        return count, reader.fields or self.storage.load_fields(filename)
+    
+    def compact_history(self, keep_days: int = 7) -> bool:
+        """
+        压缩历史快照日志
+        
+        Args:
+            keep_days: 保留原始快照日志段的天数，更早的日志段折叠为汇总
+            
+        Returns:
+            压缩是否成功
+        """
+        logger.info(f"开始压缩历史快照: 保留最近{keep_days}天的原始日志段")
+        
+        try:
+            compacted = self.snapshot_log.compact(keep_days=keep_days)
+            logger.info(f"历史快照压缩完成: 折叠 {compacted} 个日志段")
+            return True
+        except Exception as e:
+            logger.error(f"历史快照压缩失败: {str(e)}")
+            return False
+    
     def get_data_stats(self) -> Dict:
         """
         获取数据统计信息
@@ -192,34 +505,62 @@ class DataCleanup:
         """
         stats = {}
         
-        # trending.json统计
-        trending_data = self.load_data(self.trending_file)
-        if trending_data:
-            stats['trending'] = {
+        # 流式统计记录数，不把数据文件整体载入内存
+        for name, filename in (('trending', self.trending_file), ('processed', self.processed_file)):
+            try:
+                if not self.storage.exists(filename):
+                    stats[name] = {'file_exists': False}
+                    continue
+                count, fields = self._scan(filename)
+            except Exception as e:
+                logger.error(f"读取数据文件失败 {filename}: {str(e)}")
+                stats[name] = {'file_exists': False}
+                continue
+            stats[name] = {
                 'file_exists': True,
-                'item_count': len(trending_data.get('repositories', [])),
-                'last_updated': trending_data.get('metadata', {}).get('last_updated', '未知')
+                'item_count': count,
+                'last_updated': fields.get('metadata', {}).get('last_updated', '未知')
             }
-        else:
-            stats['trending'] = {'file_exists': False}
-        
-        # processed_trending.json统计
-        processed_data = self.load_data(self.processed_file)
-        if processed_data:
-            stats['processed'] = {
-                'file_exists': True,
-                'item_count': len(processed_data.get('repositories', [])),
-                'last_updated': processed_data.get('metadata', {}).get('last_updated', '未知')
-            }
-        else:
-            stats['processed'] = {'file_exists': False}
         
         return stats
 
 
 def main():
     """主函数"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="数据清理")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="流式读取和写入数据文件（不把整个文件载入内存）"
+    )
+    parser.add_argument(
+        "--history-only",
+        action="store_true",
+        help="只压缩历史快照日志，不清理数据文件"
+    )
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    
+    profiler = StageProfiler.from_args(args, "cleanup_data")
+    atexit.register(profiler.finish)
+    
+    # 清理是对数据文件的读取-修改-写入，期间持有数据锁
+    try:
+        acquire_data_lock()
+    except LockTimeout as e:
+        logger.error(str(e))
+        return 1
+    
     cleanup = DataCleanup()
+    # 读取、清理、保存分别作为独立阶段（流式清理边读边写，整体作为一个阶段）
+    profiler.instrument(cleanup, "get_data_stats", "clean_trending_data", "cleanup_trending_data_stream",
+                        "clean_processed_data", "cleanup_processed_data_stream", "compact_history")
+    profiler.instrument(cleanup.storage, "load", "save")
+    
+    if args.history_only:
+        return 0 if cleanup.compact_history(keep_days=7) else 1
     
     # 显示当前数据统计
     stats = cleanup.get_data_stats()
@@ -236,10 +577,15 @@ def main():
         logger.info("  processed_trending.json: 文件不存在")
     
     # 执行数据清理
-    success1 = cleanup.cleanup_trending_data(max_days=30, max_items=200)
-    success2 = cleanup.cleanup_processed_data(max_items=50)
+    if args.stream:
+        success1 = cleanup.cleanup_trending_data_stream(max_days=30)
+        success2 = cleanup.cleanup_processed_data_stream(max_items=50)
+    else:
+        success1 = cleanup.cleanup_trending_data(max_days=30)
+        success2 = cleanup.cleanup_processed_data(max_items=50)
+    success3 = cleanup.compact_history(keep_days=7)
     
-    if success1 and success2:
+    if success1 and success2 and success3:
         logger.info("数据清理完成")
         return 0
     else:
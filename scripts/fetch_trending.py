@@ -9,12 +9,28 @@ GitHub热榜数据获取脚本
 """
 
 import requests
-import json
-import os
+import asyncio
+import atexit
+import hashlib
 import time
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import Dict, List, Optional
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from requests.adapters import HTTPAdapter
+
+from circuit_breaker import CLOSED, PROBE_TIMEOUT, CircuitBreaker
+from http_cache import HTTPCache
+from locks import LockTimeout, acquire_data_lock
+from metrics import REGISTRY, timed
+from polling import MAX_INTERVAL, MIN_INTERVAL, AdaptivePollingPlanner
+from profiling import StageProfiler, add_profile_arguments
+from repo_index import SORTED_BY, RepositoryIndex, content_hash, normalize_repo_key
+from repo_record import load_records
+from snapshot_log import SnapshotLog
+from storage import JSONStreamReader, get_storage
 
 # 配置日志
 logging.basicConfig(
@@ -23,22 +39,137 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 热榜支持的时间范围
+TRENDING_PERIODS = ("daily", "weekly", "monthly")
+
+# 速率限制时单次等待的上限（秒）
+MAX_RETRY_WAIT = 60
+
+# 更新合并（upsert）时从新数据刷新的字段
+UPSERT_FIELDS = ("description", "language", "stars", "forks", "currentPeriodStars", "builtBy")
+
+# 获取结果与上次相同时 main() 可选返回的退出码（见 --signal-unchanged）
+NO_CHANGES_EXIT_CODE = 3
+
+
+def compute_fingerprint(repositories: List[Dict]) -> str:
+    """
+    计算仓库数据的内容指纹（由各记录的内容哈希按顺序组合，忽略易变字段）
+    
+    Args:
+        repositories: 仓库数据列表
+        
+    Returns:
+        SHA-256十六进制摘要
+    """
+    digest = hashlib.sha256()
+    for repo in repositories:
+        digest.update(content_hash(repo).encode('ascii'))
+    return digest.hexdigest()
+
+
+class AsyncRateLimiter:
+    """异步令牌桶限速器（所有并发请求共享同一个预算）"""
+    
+    def __init__(self, rate: float = 5.0, capacity: int = 5):
+        """
+        初始化限速器
+        
+        Args:
+            rate: 每秒补充的令牌数
+            capacity: 令牌桶容量（允许的突发请求数）
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self):
+        """获取一个令牌，令牌不足时异步等待（不阻塞事件循环）"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def parse_retry_after(response: requests.Response, default: float) -> float:
+    """
+    从响应头中解析需要等待的秒数
+    
+    依次检查 Retry-After（秒数或HTTP日期）和 X-RateLimit-Reset（Unix时间戳），
+    都不存在时返回默认值。结果限制在 [0, MAX_RETRY_WAIT] 范围内。
+    
+    Args:
+        response: 响应对象
+        default: 无可用响应头时的等待秒数
+        
+    Returns:
+        等待秒数
+    """
+    wait_time = default
+    retry_after = response.headers.get('Retry-After')
+    reset_at = response.headers.get('X-RateLimit-Reset')
+    
+    try:
+        if retry_after:
+            if retry_after.strip().isdigit():
+                wait_time = float(retry_after)
+            else:
+                retry_at = parsedate_to_datetime(retry_after)
+                wait_time = retry_at.timestamp() - time.time()
+        elif reset_at:
+            wait_time = float(reset_at) - time.time()
+    except (TypeError, ValueError):
+        logger.warning(f"无法解析速率限制响应头: Retry-After={retry_after}, X-RateLimit-Reset={reset_at}")
+    
+    return max(0.0, min(wait_time, MAX_RETRY_WAIT))
+
+
 class GitHubTrendingFetcher:
     """GitHub热榜数据获取器"""
     
-    def __init__(self, base_url: str = "https://gh-trending-api.herokuapp.com"):
+    def __init__(self, base_url: str = "https://gh-trending-api.herokuapp.com", max_workers: int = 8,
+                 cache: Optional[HTTPCache] = None, storage=None,
+                 snapshot_log: Optional[SnapshotLog] = None, breaker: Optional[CircuitBreaker] = None):
         """
         初始化数据获取器
         
         Args:
             base_url: API基础URL
+            max_workers: 批量获取时的最大并发数
+            cache: HTTP响应缓存（为None时不使用缓存）
+            storage: 数据存储后端（默认由环境变量 HOTWEEK_STORAGE 决定）
+            snapshot_log: 历史快照日志（为None时不记录历史）
+            breaker: API端点熔断器（为None时不熔断）
         """
         self.base_url = base_url
+        self.max_workers = max_workers
+        self.cache = cache
+        self.storage = storage or get_storage()
+        self.snapshot_log = snapshot_log
+        self.breaker = breaker
+        # 请求失败、改用过期缓存数据的查询
+        self.stale_queries: Set[Tuple[str, str]] = set()
+        # 现有数据的仓库索引（对同一个仓库列表只构建一次）
+        self._index: Optional[RepositoryIndex] = None
+        self._indexed_repos: Optional[List[Dict]] = None
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
             'Accept': 'application/json'
         })
+        # 连接池大小与并发数一致，避免并发请求时连接被丢弃重建
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
     
     def fetch_trending_repositories(self, language: str = "", since: str = "weekly") -> Optional[List[Dict]]:
         """
@@ -52,30 +183,228 @@ class GitHubTrendingFetcher:
             仓库数据列表或None（获取失败时）
         """
         try:
-            # 构建API URL
-            url = f"{self.base_url}/repositories"
-            params = {"since": since}
-            if language:
-                params["language"] = language
-            
-            logger.info(f"开始获取GitHub热榜数据: language={language}, since={since}")
-            
-            # 发送请求（带重试机制）
-            response = self._make_request_with_retry(url, params)
+            with REGISTRY.timer("hotweek_fetch_query_seconds", language=language, since=since):
+                url, params = self._build_query(language, since)
+                
+                logger.info(f"开始获取GitHub热榜数据: language={language}, since={since}")
+                
+                cached = self._get_fresh_cache(url, params)
+                if cached is not None:
+                    return cached
+                
+                # 发送请求（带重试机制）
+                response = self._make_request_with_retry(url, params, headers=self._conditional_headers(url, params))
+                data = self._parse_response(response, url, params)
+                return data if data is not None else self._get_stale_cache(url, params, (language, since))
+                
+        except Exception as e:
+            logger.error(f"获取热榜数据时发生异常: {str(e)}")
+            return None
+    
+    async def fetch_trending_repositories_async(self, language: str = "", since: str = "weekly",
+                                                limiter: Optional[AsyncRateLimiter] = None) -> Optional[List[Dict]]:
+        """
+        异步获取GitHub热榜仓库数据
+        
+        Args:
+            language: 编程语言筛选（空字符串表示所有语言）
+            since: 时间范围（daily, weekly, monthly）
+            limiter: 共享的限速器（为None时不限速）
             
-            if response and response.status_code == 200:
-                data = response.json()
-                logger.info(f"成功获取 {len(data)} 个热榜项目")
-                return data
-            else:
-                logger.error(f"API请求失败: 状态码 {response.status_code if response else '无响应'}")
-                return None
+        Returns:
+            仓库数据列表或None（获取失败时）
+        """
+        try:
+            with REGISTRY.timer("hotweek_fetch_query_seconds", language=language, since=since):
+                url, params = self._build_query(language, since)
+                
+                logger.info(f"开始异步获取GitHub热榜数据: language={language}, since={since}")
+                
+                cached = self._get_fresh_cache(url, params)
+                if cached is not None:
+                    return cached
+                
+                response = await self._make_request_with_retry_async(
+                    url, params, limiter, headers=self._conditional_headers(url, params)
+                )
+                data = self._parse_response(response, url, params)
+                return data if data is not None else self._get_stale_cache(url, params, (language, since))
                 
         except Exception as e:
             logger.error(f"获取热榜数据时发生异常: {str(e)}")
             return None
     
-    def _make_request_with_retry(self, url: str, params: Dict, max_retries: int = 3) -> Optional[requests.Response]:
+    def _build_query(self, language: str, since: str) -> Tuple[str, Dict]:
+        """构建API URL和查询参数"""
+        url = f"{self.base_url}/repositories"
+        params = {"since": since}
+        if language:
+            params["language"] = language
+        return url, params
+    
+    def _get_fresh_cache(self, url: str, params: Dict) -> Optional[List[Dict]]:
+        """获取新鲜期内的缓存数据（未启用缓存时返回None）"""
+        if not self.cache:
+            return None
+        data = self.cache.get_fresh(url, params)
+        if data is not None:
+            REGISTRY.inc("hotweek_fetch_cache_hits_total", type="fresh")
+            logger.info(f"使用缓存数据: {len(data)} 个热榜项目")
+        return data
+    
+    def _get_stale_cache(self, url: str, params: Dict, query: Tuple[str, str]) -> Optional[List[Dict]]:
+        """请求失败或端点熔断时使用上次成功获取的缓存数据（未启用缓存或没有缓存时返回None）"""
+        if not self.cache:
+            return None
+        data = self.cache.get_stale(url, params)
+        if data is not None:
+            self.stale_queries.add(query)
+            REGISTRY.inc("hotweek_fetch_cache_hits_total", type="stale")
+            logger.warning(f"API不可用，使用上次成功获取的缓存数据: {len(data)} 个热榜项目")
+        return data
+    
+    def _breaker_allows(self, url: str) -> bool:
+        """熔断器是否允许发送请求（拒绝时记录）"""
+        if self.breaker is None or self.breaker.allow_request(url):
+            return True
+        REGISTRY.inc("hotweek_fetch_circuit_open_total")
+        logger.warning(f"API端点已熔断，不发送请求: {url}")
+        return False
+    
+    def _breaker_open(self, url: str) -> bool:
+        """端点是否处于熔断（或半开探测已被占用）状态，此时不再等待重试"""
+        return self.breaker is not None and self.breaker.state(url) != CLOSED and not self.breaker.is_probe(url)
+    
+    def _record_health(self, url: str, response: Optional[requests.Response] = None, error: str = "") -> None:
+        """把请求结果记入熔断器（有响应且非5xx视为端点可用）"""
+        if self.breaker is None:
+            return
+        if response is not None and response.status_code < 500:
+            self.breaker.record_success(url)
+        else:
+            self.breaker.record_failure(url, error or f"HTTP {response.status_code if response is not None else '无响应'}")
+    
+    def _request_timeout(self, url: str) -> float:
+        """请求超时：半开探测使用较短的超时"""
+        return PROBE_TIMEOUT if self.breaker is not None and self.breaker.is_probe(url) else 30
+    
+    def _conditional_headers(self, url: str, params: Dict) -> Dict[str, str]:
+        """构建条件请求头（未启用缓存时为空）"""
+        return self.cache.conditional_headers(url, params) if self.cache else {}
+    
+    def _parse_response(self, response: Optional[requests.Response], url: str = "",
+                        params: Optional[Dict] = None) -> Optional[List[Dict]]:
+        """解析API响应（304时返回缓存内容），失败时返回None"""
+        if response is not None and response.status_code == 304 and self.cache:
+            data = self.cache.revalidate(url, params)
+            if data is not None:
+                REGISTRY.inc("hotweek_fetch_cache_hits_total", type="revalidated")
+                logger.info(f"数据未变化(304)，使用缓存数据: {len(data)} 个热榜项目")
+                return data
+            logger.error("收到304响应但缓存条目已不存在")
+            return None
+        
+        if response is not None and response.status_code == 200:
+            data = response.json()
+            REGISTRY.inc("hotweek_records_total", len(data), stage="fetched")
+            logger.info(f"成功获取 {len(data)} 个热榜项目")
+            if self.cache:
+                self.cache.store(url, params, response.headers, data)
+            return data
+        else:
+            logger.error(f"API请求失败: 状态码 {response.status_code if response is not None else '无响应'}")
+            return None
+    
+    def fetch_trending_batch(self, languages: Iterable[str] = ("",),
+                             periods: Iterable[str] = TRENDING_PERIODS,
+                             max_workers: Optional[int] = None,
+                             queries: Optional[Iterable[Tuple[str, str]]] = None) -> Dict[Tuple[str, str], Optional[List[Dict]]]:
+        """
+        并发获取多个（语言, 时间范围）组合的热榜数据
+        
+        所有请求共享同一个Session，总耗时取决于最慢的单个请求而不是所有请求之和。
+        
+        Args:
+            languages: 编程语言列表（空字符串表示所有语言）
+            periods: 时间范围列表（daily, weekly, monthly）
+            max_workers: 最大并发数，默认使用初始化时的设置
+            queries: 指定 (language, since) 查询列表，优先于 languages × periods（只获取部分组合时使用）
+            
+        Returns:
+            以 (language, since) 为键的结果字典，获取失败的查询值为None
+        """
+        queries = build_queries(languages, periods) if queries is None else list(dict.fromkeys(queries))
+        results: Dict[Tuple[str, str], Optional[List[Dict]]] = {}
+        if not queries:
+            return results
+        
+        workers = max(1, min(max_workers or self.max_workers, len(queries)))
+        logger.info(f"开始批量获取热榜数据: {len(queries)} 个查询，并发数 {workers}")
+        start_time = time.time()
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(self.fetch_trending_repositories, language, since): (language, since)
+                for language, since in queries
+            }
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+        
+        failed = sum(1 for data in results.values() if data is None)
+        logger.info(f"批量获取完成: 成功 {len(queries) - failed} 个，失败 {failed} 个 (耗时: {time.time() - start_time:.2f}秒)")
+        # 按查询顺序返回结果
+        return {query: results[query] for query in queries}
+    
+    async def fetch_trending_batch_async(self, languages: Iterable[str] = ("",),
+                                         periods: Iterable[str] = TRENDING_PERIODS,
+                                         rate: float = 5.0, burst: int = 5,
+                                         max_workers: Optional[int] = None,
+                                         queries: Optional[Iterable[Tuple[str, str]]] = None) -> Dict[Tuple[str, str], Optional[List[Dict]]]:
+        """
+        异步并发获取多个（语言, 时间范围）组合的热榜数据
+        
+        所有请求共享一个令牌桶限速器；某个查询遇到429时只有该查询等待，其他查询继续进行。
+        
+        Args:
+            languages: 编程语言列表（空字符串表示所有语言）
+            periods: 时间范围列表（daily, weekly, monthly）
+            rate: 全局每秒请求数上限
+            burst: 允许的突发请求数
+            max_workers: 同时进行中的最大请求数，默认使用初始化时的设置
+            queries: 指定 (language, since) 查询列表，优先于 languages × periods
+            
+        Returns:
+            以 (language, since) 为键的结果字典，获取失败的查询值为None
+        """
+        queries = build_queries(languages, periods) if queries is None else list(dict.fromkeys(queries))
+        if not queries:
+            return {}
+        
+        limiter = AsyncRateLimiter(rate=rate, capacity=burst)
+        semaphore = asyncio.Semaphore(max(1, max_workers or self.max_workers))
+        logger.info(f"开始异步批量获取热榜数据: {len(queries)} 个查询，限速 {rate} 次/秒")
+        start_time = time.time()
+        
+        async def fetch_one(language: str, since: str) -> Optional[List[Dict]]:
+            async with semaphore:
+                return await self.fetch_trending_repositories_async(language, since, limiter)
+        
+        data_list = await asyncio.gather(*(fetch_one(language, since) for language, since in queries))
+        results = dict(zip(queries, data_list))
+        
+        failed = sum(1 for data in data_list if data is None)
+        logger.info(f"异步批量获取完成: 成功 {len(queries) - failed} 个，失败 {failed} 个 (耗时: {time.time() - start_time:.2f}秒)")
+        return results
+    
+    def _record_response(self, response: requests.Response) -> None:
+        """记录请求状态码和下载的字节数"""
+        REGISTRY.inc("hotweek_fetch_requests_total", status=response.status_code)
+        if response.status_code == 429:
+            REGISTRY.inc("hotweek_fetch_rate_limited_total")
+        REGISTRY.inc("hotweek_fetch_bytes_total", len(response.content))
+    
+    def _make_request_with_retry(self, url: str, params: Dict, max_retries: int = 3,
+                                 headers: Optional[Dict[str, str]] = None) -> Optional[requests.Response]:
         """
         带重试机制的请求方法
         
@@ -83,31 +412,93 @@ class GitHubTrendingFetcher:
             url: 请求URL
             params: 请求参数
             max_retries: 最大重试次数
+            headers: 额外的请求头（如条件请求头）
             
         Returns:
             响应对象或None（所有重试都失败时）
         """
         for attempt in range(max_retries):
+            if not self._breaker_allows(url):
+                return None
+            if attempt:
+                REGISTRY.inc("hotweek_fetch_retries_total")
             try:
-                response = self.session.get(url, params=params, timeout=30)
+                response = self.session.get(url, params=params, headers=headers, timeout=self._request_timeout(url))
+                self._record_response(response)
+                self._record_health(url, response)
                 
-                if response.status_code == 200:
+                if response.status_code in (200, 304):
                     return response
                 elif response.status_code == 429:  # 速率限制
-                    wait_time = (2 ** attempt) * 10  # 指数退避
-                    logger.warning(f"速率限制，等待 {wait_time} 秒后重试...")
+                    # 优先使用服务端给出的等待时间，否则指数退避
+                    wait_time = parse_retry_after(response, default=(2 ** attempt) * 10)
+                    logger.warning(f"速率限制，等待 {wait_time:.1f} 秒后重试...")
                     time.sleep(wait_time)
                 else:
                     logger.warning(f"请求失败，状态码: {response.status_code}，尝试 {attempt + 1}/{max_retries}")
                     
             except requests.exceptions.RequestException as e:
+                REGISTRY.inc("hotweek_fetch_requests_total", status="error")
+                self._record_health(url, error=type(e).__name__)
                 logger.warning(f"网络请求异常: {str(e)}，尝试 {attempt + 1}/{max_retries}")
             
-            # 最后一次尝试前等待
-            if attempt < max_retries - 1:
+            # 最后一次尝试前等待（端点已熔断时不再等待）
+            if attempt < max_retries - 1 and not self._breaker_open(url):
                 time.sleep(2)
         
         return None
+    
+    async def _make_request_with_retry_async(self, url: str, params: Dict,
+                                             limiter: Optional[AsyncRateLimiter] = None,
+                                             max_retries: int = 3,
+                                             headers: Optional[Dict[str, str]] = None) -> Optional[requests.Response]:
+        """
+        带重试机制的异步请求方法
+        
+        阻塞的HTTP调用在线程中执行，所有等待都使用 asyncio.sleep，不会阻塞事件循环。
+        
+        Args:
+            url: 请求URL
+            params: 请求参数
+            limiter: 共享的限速器（为None时不限速）
+            max_retries: 最大重试次数
+            headers: 额外的请求头（如条件请求头）
+            
+        Returns:
+            响应对象或None（所有重试都失败时）
+        """
+        for attempt in range(max_retries):
+            if not self._breaker_allows(url):
+                return None
+            if attempt:
+                REGISTRY.inc("hotweek_fetch_retries_total")
+            wait_time = 2
+            try:
+                if limiter:
+                    await limiter.acquire()
+                response = await asyncio.to_thread(self.session.get, url, params=params,
+                                                   headers=headers, timeout=self._request_timeout(url))
+                self._record_response(response)
+                self._record_health(url, response)
+                
+                if response.status_code in (200, 304):
+                    return response
+                elif response.status_code == 429:  # 速率限制
+                    wait_time = parse_retry_after(response, default=(2 ** attempt) * 10)
+                    logger.warning(f"速率限制，等待 {wait_time:.1f} 秒后重试...")
+                else:
+                    logger.warning(f"请求失败，状态码: {response.status_code}，尝试 {attempt + 1}/{max_retries}")
+                    
+            except requests.exceptions.RequestException as e:
+                REGISTRY.inc("hotweek_fetch_requests_total", status="error")
+                self._record_health(url, error=type(e).__name__)
+                logger.warning(f"网络请求异常: {str(e)}，尝试 {attempt + 1}/{max_retries}")
+            
+            # 最后一次尝试前等待（端点已熔断时不再等待）
+            if attempt < max_retries - 1 and not self._breaker_open(url):
+                await asyncio.sleep(wait_time)
+        
+        return None
 
     def get_mock_data(self) -> List[Dict]:
         """
@@ -190,12 +581,11 @@ class GitHubTrendingFetcher:
             filename: 数据文件名
             
         Returns:
-            现有数据字典或None（文件不存在时）
+            现有数据字典或None（文件不存在时），其中的仓库数据为 RepositoryRecord
         """
         try:
-            if os.path.exists(filename):
-                with open(filename, 'r', encoding='utf-8') as f:
-                    existing_data = json.load(f)
+            if self.storage.exists(filename):
+                existing_data = load_records(self.storage.load(filename))
                 logger.info(f"成功加载现有数据文件: {filename}")
                 return existing_data
             else:
@@ -205,6 +595,7 @@ class GitHubTrendingFetcher:
             logger.error(f"加载现有数据文件失败: {str(e)}")
             return None
     
+    @timed()
     def remove_duplicates(self, new_data: List[Dict], existing_data: Optional[Dict]) -> List[Dict]:
         """
         去除重复数据
@@ -219,69 +610,226 @@ class GitHubTrendingFetcher:
         if not existing_data or 'repositories' not in existing_data:
             return new_data
         
-        existing_repos = existing_data.get('repositories', [])
-        existing_urls = {repo.get('url', '') for repo in existing_repos if repo.get('url')}
+        # 去重逻辑：基于规范化的仓库键（owner/name）去重
+        unique_new_data = self.get_index(existing_data).filter_new(new_data)
         
-        # 去重逻辑：基于URL去重
-        unique_new_data = []
-        for repo in new_data:
-            repo_url = repo.get('url', '')
-            if repo_url and repo_url not in existing_urls:
-                unique_new_data.append(repo)
-            elif repo_url:
-                logger.info(f"跳过重复项目: {repo.get('full_name', repo_url)}")
+        skipped = len(new_data) - len(unique_new_data)
+        if skipped:
+            logger.info(f"跳过 {skipped} 个重复项目")
         
         logger.info(f"去重后新增 {len(unique_new_data)} 个项目")
         return unique_new_data
     
-    def merge_data(self, new_data: List[Dict], existing_data: Optional[Dict], max_total: int = 100) -> Dict:
+    def get_index(self, existing_data: Optional[Dict]) -> RepositoryIndex:
+        """
+        获取现有数据的仓库索引
+        
+        索引与仓库列表对象绑定，同一份数据重复合并/去重时不会重新构建。
+        
+        Args:
+            existing_data: 现有数据
+            
+        Returns:
+            仓库索引
+        """
+        existing_repos = (existing_data or {}).get('repositories', [])
+        if self._index is None or self._indexed_repos is not existing_repos:
+            self._index = RepositoryIndex(existing_repos)
+            self._indexed_repos = existing_repos
+        return self._index
+    
+    @timed()
+    def merge_data(self, new_data: List[Dict], existing_data: Optional[Dict], max_total: int = 100,
+                   upsert: bool = False) -> Dict:
         """
         合并新旧数据
         
+        本次获取到的项目（新增和刷新的）按获取顺序排在最前，其余现有项目保持原有顺序在后，
+        列表因此始终按 last_seen 从新到旧排列；超过 max_total 时淘汰最久未出现的项目。
+        
         Args:
             new_data: 新获取的数据
             existing_data: 现有数据
             max_total: 最大保留项目数
+            upsert: 是否原地刷新已存在项目的统计数据（否则直接丢弃重复项目）
             
         Returns:
             合并后的数据
         """
+        now = datetime.now().isoformat()
+        updated = 0
+        
         if not existing_data:
             # 没有现有数据，直接使用新数据
-            repositories = new_data
+            if upsert:
+                repositories = RepositoryIndex().filter_new(new_data)
+            else:
+                # 不去重，但同样跳过无法识别的项目
+                repositories = [repo for repo in new_data if normalize_repo_key(repo)]
+                if len(repositories) < len(new_data):
+                    logger.warning(f"跳过 {len(new_data) - len(repositories)} 个缺少URL和名称的项目")
+            new_added = len(repositories)
+            for repo in repositories:
+                self._stamp_new_record(repo, now)
         else:
-            # 合并数据，新数据在前，旧数据在后
             existing_repos = existing_data.get('repositories', [])
+            index = self.get_index(existing_data)
             
-            # 获取现有数据的URL集合（用于去重）
-            existing_urls = {repo.get('url', '') for repo in existing_repos if repo.get('url')}
+            # 基于索引过滤出新项目（O(新数据量)）；已存在的项目刷新最近出现时间，
+            # upsert模式下同时刷新统计数据
+            filtered_new_data, fetched, updated = self._upsert_records(new_data, index, now, refresh_stats=upsert)
+            new_added = len(filtered_new_data)
             
-            # 过滤掉现有数据中已存在的项目
-            filtered_new_data = [repo for repo in new_data if repo.get('url', '') not in existing_urls]
+            # 旧格式的数据不保证按 last_seen 排序，首次合并时排序一次
+            existing_metadata = existing_data.get('metadata', {})
+            if existing_metadata.get('sorted_by') != SORTED_BY:
+                existing_repos = self._sort_by_last_seen(existing_repos, existing_metadata.get('last_updated') or now)
             
-            # 合并数据：新数据在前，现有数据在后
-            repositories = filtered_new_data + existing_repos
+            # 合并数据：本次获取到的项目在前，其余现有项目在后
+            fetched_ids = {id(repo) for repo in fetched}
+            repositories = fetched + [repo for repo in existing_repos if id(repo) not in fetched_ids]
             
-            # 限制总数量，保留最新的项目
+            # 限制总数量，淘汰最久未出现的项目
+            trimmed = []
             if len(repositories) > max_total:
+                trimmed = repositories[max_total:]
                 repositories = repositories[:max_total]
-                logger.info(f"数据量超过限制，保留最新的 {max_total} 个项目")
+                logger.info(f"数据量超过限制，保留最近出现的 {max_total} 个项目")
+            
+            # 增量维护索引，使其对应合并后的列表，下次合并无需重建
+            for repo in filtered_new_data:
+                index.add(repo)
+            for repo in trimmed:
+                if index.get(repo) is repo:
+                    index.remove(repo)
+            self._indexed_repos = repositories
         
         # 构建输出数据
         output_data = {
             "metadata": {
-                "last_updated": datetime.now().isoformat(),
+                "last_updated": now,
                 "count": len(repositories),
                 "source": "GitHub Trending API",
                 "total_merged": len(repositories),
-                "new_added": len(new_data) if not existing_data else len([r for r in new_data if r.get('url', '') not in {repo.get('url', '') for repo in existing_data.get('repositories', [])}])
+                "new_added": new_added,
+                "fetch_fingerprint": compute_fingerprint(new_data),
+                "sorted_by": SORTED_BY
             },
             "repositories": repositories
         }
+        if upsert:
+            output_data["metadata"]["updated"] = updated
+        self._record_merge(len(new_data), new_added, updated)
         
         return output_data
     
-    def save_to_file(self, data: List[Dict], filename: str = "../data/trending.json", merge: bool = True) -> bool:
+    def _record_merge(self, fetched: int, new_added: int, updated: int) -> None:
+        """记录合并结果：新增、刷新统计数据、已存在或重复的记录数"""
+        REGISTRY.inc("hotweek_records_total", new_added, stage="merged")
+        REGISTRY.inc("hotweek_records_total", updated, stage="updated")
+        REGISTRY.inc("hotweek_records_total", fetched - new_added, stage="deduplicated")
+    
+    def _upsert_records(self, new_data: List[Dict], index: RepositoryIndex, now: str,
+                        refresh_stats: bool = True) -> Tuple[List[Dict], List[Dict], int]:
+        """
+        将新数据合并进索引：已存在的记录原地刷新，返回真正的新记录和本次获取到的全部记录
+        
+        Args:
+            new_data: 新获取的数据
+            index: 现有数据的仓库索引（记录与现有列表共享同一对象）
+            now: 当前时间（ISO格式）
+            refresh_stats: 是否刷新已存在记录的统计数据（否则只刷新出现时间）
+            
+        Returns:
+            (新记录列表, 按获取顺序排列的新增和刷新记录, 统计数据发生变化的已有记录数)
+        """
+        new_records = []
+        fetched = []
+        # 本批数据中已处理过的键（新增或刷新）
+        added_keys = set()
+        updated = 0
+        unkeyed = 0
+        
+        for repo in new_data:
+            key = normalize_repo_key(repo)
+            if not key:
+                # 缺少URL和名称的项目无法识别，不合并
+                unkeyed += 1
+                continue
+            if key in added_keys:
+                # 本批数据内部的重复项目
+                continue
+            
+            existing = index.get(key)
+            if existing is not None:
+                if self._refresh_record(existing, repo, now, refresh_stats):
+                    updated += 1
+                added_keys.add(key)
+                fetched.append(existing)
+                continue
+            
+            self._stamp_new_record(repo, now)
+            index.add(repo)
+            added_keys.add(key)
+            new_records.append(repo)
+            fetched.append(repo)
+        
+        if unkeyed:
+            logger.warning(f"跳过 {unkeyed} 个缺少URL和名称的项目")
+        return new_records, fetched, updated
+    
+    def _sort_by_last_seen(self, repositories: List[Dict], fallback_seen: str) -> List[Dict]:
+        """
+        按 last_seen 从新到旧稳定排序（旧格式数据迁移用）
+        
+        没有 last_seen 的记录以 fallback_seen（文件的 last_updated）补齐，与清理时的处理一致。
+        """
+        for repo in repositories:
+            if not repo.get('last_seen'):
+                repo['last_seen'] = fallback_seen
+        return sorted(repositories, key=lambda repo: repo['last_seen'], reverse=True)
+    
+    def _stamp_new_record(self, repo: Dict, now: str) -> None:
+        """为新记录设置首次/最近出现时间和出现次数"""
+        repo.setdefault('first_seen', now)
+        repo['last_seen'] = now
+        repo.setdefault('seen_count', 1)
+    
+    def _refresh_record(self, existing: Dict, repo: Dict, now: str, refresh_stats: bool = True) -> bool:
+        """
+        用新数据刷新已有记录（保留首次出现时间）
+        
+        Returns:
+            统计数据或描述是否发生变化
+        """
+        changed = False
+        if refresh_stats:
+            for field in UPSERT_FIELDS:
+                if field in repo and existing.get(field) != repo[field]:
+                    existing[field] = repo[field]
+                    changed = True
+        
+        existing.setdefault('first_seen', existing.get('last_seen', now))
+        existing['last_seen'] = now
+        existing['seen_count'] = existing.get('seen_count', 1) + 1
+        return changed
+    
+    def is_unchanged(self, new_data: List[Dict], existing_data: Optional[Dict]) -> bool:
+        """
+        判断本次获取的数据是否与上次获取的完全相同
+        
+        Args:
+            new_data: 新获取的数据
+            existing_data: 现有数据（其元数据中记录了上次获取的指纹）
+            
+        Returns:
+            内容是否未变化
+        """
+        previous = (existing_data or {}).get('metadata', {}).get('fetch_fingerprint')
+        return bool(previous) and previous == compute_fingerprint(new_data)
+    
+    def save_to_file(self, data: List[Dict], filename: str = "../data/trending.json", merge: bool = True,
+                     upsert: bool = False) -> bool:
         """
         将数据保存到JSON文件（支持增量更新）
         
@@ -289,6 +837,7 @@ class GitHubTrendingFetcher:
             data: 要保存的数据
             filename: 文件名
             merge: 是否与现有数据合并
+            upsert: 合并时是否刷新已存在项目的统计数据
             
         Returns:
             保存是否成功
@@ -299,9 +848,11 @@ class GitHubTrendingFetcher:
                 existing_data = self.load_existing_data(filename)
                 
                 # 合并数据
-                output_data = self.merge_data(data, existing_data)
+                output_data = self.merge_data(data, existing_data, upsert=upsert)
                 
-                logger.info(f"数据合并完成: 新增 {output_data['metadata']['new_added']} 个项目，总计 {output_data['metadata']['total_merged']} 个项目")
+                logger.info(f"数据合并完成: 新增 {output_data['metadata']['new_added']} 个项目，"
+                            f"更新 {output_data['metadata'].get('updated', 0)} 个项目，"
+                            f"总计 {output_data['metadata']['total_merged']} 个项目")
             else:
                 # 直接覆盖模式
                 output_data = {
@@ -313,34 +864,351 @@ class GitHubTrendingFetcher:
                     "repositories": data
                 }
             
-            # 确保目录存在
-            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            self.write_output(output_data, data, filename)
+            return True
+            
+        except Exception as e:
+            logger.error(f"保存数据到文件失败: {str(e)}")
+            return False
+    
+    @timed()
+    def save_to_file_stream(self, data: List[Dict], filename: str = "../data/trending.json",
+                            max_total: int = 100, upsert: bool = False) -> bool:
+        """
+        流式合并并保存数据（结果与 save_to_file 相同，但不把现有数据整体载入内存）
+        
+        现有数据读取两遍：第一遍记录与新数据重复的现有记录并统计数量，
+        第二遍逐条写出（本次获取到的项目按获取顺序在前，其余现有项目在后），超过 max_total 后停止。
+        内存占用只与新数据量有关。尚未按 last_seen 排序的旧格式文件保持原有顺序，
+        不做 merge_data 的一次性排序（清理时按堆选出淘汰项目）。
+        
+        Args:
+            data: 要保存的数据
+            filename: 文件名
+            max_total: 最大保留项目数
+            upsert: 是否刷新已存在项目的统计数据
+            
+        Returns:
+            保存是否成功
+        """
+        try:
+            now = datetime.now().isoformat()
+            exists = self.storage.exists(filename)
+            
+            # 本批数据按键去重，保留首次出现的记录
+            incoming: Dict[str, Dict] = {}
+            unkeyed = 0
+            for repo in data:
+                key = normalize_repo_key(repo)
+                if not key:
+                    unkeyed += 1
+                elif key not in incoming:
+                    incoming[key] = repo
+            if unkeyed:
+                logger.warning(f"跳过 {unkeyed} 个缺少URL和名称的项目")
+            
+            # 第一遍：找出已存在的记录（重复键只有首次出现的记录会被刷新）并统计数量
+            matched: Dict[str, Dict] = {}
+            existing_count = 0
+            updated = 0
+            sorted_by = SORTED_BY
+            if exists:
+                reader = JSONStreamReader(filename)
+                for existing in self.storage.iter_repositories(filename, reader):
+                    existing_count += 1
+                    key = normalize_repo_key(existing)
+                    if key in incoming and key not in matched:
+                        matched[key] = existing
+                        repo = incoming[key]
+                        if upsert and any(field in repo and existing.get(field) != repo[field]
+                                          for field in UPSERT_FIELDS):
+                            updated += 1
+                fields = reader.fields or self.storage.load_fields(filename)
+                sorted_by = fields.get('metadata', {}).get('sorted_by')
+            
+            # 保持与 merge_data 相同的顺序：按本批数据顺序排列的新项目和刷新后的已有项目
+            new_records = []
+            fetched = []
+            for repo in data:
+                key = normalize_repo_key(repo)
+                if key in matched:
+                    existing = matched[key]
+                    if existing is not None:
+                        self._refresh_record(existing, repo, now, refresh_stats=upsert)
+                        fetched.append(existing)
+                        matched[key] = None
+                    continue
+                if not key or ((exists or upsert) and incoming[key] is not repo):
+                    continue
+                self._stamp_new_record(repo, now)
+                new_records.append(repo)
+                fetched.append(repo)
+            
+            total = len(fetched)
+            if exists:
+                total = min(len(fetched) + existing_count - len(matched), max_total)
+                if len(fetched) + existing_count - len(matched) > max_total:
+                    logger.info(f"数据量超过限制，保留最近出现的 {max_total} 个项目")
+            
+            metadata = {
+                "last_updated": now,
+                "count": total,
+                "source": "GitHub Trending API",
+                "total_merged": total,
+                "new_added": len(new_records),
+                "fetch_fingerprint": compute_fingerprint(data)
+            }
+            if sorted_by == SORTED_BY:
+                metadata["sorted_by"] = SORTED_BY
+            if upsert:
+                metadata["updated"] = updated
+            
+            # 第二遍：本次获取到的项目在前，其余现有项目在后逐条写出（跳过已刷新并前移的记录）
+            def merged_records():
+                yield from fetched[:total]
+                if not exists:
+                    return
+                moved = set()
+                remaining = total - min(len(fetched), total)
+                for existing in self.storage.iter_repositories(filename):
+                    if remaining <= 0:
+                        break
+                    key = normalize_repo_key(existing)
+                    if key in matched and key not in moved:
+                        moved.add(key)
+                        continue
+                    remaining -= 1
+                    yield existing
+            
+            self.storage.save_stream(merged_records(), filename, header={"metadata": metadata})
+            self._index = self._indexed_repos = None
+            self._record_merge(len(data), len(new_records), updated)
             
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(output_data, f, ensure_ascii=False, indent=2)
+            logger.info(f"数据合并完成: 新增 {metadata['new_added']} 个项目，"
+                        f"更新 {updated} 个项目，总计 {total} 个项目")
             
-            logger.info(f"数据已保存到: {filename}")
+            self.storage.record_snapshot(data, metadata)
+            if self.snapshot_log:
+                self.snapshot_log.append(data, metadata)
+            logger.info(f"数据已保存到: {filename} (存储后端: {self.storage.name}，流式写入)")
             return True
             
         except Exception as e:
             logger.error(f"保存数据到文件失败: {str(e)}")
             return False
+    
+    def write_output(self, output_data: Dict, fetched_data: List[Dict],
+                     filename: str = "../data/trending.json") -> None:
+        """
+        写入合并后的数据并记录本次获取的快照
+        
+        Args:
+            output_data: 合并后的数据
+            fetched_data: 本次获取到的原始数据
+            filename: 文件名
+        """
+        self.storage.save(output_data, filename)
+        # 记录本次获取的快照（JSON后端不保存历史）
+        self.storage.record_snapshot(fetched_data, output_data['metadata'])
+        if self.snapshot_log:
+            self.snapshot_log.append(fetched_data, output_data['metadata'])
+        
+        logger.info(f"数据已保存到: {filename} (存储后端: {self.storage.name})")
+
+def build_queries(languages: Iterable[str], periods: Iterable[str]) -> List[Tuple[str, str]]:
+    """语言和时间范围的所有组合（去重并保持顺序）"""
+    return [(language, since) for language in dict.fromkeys(languages) for since in dict.fromkeys(periods)]
+
+
+def record_polls(planner: AdaptivePollingPlanner, results: Dict[Tuple[str, str], Optional[List[Dict]]],
+                 stale: Iterable[Tuple[str, str]] = ()) -> None:
+    """
+    把各查询的获取结果记入自适应轮询状态
+    
+    Args:
+        planner: 轮询计划
+        results: 以 (language, since) 为键的获取结果
+        stale: 请求失败、使用了过期缓存数据的查询（按失败处理，不计入变化统计）
+    """
+    stale = set(stale)
+    changed = []
+    for (language, since), data in results.items():
+        if data is None or (language, since) in stale:
+            planner.record_failure(language, since)
+        elif planner.observe(language, since, compute_fingerprint(data)):
+            changed.append(f"{language or '所有语言'}/{since}")
+    planner.save()
+    logger.info(f"自适应轮询: {len(changed)}/{len(results)} 个查询的结果有变化" +
+                (f"（{', '.join(changed)}）" if changed else ""))
+
+
+def flatten_batch_results(results: Dict[Tuple[str, str], Optional[List[Dict]]]) -> List[Dict]:
+    """
+    将批量获取结果展开为单个列表（按URL去重，保留首次出现的记录）
+    
+    Args:
+        results: fetch_trending_batch 的返回值
+        
+    Returns:
+        仓库数据列表
+    """
+    seen_urls = set()
+    repositories = []
+    for data in results.values():
+        for repo in data or []:
+            url = repo.get('url', '')
+            if url in seen_urls:
+                continue
+            if url:
+                seen_urls.add(url)
+            repositories.append(repo)
+    return repositories
 
 def main():
     """主函数"""
+    import argparse
+    
+    def period_list(value: str) -> List[str]:
+        """解析逗号分隔的时间范围列表，含未知取值时报错"""
+        periods = [period.strip() for period in value.split(",") if period.strip()]
+        unknown = [period for period in periods if period not in TRENDING_PERIODS]
+        if unknown or not periods:
+            raise argparse.ArgumentTypeError(
+                f"无效的时间范围: {', '.join(unknown) or value!r}（可选: {', '.join(TRENDING_PERIODS)}）"
+            )
+        return periods
+    
+    parser = argparse.ArgumentParser(description="GitHub热榜数据获取")
+    parser.add_argument(
+        "--languages",
+        default="",
+        help="逗号分隔的编程语言列表（留空表示所有语言）"
+    )
+    parser.add_argument(
+        "--periods",
+        type=period_list,
+        default="weekly",
+        help="逗号分隔的时间范围列表: daily,weekly,monthly"
+    )
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="使用异步后端批量获取（共享全局限速预算）"
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=5.0,
+        help="异步后端的全局每秒请求数上限"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="禁用HTTP响应缓存"
+    )
+    parser.add_argument(
+        "--no-circuit-breaker",
+        action="store_true",
+        help="禁用API端点熔断器（端点连续失败后不再快速失败）"
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="流式读取和写入数据文件（不把现有数据整体载入内存，适合大文件）"
+    )
+    parser.add_argument(
+        "--signal-unchanged",
+        action="store_true",
+        help=f"获取结果与上次相同时不写文件并以退出码 {NO_CHANGES_EXIT_CODE} 退出（供调度器跳过后续阶段）"
+    )
+    parser.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="自适应轮询：只获取到了轮询时间的查询，并按结果是否变化调整各查询的间隔"
+    )
+    parser.add_argument(
+        "--min-interval",
+        type=float,
+        default=MIN_INTERVAL / 60,
+        help="自适应轮询的最短间隔（分钟）"
+    )
+    parser.add_argument(
+        "--max-interval",
+        type=float,
+        default=MAX_INTERVAL / 60,
+        help="自适应轮询的最长间隔（分钟）"
+    )
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    
+    profiler = StageProfiler.from_args(args, "fetch_trending")
+    atexit.register(profiler.finish)
+    
+    languages = [lang.strip() for lang in args.languages.split(",")]
+    queries = build_queries(languages, args.periods)
+    
+    planner = None
+    if args.adaptive:
+        planner = AdaptivePollingPlanner(min_interval=args.min_interval * 60, max_interval=args.max_interval * 60)
+        due = planner.due_queries(queries)
+        if len(due) < len(queries):
+            REGISTRY.inc("hotweek_poll_skipped_total", len(queries) - len(due))
+            logger.info(f"自适应轮询: {len(queries) - len(due)} 个查询未到轮询时间，本次获取 {len(due)} 个")
+        if not due:
+            logger.info("所有查询都未到轮询时间，跳过本次获取")
+            return NO_CHANGES_EXIT_CODE if args.signal_unchanged else 0
+        queries = due
+    
     # 创建数据获取器实例
-    fetcher = GitHubTrendingFetcher()
+    cache = None if args.no_cache else HTTPCache()
+    breaker = None if args.no_circuit_breaker else CircuitBreaker()
+    fetcher = GitHubTrendingFetcher(cache=cache, snapshot_log=SnapshotLog(), breaker=breaker)
+    profiler.instrument(fetcher, "fetch_trending_repositories", "fetch_trending_batch", "fetch_trending_batch_async",
+                        "merge_data", "save_to_file_stream")
+    profiler.instrument(fetcher.storage, "load", "save")
     
-    # 获取热榜数据（所有语言，每周）
-    trending_data = fetcher.fetch_trending_repositories(language="", since="weekly")
+    # 获取热榜数据（默认：所有语言，每周）
+    if args.use_async:
+        results = asyncio.run(fetcher.fetch_trending_batch_async(rate=args.rate, queries=queries))
+    elif len(queries) == 1:
+        results = {queries[0]: fetcher.fetch_trending_repositories(language=queries[0][0], since=queries[0][1])}
+    else:
+        results = fetcher.fetch_trending_batch(queries=queries)
+    trending_data = flatten_batch_results(results)
+    if planner is not None:
+        record_polls(planner, results, stale=fetcher.stale_queries)
     
-    # 如果API调用失败，使用模拟数据
+    # 如果API调用失败且没有缓存：保留现有数据；还没有任何数据时使用模拟数据
+    filename = "../data/trending.json"
     if not trending_data:
+        if fetcher.storage.exists(filename):
+            logger.warning("API调用失败且没有可用的缓存数据，保留现有数据")
+            return NO_CHANGES_EXIT_CODE if args.signal_unchanged else 0
         logger.warning("API调用失败，使用模拟数据进行演示")
         trending_data = fetcher.get_mock_data()
     
-    # 保存数据（启用增量更新模式）
-    success = fetcher.save_to_file(trending_data, merge=True)
+    # 读取、合并、写入期间持有数据锁（网络请求不占用锁），避免与清理任务同时改写数据文件
+    try:
+        acquire_data_lock()
+    except LockTimeout as e:
+        logger.error(str(e))
+        return 1
+    
+    # 数据与上次获取完全相同时跳过写入（流式模式下只读取元数据）
+    if args.stream:
+        existing = fetcher.storage.load_fields(filename) if fetcher.storage.exists(filename) else None
+    else:
+        existing = fetcher.load_existing_data(filename)
+    if fetcher.is_unchanged(trending_data, existing):
+        logger.info("热榜数据与上次获取相同，跳过保存")
+        return NO_CHANGES_EXIT_CODE if args.signal_unchanged else 0
+    
+    # 保存数据（启用增量更新模式，刷新已有项目的统计数据）
+    if args.stream:
+        success = fetcher.save_to_file_stream(trending_data, filename, upsert=True)
+    else:
+        success = fetcher.save_to_file(trending_data, filename, merge=True, upsert=True)
     if success:
         logger.info("GitHub热榜数据获取完成（增量更新模式）！")
     else:
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+前端数据载荷
+
+功能：把处理后的数据编码为供网页加载的紧凑载荷——去掉可由前端计算的派生字段
+      （full_name、*_text、language_color），语言和颜色以表格存储、记录按下标引用，
+      记录以定长数组表示，压缩输出并生成预压缩的 .gz / .br 文件；
+      另可按页和语言拆分为分片文件和清单，供网页按需加载；
+      以及预先计算的搜索索引（词项倒排表、语言倒排表和各排序方式下的顺序）
+"""
+
+import gzip
+import json
+import logging
+import math
+import os
+import re
+from typing import Dict, List
+
+try:
+    import brotli
+except ImportError:  # brotli为可选依赖，未安装时只生成 .gz
+    brotli = None
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+PAYLOAD_VERSION = 1
+
+# 每条记录数组中各列的含义（前端按此顺序解码）
+PAYLOAD_FIELDS = ["author", "name", "url", "description", "language", "stars", "forks", "current_period_stars"]
+
+# 元数据中前端需要的字段
+PAYLOAD_METADATA_FIELDS = ("last_updated", "processed_at", "source", "total_repositories")
+
+DEFAULT_COLOR = '#6c757d'
+
+MANIFEST_FILE = "manifest.json"
+# 搜索索引的分词规则：连续的字母/数字（含中文等）为一个词项，下划线、连字符等视为分隔符
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+# 预先计算顺序的排序方式 -> 排序键（与网页的排序选项对应）
+SEARCH_SORT_KEYS = {
+    "stars": lambda repo: -(repo.get('stars') or 0),
+    "trending": lambda repo: -(repo.get('current_period_stars') or 0),
+    "forks": lambda repo: -(repo.get('forks') or 0),
+    "name": lambda repo: (repo.get('full_name') or f"{repo.get('author', '')}/{repo.get('name', '')}").casefold()
+}
+
+# 分片文件名前缀（写入新分片后，清理目录中不再使用的同类文件）
+SHARD_PREFIXES = ("all-", "lang-")
+
+
+def payload_filename(filename: str) -> str:
+    """处理后数据文件对应的载荷文件名（如 processed_trending.json -> processed_trending.min.json）"""
+    root, ext = os.path.splitext(filename)
+    return f"{root}.min{ext or '.json'}"
+
+
+def search_index_filename(filename: str) -> str:
+    """处理后数据文件对应的搜索索引文件名（如 processed_trending.json -> processed_trending.index.json）"""
+    root, ext = os.path.splitext(filename)
+    return f"{root}.index{ext or '.json'}"
+
+
+def shard_dirname(filename: str) -> str:
+    """处理后数据文件对应的分片目录（与数据文件同目录下的 shards/）"""
+    return os.path.join(os.path.dirname(filename), "shards")
+
+
+def encode_payload(processed_data: Dict) -> Dict:
+    """
+    将处理后的数据编码为紧凑载荷
+
+    url 为默认的 https://github.com/<author>/<name> 时存为 null，由前端还原。
+
+    Args:
+        processed_data: process_data 的输出
+
+    Returns:
+        载荷数据
+    """
+    repositories = processed_data.get('repositories', [])
+    metadata = processed_data.get('metadata', {})
+
+    languages: List[str] = []
+    colors: List[str] = []
+    language_index: Dict[str, int] = {}
+    rows = []
+
+    for repo in repositories:
+        language = repo.get('language') or 'Unknown'
+        index = language_index.get(language)
+        if index is None:
+            index = language_index[language] = len(languages)
+            languages.append(language)
+            colors.append(repo.get('language_color') or DEFAULT_COLOR)
+
+        author = repo.get('author', '')
+        name = repo.get('name', '')
+        url = repo.get('url', '')
+        if url == f"https://github.com/{author}/{name}":
+            url = None
+
+        rows.append([
+            author, name, url, repo.get('description') or '', index,
+            repo.get('stars', 0), repo.get('forks', 0), repo.get('current_period_stars', 0)
+        ])
+
+    return {
+        "version": PAYLOAD_VERSION,
+        "metadata": {key: metadata[key] for key in PAYLOAD_METADATA_FIELDS if key in metadata},
+        "fields": PAYLOAD_FIELDS,
+        "languages": languages,
+        "colors": colors,
+        # 语言筛选列表（与完整数据中的 languages 一致）
+        "language_filter": processed_data.get('languages', sorted(languages)),
+        "rows": rows
+    }
+
+
+def write_payload(processed_data: Dict, filename: str, precompress: bool = True) -> Dict[str, int]:
+    """
+    写入紧凑载荷及其预压缩文件
+
+    Args:
+        processed_data: 处理后的数据
+        filename: 载荷文件名
+        precompress: 是否同时生成 .gz（以及安装了brotli时的 .br）
+
+    Returns:
+        各输出文件名 -> 字节数
+    """
+    sizes = _write_json(encode_payload(processed_data), filename, precompress)
+    _record_sizes(sizes)
+    logger.info("前端载荷已写入: " + ", ".join(f"{path} ({size} 字节)" for path, size in sizes.items()))
+    return sizes
+
+
+def write_shards(processed_data: Dict, shard_dir: str, page_size: int = 12, precompress: bool = False) -> Dict:
+    """
+    按页和语言拆分写入分片文件及清单
+
+    记录保持处理后的顺序（按star数降序）：all-<页>.json 为全部项目的第N页，
+    lang-<语言序号>-<页>.json 为某一语言的第N页，均为紧凑载荷格式。
+    清单（manifest.json）记录每个范围的记录数、页数、文件名和汇总统计，
+    网页据此只加载当前页和所选语言的分片。
+
+    Args:
+        processed_data: 处理后的数据
+        shard_dir: 分片目录
+        page_size: 每页记录数（与网页每页显示的项目数一致）
+        precompress: 是否为每个分片生成预压缩文件
+
+    Returns:
+        清单数据
+    """
+    repositories = processed_data.get('repositories', [])
+    metadata = processed_data.get('metadata', {})
+
+    by_language: Dict[str, List[Dict]] = {}
+    for repo in repositories:
+        by_language.setdefault(repo.get('language') or 'Unknown', []).append(repo)
+    # 语言顺序与筛选列表一致，数据中未出现的语言不生成分片
+    languages = [lang for lang in processed_data.get('languages', sorted(by_language)) if lang in by_language]
+    languages += sorted(lang for lang in by_language if lang not in languages)
+
+    os.makedirs(shard_dir, exist_ok=True)
+    written = set()
+    total_bytes = 0
+
+    def write_scope(prefix: str, repos: List[Dict]) -> Dict:
+        nonlocal total_bytes
+        files = []
+        for page in range(max(1, math.ceil(len(repos) / page_size))):
+            name = f"{prefix}-{page}.json"
+            page_data = {
+                'metadata': metadata,
+                'repositories': repos[page * page_size:(page + 1) * page_size],
+                'languages': languages
+            }
+            path = os.path.join(shard_dir, name)
+            total_bytes += _write_json(encode_payload(page_data), path, precompress)[path]
+            written.add(name)
+            files.append(name)
+        return {
+            "count": len(repos),
+            "pages": len(files),
+            "files": files,
+            "stars": sum(repo.get('stars', 0) for repo in repos),
+            "current_period_stars": sum(repo.get('current_period_stars', 0) for repo in repos),
+            "language_count": len({repo.get('language') or 'Unknown' for repo in repos})
+        }
+
+    manifest = {
+        "version": PAYLOAD_VERSION,
+        "metadata": {key: metadata[key] for key in PAYLOAD_METADATA_FIELDS if key in metadata},
+        "page_size": page_size,
+        "all": write_scope("all", repositories),
+        "languages": [
+            {"name": lang, **write_scope(f"lang-{index}", by_language[lang])}
+            for index, lang in enumerate(languages)
+        ]
+    }
+    # 清单最后写入，网页不会读到指向尚未写入分片的清单
+    _write_json(manifest, os.path.join(shard_dir, MANIFEST_FILE), precompress)
+
+    # 删除记录减少或语言消失后残留的旧分片
+    for name in os.listdir(shard_dir):
+        base = name[:-len('.gz')] if name.endswith('.gz') else name[:-len('.br')] if name.endswith('.br') else name
+        if base.startswith(SHARD_PREFIXES) and base.endswith('.json') and base not in written:
+            os.remove(os.path.join(shard_dir, name))
+
+    # 分片文件数随数据变化，只记录总大小
+    REGISTRY.set("hotweek_file_bytes", total_bytes, file="shards")
+    logger.info(f"分片已写入: {shard_dir} (全部 {manifest['all']['pages']} 页，{len(languages)} 种语言)")
+    return manifest
+
+
+def tokenize(text) -> List[str]:
+    """将文本切分为小写词项"""
+    if not text:
+        return []
+    return TOKEN_PATTERN.findall(str(text).lower())
+
+
+def build_search_index(processed_data: Dict) -> Dict:
+    """
+    构建搜索索引
+
+    记录以其在处理后数据中的下标标识（与完整数据、紧凑载荷的顺序以及依次拼接的 all-* 分片一致）。
+    词项来自作者、名称、描述和语言，按字典序排列，前端可二分查找前缀匹配的词项范围；
+    orders 为各排序方式下的记录下标顺序，前端据此得到每条记录的名次，
+    筛选和排序的开销只与结果数量有关。
+
+    Args:
+        processed_data: 处理后的数据
+
+    Returns:
+        索引数据
+    """
+    repositories = processed_data.get('repositories', [])
+
+    postings: Dict[str, List[int]] = {}
+    languages: Dict[str, List[int]] = {}
+    for i, repo in enumerate(repositories):
+        tokens = set()
+        for field in ('author', 'name', 'description', 'language'):
+            tokens.update(tokenize(repo.get(field)))
+        for token in tokens:
+            postings.setdefault(token, []).append(i)
+        languages.setdefault(repo.get('language') or 'Unknown', []).append(i)
+
+    terms = sorted(postings)
+    return {
+        "version": PAYLOAD_VERSION,
+        "processed_at": processed_data.get('metadata', {}).get('processed_at'),
+        "count": len(repositories),
+        "terms": terms,
+        "postings": [postings[term] for term in terms],
+        "languages": languages,
+        "orders": {
+            # 排序稳定，同值记录保持处理后的顺序
+            name: sorted(range(len(repositories)), key=lambda i: key(repositories[i]))
+            for name, key in SEARCH_SORT_KEYS.items()
+        }
+    }
+
+
+def write_search_index(processed_data: Dict, filename: str, precompress: bool = True) -> Dict[str, int]:
+    """
+    写入搜索索引及其预压缩文件
+
+    Returns:
+        各输出文件名 -> 字节数
+    """
+    index = build_search_index(processed_data)
+    sizes = _write_json(index, filename, precompress)
+    _record_sizes(sizes)
+    logger.info(f"搜索索引已写入: {filename} ({len(index['terms'])} 个词项，{sizes[filename]} 字节)")
+    return sizes
+
+
+def _record_sizes(sizes: Dict[str, int]) -> None:
+    """记录输出文件大小"""
+    for path, size in sizes.items():
+        REGISTRY.set("hotweek_file_bytes", size, file=os.path.basename(path))
+
+
+def _write_json(data: Dict, filename: str, precompress: bool) -> Dict[str, int]:
+    """
+    原子写入压缩格式的JSON及其预压缩文件
+
+    Returns:
+        各输出文件名 -> 字节数
+    """
+    body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    outputs = {filename: body}
+    if precompress:
+        # mtime固定为0，内容不变时压缩结果也不变，避免无意义的提交
+        outputs[f"{filename}.gz"] = gzip.compress(body, compresslevel=9, mtime=0)
+        if brotli is not None:
+            outputs[f"{filename}.br"] = brotli.compress(body, quality=11)
+
+    directory = os.path.dirname(filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    for path, content in outputs.items():
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    # 未安装brotli时删除旧的 .br 文件，避免服务器继续提供过期内容
+    stale = f"{filename}.br"
+    if precompress and stale not in outputs and os.path.exists(stale):
+        os.remove(stale)
+        logger.warning(f"未安装brotli，已删除过期的预压缩文件: {stale}")
+
+    return {path: len(content) for path, content in outputs.items()}
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTTP响应磁盘缓存
+
+功能：按 (url, params) 缓存API响应体及其 ETag/Last-Modified，
+      支持条件请求（If-None-Match / If-Modified-Since）、TTL 和容量淘汰
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class HTTPCache:
+    """基于文件的HTTP响应缓存，每个 (url, params) 对应一个JSON文件"""
+
+    def __init__(self, cache_dir: str = "../cache/http", ttl: int = 600,
+                 max_entries: int = 500, max_bytes: int = 50 * 1024 * 1024):
+        """
+        初始化缓存
+
+        Args:
+            cache_dir: 缓存目录
+            ttl: 缓存新鲜期（秒），新鲜期内直接使用缓存而不发请求
+            max_entries: 最大缓存条目数
+            max_bytes: 缓存目录最大字节数
+        """
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _key(self, url: str, params: Optional[Dict]) -> str:
+        """根据URL和参数生成缓存键"""
+        raw = json.dumps([url, sorted((params or {}).items())], ensure_ascii=False)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _path(self, url: str, params: Optional[Dict]) -> str:
+        """缓存文件路径"""
+        return os.path.join(self.cache_dir, f"{self._key(url, params)}.json")
+
+    def _read(self, url: str, params: Optional[Dict]) -> Optional[Dict]:
+        """读取缓存条目，不存在或损坏时返回None"""
+        path = self._path(url, params)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"缓存文件损坏，已忽略: {path} ({str(e)})")
+            return None
+
+    def _write(self, url: str, params: Optional[Dict], entry: Dict) -> None:
+        """原子写入缓存条目"""
+        path = self._path(url, params)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    def get_fresh(self, url: str, params: Optional[Dict]) -> Optional[Any]:
+        """
+        获取新鲜期内的缓存内容
+
+        Returns:
+            缓存的响应体或None（无缓存或已过期时）
+        """
+        entry = self._read(url, params)
+        if entry and time.time() - entry.get('stored_at', 0) < self.ttl:
+            return entry.get('body')
+        return None
+
+    def get_stale(self, url: str, params: Optional[Dict]) -> Optional[Any]:
+        """获取缓存内容（忽略TTL）"""
+        entry = self._read(url, params)
+        return entry.get('body') if entry else None
+
+    def conditional_headers(self, url: str, params: Optional[Dict]) -> Dict[str, str]:
+        """
+        构建条件请求头
+
+        Returns:
+            包含 If-None-Match / If-Modified-Since 的请求头字典
+        """
+        entry = self._read(url, params)
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def revalidate(self, url: str, params: Optional[Dict]) -> Optional[Any]:
+        """
+        处理304响应：刷新缓存时间并返回缓存内容
+
+        Returns:
+            缓存的响应体或None（缓存已被淘汰时）
+        """
+        entry = self._read(url, params)
+        if not entry:
+            return None
+        entry['stored_at'] = time.time()
+        self._write(url, params, entry)
+        return entry.get('body')
+
+    def store(self, url: str, params: Optional[Dict], headers: Dict[str, str], body: Any) -> None:
+        """
+        保存响应到缓存
+
+        Args:
+            url: 请求URL
+            params: 请求参数
+            headers: 响应头
+            body: 解析后的响应体
+        """
+        entry = {
+            'url': url,
+            'params': params or {},
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'stored_at': time.time(),
+            'body': body
+        }
+        try:
+            self._write(url, params, entry)
+            self.evict()
+        except OSError as e:
+            logger.warning(f"写入HTTP缓存失败: {str(e)}")
+
+    def evict(self) -> int:
+        """
+        按最近写入时间淘汰缓存，直到满足条目数和字节数限制
+
+        Returns:
+            淘汰的条目数
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        entries.sort()
+        total_bytes = sum(size for _, size, _ in entries)
+        removed = 0
+
+        while entries and (len(entries) > self.max_entries or total_bytes > self.max_bytes):
+            _, size, path = entries.pop(0)
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_bytes -= size
+            removed += 1
+
+        if removed:
+            logger.info(f"HTTP缓存淘汰 {removed} 个条目")
+        return removed
+
+    def clear(self) -> None:
+        """清空缓存"""
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.json'):
+                os.remove(os.path.join(self.cache_dir, name))
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任务执行引擎
+
+功能：在工作线程池中执行定时任务，调度循环本身从不阻塞：
+    - 同一任务不会重叠运行：进程内按任务名互斥，跨进程（如手工执行 --mode once）由
+      <锁目录>/<任务>.lock 文件锁互斥；
+    - 任务运行期间错过的触发合并为一次，在本次运行结束后立即补跑，不会排队连续执行多次；
+    - 不同任务（完整更新与每日清理）可以同时运行，各脚本读写 data/*.json 时
+      由数据锁（locks.acquire_data_lock）串行化。
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from locks import FileLock
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOCK_DIR = "../logs/locks"
+DEFAULT_WORKERS = 2
+
+
+def run_exclusive(name: str, func: Callable[[], bool], lock_dir: str = DEFAULT_LOCK_DIR) -> Optional[bool]:
+    """
+    持有任务锁执行任务
+
+    Args:
+        name: 任务名称
+        func: 任务函数
+        lock_dir: 锁文件目录
+
+    Returns:
+        任务是否成功；已有同名任务在运行时不执行并返回None
+    """
+    lock = FileLock(os.path.join(lock_dir, f"{name}.lock"))
+    if not lock.acquire(blocking=False):
+        logger.warning(f"任务 {name} 已在运行（{lock.holder() or '持有者未知'}），跳过本次执行")
+        return None
+    try:
+        return bool(func())
+    finally:
+        lock.release()
+
+
+class JobEngine:
+    """任务执行引擎"""
+
+    def __init__(self, max_workers: int = DEFAULT_WORKERS, lock_dir: str = DEFAULT_LOCK_DIR):
+        """
+        初始化执行引擎
+
+        Args:
+            max_workers: 工作线程数（同时运行的任务数上限）
+            lock_dir: 任务锁文件目录
+        """
+        self.lock_dir = lock_dir
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Callable[[], bool]] = {}
+        # 正在运行（或已提交）的任务，以及运行期间错过的触发次数
+        self._running: Dict[str, Future] = {}
+        self._missed: Dict[str, int] = {}
+        self._triggered_at: Dict[str, float] = {}
+
+    def add_job(self, name: str, func: Callable[[], bool]) -> None:
+        """注册任务"""
+        self._jobs[name] = func
+
+    def trigger(self, name: str) -> bool:
+        """
+        触发任务（立即返回，由 schedule 的定时任务调用）
+
+        任务正在运行时只记录一次错过的触发，运行结束后补跑一次。
+
+        Returns:
+            是否提交了新的运行
+        """
+        with self._lock:
+            if name in self._running:
+                self._missed[name] = self._missed.get(name, 0) + 1
+                logger.info(f"任务 {name} 仍在运行，本次触发将在其结束后合并执行")
+                return False
+            self._triggered_at[name] = time.time()
+            self._running[name] = self._executor.submit(self._worker, name)
+            return True
+
+    def _worker(self, name: str) -> None:
+        """在工作线程中运行任务，直到没有错过的触发"""
+        while True:
+            delay = time.time() - self._triggered_at[name]
+            if delay >= 1:
+                logger.info(f"任务 {name} 等待工作线程 {delay:.1f} 秒后开始")
+            try:
+                run_exclusive(name, self._jobs[name], self.lock_dir)
+            except Exception as e:
+                logger.error(f"任务 {name} 运行异常: {str(e)}")
+
+            with self._lock:
+                missed = self._missed.pop(name, 0)
+                if not missed:
+                    del self._running[name]
+                    return
+                self._triggered_at[name] = time.time()
+            logger.info(f"任务 {name} 运行期间错过 {missed} 次触发，合并为一次立即执行")
+
+    def running_jobs(self) -> List[str]:
+        """正在运行的任务"""
+        with self._lock:
+            return sorted(self._running)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """停止接受新任务（wait为True时等待运行中的任务结束）"""
+        with self._lock:
+            self._missed.clear()
+        running = self.running_jobs()
+        if wait and running:
+            logger.info(f"等待运行中的任务结束: {', '.join(running)}")
+        self._executor.shutdown(wait=wait)
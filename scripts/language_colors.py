@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+编程语言颜色表
+
+功能：从数据文件（默认 scripts/language_colors.json，可由环境变量 HOTWEEK_LANGUAGE_COLORS 指定）
+      加载 语言 -> 颜色 对照表；并可从 GitHub Linguist 的 languages.yml 导入颜色，
+      生成或更新数据文件。仓库中的数据文件是热榜常见语言的精选子集，
+      不在表中的语言使用默认颜色；需要完整列表时导入Linguist：
+
+    python language_colors.py --import-linguist languages.yml
+
+导入时保留数据文件中已有的颜色（--overwrite 时以Linguist为准）。
+"""
+
+import json
+import logging
+import os
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+LANGUAGE_COLORS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "language_colors.json")
+DEFAULT_LANGUAGE_COLOR = '#6c757d'
+
+# 数据文件无法读取时使用的内置颜色
+BUILTIN_LANGUAGE_COLORS = {
+    'JavaScript': '#f1e05a',
+    'Python': '#3572A5',
+    'Java': '#b07219',
+    'TypeScript': '#2b7489',
+    'C++': '#f34b7d',
+    'C': '#555555',
+    'Go': '#00ADD8',
+    'Rust': '#dea584',
+    'Ruby': '#701516',
+    'PHP': '#4F5D95',
+    'Swift': '#ffac45',
+    'Kotlin': '#A97BFF',
+    'HTML': '#e34c26',
+    'CSS': '#563d7c',
+    'Vue': '#41b883',
+    'React': '#61dafb',
+    'Shell': '#89e051',
+    'Dockerfile': '#384d54',
+    'Unknown': '#6c757d'
+}
+
+
+def language_colors_file() -> str:
+    """颜色数据文件路径（环境变量 HOTWEEK_LANGUAGE_COLORS 优先）"""
+    return os.environ.get("HOTWEEK_LANGUAGE_COLORS") or LANGUAGE_COLORS_FILE
+
+
+def load_language_colors(filename: Optional[str] = None) -> Dict[str, str]:
+    """
+    加载颜色表
+
+    Args:
+        filename: 数据文件（JSON对象：语言 -> 颜色），默认为 language_colors_file()
+
+    Returns:
+        语言 -> 颜色（数据文件无法读取时返回内置颜色表）
+    """
+    filename = filename or language_colors_file()
+    try:
+        with open(filename, 'r', encoding='utf-8') as f:
+            colors = json.load(f)
+        if not isinstance(colors, dict):
+            raise ValueError("颜色表必须是JSON对象")
+        return {str(lang): str(color) for lang, color in colors.items() if color}
+    except (OSError, ValueError) as e:
+        logger.warning(f"无法加载语言颜色表 {filename}，使用内置颜色表: {e}")
+        return dict(BUILTIN_LANGUAGE_COLORS)
+
+
+def read_linguist_colors(filename: str) -> Dict[str, str]:
+    """
+    读取 GitHub Linguist 的 languages.yml 中定义了颜色的语言
+
+    Args:
+        filename: languages.yml 路径（需要安装PyYAML）；也可以是已转换为JSON的同结构文件
+
+    Returns:
+        语言 -> 颜色
+    """
+    with open(filename, 'r', encoding='utf-8') as f:
+        if filename.endswith('.json'):
+            languages = json.load(f)
+        else:
+            import yaml
+            languages = yaml.safe_load(f)
+
+    return {
+        name: attributes['color']
+        for name, attributes in languages.items()
+        if isinstance(attributes, dict) and attributes.get('color')
+    }
+
+
+def save_language_colors(colors: Dict[str, str], filename: str) -> None:
+    """按语言名（不区分大小写）排序写入颜色数据文件"""
+    ordered = dict(sorted(colors.items(), key=lambda item: item[0].lower()))
+    tmp_filename = f"{filename}.tmp"
+    with open(tmp_filename, 'w', encoding='utf-8') as f:
+        json.dump(ordered, f, ensure_ascii=False, indent=2)
+        f.write('\n')
+    os.replace(tmp_filename, filename)
+
+
+def main():
+    """主函数"""
+    import argparse
+
+    # 配置日志（作为库导入时由调用方配置）
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    parser = argparse.ArgumentParser(description="语言颜色表维护")
+    parser.add_argument(
+        "--import-linguist",
+        metavar="FILE",
+        required=True,
+        help="GitHub Linguist 的 languages.yml（或同结构的JSON文件）"
+    )
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="颜色数据文件（默认 scripts/language_colors.json）"
+    )
+    parser.add_argument(
+        "--overwrite",
+        action="store_true",
+        help="已有语言的颜色也以Linguist为准"
+    )
+    args = parser.parse_args()
+
+    output = args.output or language_colors_file()
+    try:
+        imported = read_linguist_colors(args.import_linguist)
+    except Exception as e:
+        logger.error(f"无法读取Linguist语言列表: {e}")
+        return 1
+
+    existing = load_language_colors(output) if os.path.exists(output) else dict(BUILTIN_LANGUAGE_COLORS)
+    colors = {**existing, **imported} if args.overwrite else {**imported, **existing}
+    save_language_colors(colors, output)
+    logger.info(f"语言颜色表已写入: {output}（共 {len(colors)} 种语言，新增 {len(set(colors) - set(existing))} 种）")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
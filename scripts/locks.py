@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件锁
+
+功能：基于操作系统文件锁（POSIX flock / Windows msvcrt.locking）的互斥锁，
+      进程崩溃时由系统自动释放，不会留下需要手工清理的锁。
+      用于防止同一任务重复运行，以及串行化对 data/*.json 的“读取-修改-写入”。
+"""
+
+import atexit
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+DATA_LOCK_FILE = ".hotweek.lock"
+# 等待数据锁的上限（秒），小于调度器对单个脚本的超时时间
+DATA_LOCK_TIMEOUT = 240
+
+
+class LockTimeout(Exception):
+    """在限定时间内未能获得锁"""
+
+
+class FileLock:
+    """文件锁（同一进程内的不同实例之间同样互斥）"""
+
+    def __init__(self, path: str, poll_interval: float = 0.2):
+        """
+        初始化文件锁
+
+        Args:
+            path: 锁文件路径（不存在时创建）
+            poll_interval: 阻塞等待时的重试间隔（秒）
+        """
+        self.path = path
+        self.poll_interval = poll_interval
+        self._fd: Optional[int] = None
+
+    @property
+    def locked(self) -> bool:
+        """当前实例是否持有锁"""
+        return self._fd is not None
+
+    def acquire(self, blocking: bool = True, timeout: Optional[float] = None) -> bool:
+        """
+        获取锁
+
+        Args:
+            blocking: 为False时立即返回
+            timeout: 阻塞等待的上限（秒），为None时一直等待
+
+        Returns:
+            是否获得锁
+        """
+        if self._fd is not None:
+            return True
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if self._try_lock(fd):
+                break
+            if not blocking or (deadline is not None and time.monotonic() >= deadline):
+                os.close(fd)
+                return False
+            time.sleep(self.poll_interval)
+
+        # 记录持有者，便于排查（锁本身不依赖文件内容）
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{os.getpid()} {datetime.now().isoformat()}\n".encode())
+        self._fd = fd
+        return True
+
+    @staticmethod
+    def _try_lock(fd: int) -> bool:
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def release(self) -> None:
+        """释放锁（未持有时不做任何事）"""
+        fd, self._fd = self._fd, None
+        if fd is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(fd)
+
+    def holder(self) -> str:
+        """锁文件中记录的持有者（进程号和获得时间）"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return f.read().strip()
+        except OSError:
+            return ""
+
+    def __enter__(self) -> 'FileLock':
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.release()
+
+
+def data_lock(data_dir: str = "../data") -> FileLock:
+    """数据目录的锁：持有期间其他任务不会读写 data/*.json"""
+    return FileLock(os.path.join(data_dir, DATA_LOCK_FILE))
+
+
+def acquire_data_lock(data_dir: str = "../data", timeout: float = DATA_LOCK_TIMEOUT) -> FileLock:
+    """
+    获取数据锁并保持到进程退出（供各脚本在读写数据文件前调用）
+
+    Raises:
+        LockTimeout: 超时未获得锁
+    """
+    lock = data_lock(data_dir)
+    start = time.monotonic()
+    if not lock.acquire(timeout=timeout):
+        raise LockTimeout(f"等待数据锁超时（{timeout}秒），持有者: {lock.holder() or '未知'}")
+    waited = time.monotonic() - start
+    if waited >= 1:
+        logger.info(f"等待数据锁 {waited:.1f} 秒")
+    atexit.register(lock.release)
+    return lock
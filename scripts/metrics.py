@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行指标
+
+功能：收集获取、处理、清理各阶段的结构化指标（计数器、仪表值、耗时汇总），
+      导出为 Prometheus textfile（供 node_exporter 的 textfile collector 读取）和JSON运行报告。
+
+各脚本通过模块级的 REGISTRY 记录指标。调度器以子进程运行脚本时设置环境变量
+HOTWEEK_METRICS_FILE，脚本退出时把自己的指标写入该文件，由调度器合并到本次运行的指标中。
+调度器并发运行多个任务时，每个任务在 use_registry() 中使用各自的注册表，REGISTRY 转发到当前任务的注册表。
+"""
+
+import atexit
+import contextvars
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows没有resource模块，不统计峰值内存
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# 子进程写出指标的文件（由调度器设置）
+METRICS_FILE_ENV = "HOTWEEK_METRICS_FILE"
+
+# 指标名称 -> (类型, 说明)；未在此登记的指标按首次使用的方法确定类型
+METRICS = {
+    "hotweek_fetch_query_seconds": ("summary", "单个热榜查询的耗时（含重试和缓存）"),
+    "hotweek_fetch_requests_total": ("counter", "发出的HTTP请求数（按状态码）"),
+    "hotweek_fetch_retries_total": ("counter", "HTTP请求重试次数"),
+    "hotweek_fetch_rate_limited_total": ("counter", "收到429（速率限制）的次数"),
+    "hotweek_fetch_bytes_total": ("counter", "下载的响应体字节数"),
+    "hotweek_fetch_cache_hits_total": ("counter", "使用缓存的查询数（fresh: 新鲜期内；revalidated: 304；stale: 请求失败或熔断时的过期缓存）"),
+    "hotweek_fetch_circuit_open_total": ("counter", "因端点熔断而未发送的请求数"),
+    "hotweek_circuit_state": ("gauge", "API端点熔断器状态（0正常，1半开，2熔断）"),
+    "hotweek_records_total": ("counter", "各环节的记录数（fetched/merged/updated/deduplicated/processed/evicted）"),
+    "hotweek_poll_interval_seconds": ("gauge", "自适应轮询中各查询当前的轮询间隔"),
+    "hotweek_poll_skipped_total": ("counter", "自适应轮询中未到轮询时间而跳过的查询数"),
+    "hotweek_json_seconds": ("summary", "JSON编码/解码耗时（按数据集）"),
+    "hotweek_file_bytes": ("gauge", "写出的数据文件大小"),
+    "hotweek_function_seconds": ("summary", "主要函数的耗时"),
+    "hotweek_stage_seconds": ("summary", "流水线各阶段的耗时"),
+    "hotweek_stage_success": ("gauge", "流水线各阶段是否成功（1成功，0失败）"),
+    "hotweek_peak_rss_bytes": ("gauge", "进程的峰值内存（RSS）"),
+    "hotweek_run_seconds": ("gauge", "本次运行的总耗时"),
+    "hotweek_run_success": ("gauge", "本次运行是否成功（1成功，0失败）"),
+    "hotweek_last_run_timestamp_seconds": ("gauge", "本次运行结束的时间戳"),
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    """转义Prometheus标签值"""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: LabelKey) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """当前进程的峰值内存（字节），无法获取时返回None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux以KB为单位，macOS以字节为单位
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class MetricsRegistry:
+    """指标注册表（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._types: Dict[str, str] = {}
+        self._values: Dict[str, Dict[LabelKey, Any]] = {}
+
+    def _series(self, name: str, kind: str) -> Dict[LabelKey, Any]:
+        """获取指标的序列表（调用方持有锁）"""
+        self._types.setdefault(name, METRICS.get(name, (kind,))[0])
+        return self._values.setdefault(name, {})
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """计数器增加 value"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series(name, "counter")
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels) -> None:
+        """设置仪表值"""
+        key = _label_key(labels)
+        with self._lock:
+            self._series(name, "gauge")[key] = value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """记录一次观测值（耗时等），汇总为次数、总和与最大值"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series(name, "summary")
+            count, total, maximum = series.get(key, (0, 0.0, value))
+            series[key] = (count + 1, total + value, max(maximum, value))
+
+    @contextmanager
+    def timer(self, name: str, **labels) -> Iterator[None]:
+        """计时代码块（异常时同样记录）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def reset(self) -> None:
+        """清空所有指标（每次运行开始时调用）"""
+        with self._lock:
+            self._types.clear()
+            self._values.clear()
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """
+        导出为可JSON序列化的结构
+
+        Returns:
+            指标名称 -> {type, help, series: [{labels, value} 或 {labels, count, sum, max}]}
+        """
+        result = {}
+        with self._lock:
+            for name in sorted(self._values):
+                kind = self._types[name]
+                series = []
+                for key, value in sorted(self._values[name].items()):
+                    if kind == "summary":
+                        count, total, maximum = value
+                        series.append({"labels": dict(key), "count": count, "sum": total, "max": maximum})
+                    else:
+                        series.append({"labels": dict(key), "value": value})
+                result[name] = {"type": kind, "help": METRICS.get(name, ("", ""))[1], "series": series}
+        return result
+
+    def merge(self, snapshot: Dict[str, Dict], **labels) -> None:
+        """
+        合并另一份指标快照（计数器和汇总累加，仪表值覆盖）
+
+        Args:
+            snapshot: snapshot() 的输出
+            labels: 为合并进来的每个序列额外添加的标签
+        """
+        with self._lock:
+            for name, metric in snapshot.items():
+                kind = metric.get("type", "gauge")
+                series = self._series(name, kind)
+                for item in metric.get("series", []):
+                    key = _label_key({**item.get("labels", {}), **labels})
+                    if kind == "summary":
+                        count, total, maximum = series.get(key, (0, 0.0, item["max"]))
+                        series[key] = (count + item["count"], total + item["sum"], max(maximum, item["max"]))
+                    elif kind == "counter":
+                        series[key] = series.get(key, 0) + item["value"]
+                    else:
+                        series[key] = item["value"]
+
+    def to_prometheus(self, **const_labels) -> str:
+        """
+        导出为Prometheus文本格式
+
+        汇总类指标输出 <名称>_count、<名称>_sum，最大值另以 <名称>_max 仪表输出。
+
+        Args:
+            const_labels: 添加到每个序列的标签
+        """
+        lines: List[str] = []
+        for name, metric in self.snapshot().items():
+            kind = metric["type"]
+            if metric["help"]:
+                lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} {kind}")
+            max_lines = []
+            for item in metric["series"]:
+                labels = _format_labels(_label_key({**item["labels"], **const_labels}))
+                if kind == "summary":
+                    lines.append(f"{name}_count{labels} {item['count']}")
+                    lines.append(f"{name}_sum{labels} {item['sum']:.6f}")
+                    max_lines.append(f"{name}_max{labels} {item['max']:.6f}")
+                else:
+                    lines.append(f"{name}{labels} {item['value']}")
+            if max_lines:
+                lines.append(f"# TYPE {name}_max gauge")
+                lines.extend(max_lines)
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, filename: str, **const_labels) -> None:
+        """原子写入Prometheus textfile（collector不会读到写了一半的文件）"""
+        _atomic_write(filename, self.to_prometheus(**const_labels))
+
+    def dump(self, filename: str) -> None:
+        """把指标快照写入JSON文件"""
+        _atomic_write(filename, json.dumps(self.snapshot(), ensure_ascii=False))
+
+
+def _atomic_write(filename: str, content: str) -> None:
+    directory = os.path.dirname(filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_filename = f"{filename}.tmp"
+    with open(tmp_filename, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_filename, filename)
+
+
+def load_snapshot(filename: str) -> Dict[str, Dict]:
+    """读取 dump() 写出的指标快照（文件不存在或损坏时返回空字典）"""
+    try:
+        with open(filename, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"无法读取指标文件 {filename}: {e}")
+        return {}
+
+
+_current_registry: contextvars.ContextVar = contextvars.ContextVar("hotweek_metrics_registry", default=None)
+
+
+class _RegistryProxy:
+    """
+    转发到当前上下文的注册表（未通过 use_registry 指定时为进程级的默认注册表）
+
+    上下文按线程隔离：任务中另起的线程池线程写入默认注册表。
+    """
+
+    def __init__(self, default: MetricsRegistry):
+        self._default = default
+
+    def current(self) -> MetricsRegistry:
+        """当前上下文的注册表"""
+        registry = _current_registry.get()
+        return self._default if registry is None else registry
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.current(), name)
+
+
+# 进程内共享的注册表
+REGISTRY = _RegistryProxy(MetricsRegistry())
+
+
+@contextmanager
+def use_registry(registry: MetricsRegistry) -> Iterator[MetricsRegistry]:
+    """在代码块内（当前线程/协程）把 REGISTRY 指向 registry"""
+    token = _current_registry.set(registry)
+    try:
+        yield registry
+    finally:
+        _current_registry.reset(token)
+
+
+def timed(name: Optional[str] = None) -> Callable:
+    """
+    装饰器：把函数耗时记入 hotweek_function_seconds{function=name}
+
+    Args:
+        name: 函数标签（默认为 类名.函数名）
+    """
+    def decorator(func: Callable) -> Callable:
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with REGISTRY.timer("hotweek_function_seconds", function=label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _dump_on_exit(filename: str) -> None:
+    """子进程退出时记录峰值内存并写出指标"""
+    rss = peak_rss_bytes()
+    if rss is not None:
+        process = os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0]
+        REGISTRY.set("hotweek_peak_rss_bytes", rss, process=process)
+    try:
+        REGISTRY.dump(filename)
+    except OSError as e:
+        logger.warning(f"无法写出指标文件 {filename}: {e}")
+
+
+if os.environ.get(METRICS_FILE_ENV):
+    atexit.register(_dump_on_exit, os.environ[METRICS_FILE_ENV])
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地模拟热榜API服务
+
+功能：在本地提供与第三方 trending API 相同的 /repositories 接口，
+      支持 ETag/Last-Modified 条件请求、人为延迟和错误注入，
+      用于离线开发、验证HTTP缓存以及性能测试
+"""
+
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qs, urlparse
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+LANGUAGES = ["Python", "JavaScript", "TypeScript", "Go", "Rust", "Java", "C++", "C", "Ruby", "Dart"]
+
+
+def generate_repositories(language: str = "", since: str = "weekly", count: int = 25,
+                          revision: int = 0) -> List[Dict]:
+    """
+    生成确定性的模拟仓库数据（相同参数和版本号返回相同内容）
+
+    Args:
+        language: 编程语言筛选
+        since: 时间范围
+        count: 仓库数量
+        revision: 数据版本号，变化时生成不同的数据
+
+    Returns:
+        仓库数据列表
+    """
+    rng = random.Random(f"{language}|{since}|{revision}")
+    repositories = []
+    for i in range(count):
+        author = f"author{rng.randint(1, 5000)}"
+        name = f"project{rng.randint(1, 100000)}"
+        repo_language = language or rng.choice(LANGUAGES)
+        stars = rng.randint(100, 250000)
+        repositories.append({
+            "author": author,
+            "name": name,
+            "full_name": f"{author}/{name}",
+            "url": f"https://github.com/{author}/{name}",
+            "description": f"Mock {repo_language} project #{i} for {since} trending",
+            "language": repo_language,
+            "stars": stars,
+            "forks": int(stars * rng.uniform(0.1, 0.3)),
+            "currentPeriodStars": rng.randint(10, 500),
+            "builtBy": [{"username": f"dev{rng.randint(1, 50)}", "href": "https://github.com/dev"}]
+        })
+    return repositories
+
+
+class MockTrendingHandler(BaseHTTPRequestHandler):
+    """模拟API请求处理器（配置保存在server对象上）"""
+
+    def do_GET(self):
+        server = self.server
+        parsed = urlparse(self.path)
+        with server.lock:
+            server.request_count += 1
+
+        if server.delay:
+            time.sleep(server.delay)
+
+        if parsed.path.rstrip('/') != '/repositories':
+            self.send_error(404)
+            return
+
+        if server.fail_status and random.random() < server.fail_rate:
+            self.send_response(server.fail_status)
+            if server.fail_status == 429:
+                self.send_header('Retry-After', str(server.retry_after))
+            self.end_headers()
+            return
+
+        query = parse_qs(parsed.query)
+        language = query.get('language', [''])[0]
+        since = query.get('since', ['weekly'])[0]
+        body, etag, last_modified = server.payload(language, since)
+
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', last_modified)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', last_modified)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"mock server: {format % args}")
+
+
+class MockTrendingServer(ThreadingHTTPServer):
+    """模拟热榜API服务"""
+
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, count: int = 25, delay: float = 0.0,
+                 fail_status: int = 0, fail_rate: float = 0.0, retry_after: int = 1):
+        """
+        初始化模拟服务
+
+        Args:
+            host: 监听地址
+            port: 监听端口（0表示随机端口）
+            count: 每个查询返回的仓库数量
+            delay: 每个请求的人为延迟（秒）
+            fail_status: 注入的错误状态码（0表示不注入）
+            fail_rate: 错误注入概率
+            retry_after: 注入429时返回的 Retry-After 秒数
+        """
+        super().__init__((host, port), MockTrendingHandler)
+        self.count = count
+        self.delay = delay
+        self.fail_status = fail_status
+        self.fail_rate = fail_rate
+        self.retry_after = retry_after
+        self.revision = 0
+        self.request_count = 0
+        self.lock = threading.Lock()
+        self._payloads: Dict[Tuple[str, str, int], Tuple[bytes, str, str]] = {}
+
+    @property
+    def base_url(self) -> str:
+        """服务基础URL"""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def payload(self, language: str, since: str) -> Tuple[bytes, str, str]:
+        """获取查询对应的响应体、ETag和Last-Modified"""
+        key = (language, since, self.revision)
+        with self.lock:
+            if key not in self._payloads:
+                data = generate_repositories(language, since, self.count, self.revision)
+                body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+                etag = f'"{hashlib.md5(body).hexdigest()}"'
+                self._payloads[key] = (body, etag, formatdate(usegmt=True))
+            return self._payloads[key]
+
+    def bump_revision(self) -> None:
+        """模拟上游数据更新"""
+        with self.lock:
+            self.revision += 1
+
+    def start_background(self) -> threading.Thread:
+        """在后台线程中启动服务"""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+def main():
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="本地模拟热榜API服务")
+    parser.add_argument("--port", type=int, default=8765, help="监听端口")
+    parser.add_argument("--count", type=int, default=25, help="每个查询返回的仓库数量")
+    parser.add_argument("--delay", type=float, default=0.0, help="每个请求的延迟（秒）")
+    parser.add_argument("--fail-status", type=int, default=0, help="注入的错误状态码")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="错误注入概率")
+    args = parser.parse_args()
+
+    server = MockTrendingServer(port=args.port, count=args.count, delay=args.delay,
+                                fail_status=args.fail_status, fail_rate=args.fail_rate)
+    logger.info(f"模拟热榜API服务已启动: {server.base_url}/repositories")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("模拟服务已停止")
+    finally:
+        server.server_close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
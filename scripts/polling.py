@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自适应轮询
+
+功能：按 (语言, 时间范围) 记录每次获取的结果是否真的变化，据此调整各查询的轮询间隔：
+    - 结果不变时按 BACKOFF_FACTOR 逐步延长间隔，变化时按 TIGHTEN_FACTOR 缩短；
+    - 间隔不超过观测到的平均变化间隔的一半（变化越频繁，轮询越密）；
+    - 在预期的榜单更新时刻（每天 UTC ROLLOVER_HOUR_UTC 点，以及历史上经常发生变化的小时）
+      之后 ROLLOVER_DELAY 秒内安排一次轮询；
+    - 间隔限制在 [min_interval, max_interval] 内。
+
+状态保存在 ../cache/polling_state.json，获取脚本（--adaptive）和调度器（--adaptive）共用。
+查看各查询的当前间隔和变化率：
+
+    python polling.py
+"""
+
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE_FILE = "../cache/polling_state.json"
+
+# 间隔（秒）
+MIN_INTERVAL = 15 * 60
+MAX_INTERVAL = 12 * 60 * 60
+INITIAL_INTERVAL = 60 * 60
+BACKOFF_FACTOR = 1.5
+TIGHTEN_FACTOR = 0.5
+
+# GitHub热榜每天重新计算的时刻（UTC小时），以及在更新时刻之后多久轮询
+ROLLOVER_HOUR_UTC = 0
+ROLLOVER_DELAY = 5 * 60
+# 某小时内观测到的变化次数达到此值、且不少于均匀分布时的2倍，视为经常更新的时刻
+HOT_HOUR_MIN_CHANGES = 3
+
+Query = Tuple[str, str]
+
+
+def query_key(language: str, since: str) -> str:
+    """状态文件中查询的键（所有语言为空字符串）"""
+    return f"{language}|{since}"
+
+
+def _utc(timestamp: float) -> datetime:
+    return datetime.fromtimestamp(timestamp, timezone.utc)
+
+
+class AdaptivePollingPlanner:
+    """按查询的观测变化率安排下一次轮询"""
+
+    def __init__(self, state_file: str = DEFAULT_STATE_FILE, min_interval: float = MIN_INTERVAL,
+                 max_interval: float = MAX_INTERVAL, initial_interval: float = INITIAL_INTERVAL):
+        """
+        初始化轮询计划
+
+        Args:
+            state_file: 状态文件
+            min_interval: 最短轮询间隔（秒）
+            max_interval: 最长轮询间隔（秒）
+            initial_interval: 首次观测后的轮询间隔（秒）
+        """
+        self.state_file = state_file
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.initial_interval = min(max(initial_interval, min_interval), self.max_interval)
+        self.queries: Dict[str, Dict] = self._load()
+
+    def _load(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f).get("queries", {})
+        except (OSError, ValueError, AttributeError) as e:
+            logger.warning(f"无法读取轮询状态 {self.state_file}，重新开始统计: {e}")
+            return {}
+
+    def save(self) -> None:
+        """原子写入状态文件"""
+        directory = os.path.dirname(self.state_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_filename = f"{self.state_file}.tmp"
+        with open(tmp_filename, 'w', encoding='utf-8') as f:
+            json.dump({"updated_at": datetime.now().isoformat(), "queries": self.queries}, f,
+                      ensure_ascii=False, indent=2)
+        os.replace(tmp_filename, self.state_file)
+
+    def is_due(self, language: str, since: str, now: Optional[float] = None) -> bool:
+        """查询是否到了轮询时间（从未轮询过的查询总是到期）"""
+        state = self.queries.get(query_key(language, since))
+        return state is None or (now or time.time()) >= state["next_poll"]
+
+    def due_queries(self, queries: Iterable[Query], now: Optional[float] = None) -> List[Query]:
+        """筛选出到期的查询"""
+        now = now or time.time()
+        return [(language, since) for language, since in queries if self.is_due(language, since, now)]
+
+    def next_poll(self) -> Optional[float]:
+        """所有已知查询中最早的下一次轮询时间（没有任何状态时返回None，表示立即轮询）"""
+        if not self.queries:
+            return None
+        return min(state["next_poll"] for state in self.queries.values())
+
+    def any_due(self, now: Optional[float] = None) -> bool:
+        """是否有查询到期"""
+        next_poll = self.next_poll()
+        return next_poll is None or (now or time.time()) >= next_poll
+
+    def observe(self, language: str, since: str, fingerprint: str, now: Optional[float] = None) -> bool:
+        """
+        记录一次成功的获取并安排下一次轮询
+
+        Args:
+            language: 编程语言
+            since: 时间范围
+            fingerprint: 本次结果的内容指纹（fetch_trending.compute_fingerprint）
+            now: 获取时间（时间戳）
+
+        Returns:
+            结果是否与上次不同（首次观测返回False）
+        """
+        now = now or time.time()
+        key = query_key(language, since)
+        state = self.queries.get(key)
+        if state is None:
+            state = self.queries[key] = {
+                "fingerprint": fingerprint,
+                "interval": self.initial_interval,
+                "first_polled": now,
+                "last_polled": now,
+                "last_changed": None,
+                "polls": 1,
+                "changes": 0,
+                "change_hours": [0] * 24
+            }
+            changed = False
+        else:
+            changed = fingerprint != state["fingerprint"]
+            state["fingerprint"] = fingerprint
+            state["last_polled"] = now
+            state["polls"] += 1
+            if changed:
+                state["changes"] += 1
+                state["last_changed"] = now
+                state["change_hours"][_utc(now).hour] += 1
+                interval = state["interval"] * TIGHTEN_FACTOR
+            else:
+                interval = state["interval"] * BACKOFF_FACTOR
+            # 不超过平均变化间隔的一半
+            if state["changes"]:
+                interval = min(interval, (now - state["first_polled"]) / state["changes"] / 2)
+            state["interval"] = min(max(interval, self.min_interval), self.max_interval)
+
+        state["next_poll"] = self._schedule(state, now)
+        REGISTRY.set("hotweek_poll_interval_seconds", state["interval"], language=language or "all", since=since)
+        return changed
+
+    def record_failure(self, language: str, since: str, now: Optional[float] = None) -> None:
+        """获取失败：不改变间隔和变化统计，在最短间隔后重试"""
+        state = self.queries.get(query_key(language, since))
+        if state is not None:
+            state["next_poll"] = (now or time.time()) + self.min_interval
+
+    def _schedule(self, state: Dict, now: float) -> float:
+        """下一次轮询时间：间隔到期或下一个预期更新时刻之后，取较早者（但不早于最短间隔）"""
+        next_poll = now + state["interval"]
+        rollover = self.next_rollover(state, now)
+        if rollover is not None:
+            next_poll = min(next_poll, rollover + ROLLOVER_DELAY)
+        return max(next_poll, now + self.min_interval)
+
+    def hot_hours(self, state: Dict) -> List[int]:
+        """预期会发生变化的UTC小时：固定的每日更新时刻，以及历史上变化集中的小时"""
+        threshold = max(HOT_HOUR_MIN_CHANGES, state["changes"] * 2 / 24)
+        learned = [hour for hour, count in enumerate(state["change_hours"]) if count >= threshold]
+        return sorted({ROLLOVER_HOUR_UTC, *learned})
+
+    def next_rollover(self, state: Dict, now: float) -> Optional[float]:
+        """now 之后的下一个预期更新时刻（时间戳）"""
+        current = _utc(now).replace(minute=0, second=0, microsecond=0)
+        hours = set(self.hot_hours(state))
+        for offset in range(1, 25):
+            candidate = current + timedelta(hours=offset)
+            if candidate.hour in hours:
+                return candidate.timestamp()
+        return None
+
+    def describe(self, now: Optional[float] = None) -> List[str]:
+        """各查询的状态（供日志和命令行输出）"""
+        now = now or time.time()
+        lines = []
+        for key, state in sorted(self.queries.items()):
+            language, since = key.split("|", 1)
+            rate = state["changes"] / max(state["polls"] - 1, 1)
+            lines.append(
+                f"  {language or '所有语言'}/{since}: 间隔 {state['interval'] / 60:.0f} 分钟，"
+                f"{max(state['next_poll'] - now, 0) / 60:.0f} 分钟后轮询，"
+                f"变化 {state['changes']}/{state['polls'] - 1} 次 ({rate:.0%})，"
+                f"更新时刻(UTC) {', '.join(f'{hour:02d}:00' for hour in self.hot_hours(state))}"
+            )
+        return lines
+
+
+def main():
+    """主函数：输出各查询的轮询状态"""
+    import argparse
+
+    # 配置日志（作为库导入时由调用方配置）
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    parser = argparse.ArgumentParser(description="自适应轮询状态")
+    parser.add_argument(
+        "--state-file",
+        default=DEFAULT_STATE_FILE,
+        help="轮询状态文件"
+    )
+    args = parser.parse_args()
+
+    planner = AdaptivePollingPlanner(args.state_file)
+    if not planner.queries:
+        logger.info("还没有轮询记录")
+        return 0
+    logger.info("各查询的轮询状态:\n" + "\n".join(planner.describe()))
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -8,10 +8,31 @@ GitHub热榜数据处理脚本
 版本：1.0.0
 """
 
+import atexit
+import heapq
 import json
 import logging
+import os
+from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy为可选依赖，未安装时列式处理使用标准库实现
+    np = None
+
+from frontend_payload import (payload_filename, search_index_filename, shard_dirname, write_payload,
+                              write_search_index, write_shards)
+from locks import LockTimeout, acquire_data_lock
+from metrics import REGISTRY, timed
+from profiling import StageProfiler, add_profile_arguments
+from repo_index import content_hash, normalize_repo_key
+from repo_record import (RepositoryRecord, cache_stats, column, format_number, language_color, load_records,
+                         missing_fields)
+from storage import JSONStorage, JSONStreamReader, get_storage
 
 # 配置日志
 logging.basicConfig(
@@ -20,11 +41,43 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 低于此数量时并行处理的进程开销大于收益，直接在当前进程处理
+PARALLEL_MIN_REPOSITORIES = 5000
+
+# 增量状态文件（保存每个仓库的内容哈希和清洗结果，不随 data/ 提交）及其格式版本
+STATE_FILE = "../data/processed_trending.state.json"
+STATE_VERSION = 3
+# 增量状态中每行的语言列（行为 [内容哈希, author, name, url, description, language, stars, forks, 本期star数]）
+ROW_LANGUAGE = 5
+
+
+def _process_shard(repositories: List[Dict]) -> Tuple[List[Dict], Dict[str, int]]:
+    """
+    在工作进程中处理一个分片
+    
+    Args:
+        repositories: 分片内的原始仓库数据
+        
+    Returns:
+        (按star数降序排列的清洗结果, 分片内的语言计数)
+    """
+    # 分片处理不读写文件，使用无状态的JSON存储避免在子进程中打开数据库
+    processor = GitHubDataProcessor(storage=JSONStorage())
+    cleaned_repos = [processor.clean_repository_data(repo) for repo in repositories]
+    cleaned_repos.sort(key=lambda x: x['stars'], reverse=True)
+    return cleaned_repos, dict(Counter(repo['language'] for repo in cleaned_repos))
+
 class GitHubDataProcessor:
     """GitHub热榜数据处理器"""
     
-    def __init__(self):
-        """初始化数据处理器"""
+    def __init__(self, storage=None):
+        """
+        初始化数据处理器
+        
+        Args:
+            storage: 数据存储后端（默认由环境变量 HOTWEEK_STORAGE 决定）
+        """
+        self.storage = storage or get_storage()
         self.required_fields = [
             'author', 'name', 'url', 'description', 'language', 
             'stars', 'forks', 'currentPeriodStars'
@@ -38,11 +91,10 @@ class GitHubDataProcessor:
             filename: 数据文件名
             
         Returns:
-            原始数据字典或None（加载失败时）
+            数据字典或None（加载失败时），其中的仓库数据为 RepositoryRecord
         """
         try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            data = load_records(self.storage.load(filename))
             
             logger.info(f"成功加载数据文件: {filename}")
             return data
@@ -81,15 +133,14 @@ class GitHubDataProcessor:
             logger.error("'repositories'字段不是列表类型")
             return False
         
-        # 验证每个仓库的必需字段
+        # 验证每个仓库的类型和必需字段
         for i, repo in enumerate(repositories):
-            if not isinstance(repo, dict):
+            if not isinstance(repo, (dict, RepositoryRecord)):
                 logger.error(f"第{i}个仓库数据不是字典类型")
                 return False
-            
-            for field in self.required_fields:
-                if field not in repo:
-                    logger.warning(f"第{i}个仓库缺少字段: {field}")
+        
+        for i, field in missing_fields(repositories, self.required_fields):
+            logger.warning(f"第{i}个仓库缺少字段: {field}")
         
         logger.info(f"数据验证通过，共{len(repositories)}个仓库")
         return True
@@ -102,45 +153,22 @@ class GitHubDataProcessor:
             repo: 原始仓库数据
             
         Returns:
-            清洗后的仓库数据
+            清洗后的仓库记录（显示文本和语言颜色在读取或序列化时计算）
         """
-        cleaned = {}
-        
-        # 基础信息
-        cleaned['author'] = repo.get('author', '').strip()
-        cleaned['name'] = repo.get('name', '').strip()
-        cleaned['full_name'] = f"{cleaned['author']}/{cleaned['name']}"
-        cleaned['url'] = repo.get('url', '').strip()
-        
-        # 描述信息
-        description = repo.get('description', '')
-        if description:
-            # 清理描述中的特殊字符和多余空格
-            description = description.replace('\n', ' ').replace('\r', ' ').strip()
-            # 限制描述长度
-            if len(description) > 200:
-                description = description[:197] + '...'
-        cleaned['description'] = description
-        
-        # 技术信息
-        cleaned['language'] = repo.get('language', 'Unknown')
-        if cleaned['language'] == '':
-            cleaned['language'] = 'Unknown'
-        
-        # 统计数据（确保为数字）
-        cleaned['stars'] = self._safe_int(repo.get('stars', 0))
-        cleaned['forks'] = self._safe_int(repo.get('forks', 0))
-        cleaned['current_period_stars'] = self._safe_int(repo.get('currentPeriodStars', 0))
-        
-        # 格式化显示文本
-        cleaned['stars_text'] = self._format_number(cleaned['stars'])
-        cleaned['forks_text'] = self._format_number(cleaned['forks'])
-        cleaned['trending_stars_text'] = self._format_number(cleaned['current_period_stars'])
-        
-        # 添加颜色标识（基于语言）
-        cleaned['language_color'] = self._get_language_color(cleaned['language'])
-        
-        return cleaned
+        return RepositoryRecord.processed(
+            # 基础信息
+            author=repo.get('author', '').strip(),
+            name=repo.get('name', '').strip(),
+            url=repo.get('url', '').strip(),
+            # 描述信息
+            description=self._clean_description(repo.get('description', '')),
+            # 技术信息
+            language=self._normalize_language(repo.get('language', 'Unknown')),
+            # 统计数据（确保为数字）
+            stars=self._safe_int(repo.get('stars', 0)),
+            forks=self._safe_int(repo.get('forks', 0)),
+            current_period_stars=self._safe_int(repo.get('currentPeriodStars', 0))
+        )
     
     def _safe_int(self, value: Any) -> int:
         """安全转换为整数"""
@@ -154,38 +182,30 @@ class GitHubDataProcessor:
     
     def _format_number(self, num: int) -> str:
         """格式化数字显示"""
-        if num >= 1000000:
-            return f"{num/1000000:.1f}M"
-        elif num >= 1000:
-            return f"{num/1000:.1f}K"
-        else:
-            return str(num)
+        return format_number(num)
     
     def _get_language_color(self, language: str) -> str:
         """获取编程语言对应的颜色"""
-        color_map = {
-            'JavaScript': '#f1e05a',
-            'Python': '#3572A5',
-            'Java': '#b07219',
-            'TypeScript': '#2b7489',
-            'C++': '#f34b7d',
-            'C': '#555555',
-            'Go': '#00ADD8',
-            'Rust': '#dea584',
-            'Ruby': '#701516',
-            'PHP': '#4F5D95',
-            'Swift': '#ffac45',
-            'Kotlin': '#A97BFF',
-            'HTML': '#e34c26',
-            'CSS': '#563d7c',
-            'Vue': '#41b883',
-            'React': '#61dafb',
-            'Shell': '#89e051',
-            'Dockerfile': '#384d54',
-            'Unknown': '#6c757d'
-        }
-        return color_map.get(language, '#6c757d')
+        return language_color(language)
+    
+    def get_cache_stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        获取显示字段缓存（数字格式化、语言颜色）的命中统计
+        
+        Returns:
+            缓存名称 -> {hits, misses, maxsize, currsize}（多进程处理时只统计当前进程）
+        """
+        return cache_stats()
+    
+    def log_cache_stats(self) -> None:
+        """记录显示字段缓存的命中率"""
+        for name, stats in self.get_cache_stats().items():
+            lookups = stats['hits'] + stats['misses']
+            if lookups:
+                logger.info(f"缓存 {name}: 命中 {stats['hits']}/{lookups} ({stats['hits'] / lookups:.1%})，"
+                            f"缓存项 {stats['currsize']}/{stats['maxsize']}")
     
+    @timed()
     def process_data(self, raw_data: Dict) -> Optional[Dict]:
         """
         处理完整的数据集
@@ -217,44 +237,384 @@ class GitHubDataProcessor:
                 lang = cleaned_repo['language']
                 language_stats[lang] = language_stats.get(lang, 0) + 1
             
-            # 按star数排序
-            processed_repos.sort(key=lambda x: x['stars'], reverse=True)
+            return self._build_result(metadata, processed_repos, language_stats)
             
-            # 构建处理后的数据结构
-            result = {
-                'metadata': {
-                    **metadata,
-                    'processed_at': datetime.now().isoformat(),
-                    'total_repositories': len(processed_repos),
-                    'language_distribution': language_stats
-                },
-                'repositories': processed_repos,
-                'languages': sorted(language_stats.keys())
-            }
+        except Exception as e:
+            logger.error(f"数据处理过程中发生异常: {str(e)}")
+            return None
+    
+    @timed()
+    def process_data_incremental(self, raw_data: Dict, state: Optional[Dict]) -> Tuple[Optional[Dict], Optional[Dict]]:
+        """
+        增量处理数据集：只重新清洗新增或内容变化的仓库
+        
+        state 按规范化仓库键保存上次每个仓库的内容哈希（repo_index.content_hash，忽略出现时间等易变字段）
+        和清洗结果，以及语言分布计数。内容哈希相同的仓库直接由保存的清洗结果重建；
+        语言分布在保存的计数上按新增、变化和删除的仓库修正，不重新统计全部仓库。
+        无键或本批中重复的仓库无法追踪，每次重新清洗并单独计数。
+        
+        重新清洗只针对变化的仓库，但判断是否变化仍需计算每个仓库的内容哈希，
+        其开销高于清洗本身，因此全量处理（process_data）仍是默认方式。
+        
+        Args:
+            raw_data: 原始数据
+            state: 上次保存的增量状态（为None或格式过旧时退化为全量处理）
             
-            logger.info(f"数据处理完成，共处理{len(processed_repos)}个仓库")
-            logger.info(f"语言分布: {language_stats}")
+        Returns:
+            (处理后的数据, 新的增量状态)，处理失败时均为None
+        """
+        try:
+            if not self.validate_data(raw_data):
+                return None, None
+            
+            metadata = raw_data.get('metadata', {})
+            repositories = raw_data['repositories']
+            
+            if state and state.get('version') == STATE_VERSION:
+                old_rows = state['records']
+                keyed_stats = dict(state['language_stats'])
+            else:
+                old_rows = {}
+                keyed_stats = {}
+            rows: Dict[str, List] = {}
+            # 无法追踪的仓库的语言计数（每次重新统计）
+            untracked_stats: Dict[str, int] = {}
+            processed_repos = []
+            reused = 0
+            # 本次仍然存在的旧仓库数（少于状态中的仓库数时说明有仓库被删除）
+            matched = 0
+            
+            for repo in repositories:
+                key = normalize_repo_key(repo)
+                if not key or key in rows:
+                    cleaned_repo = self.clean_repository_data(repo)
+                    lang = cleaned_repo.language
+                    untracked_stats[lang] = untracked_stats.get(lang, 0) + 1
+                    processed_repos.append(cleaned_repo)
+                    continue
+                
+                repo_hash = content_hash(repo)
+                old_row = old_rows.get(key)
+                if old_row is not None:
+                    matched += 1
+                if old_row is not None and old_row[0] == repo_hash:
+                    cleaned_repo = RepositoryRecord.processed(*old_row[1:])
+                    row = old_row
+                    reused += 1
+                else:
+                    cleaned_repo = self.clean_repository_data(repo)
+                    row = [repo_hash, cleaned_repo.author, cleaned_repo.name, cleaned_repo.url,
+                           cleaned_repo.description, cleaned_repo.language, cleaned_repo.stars,
+                           cleaned_repo.forks, cleaned_repo.current_period_stars]
+                    # 修正语言计数：变化的仓库先减去旧语言
+                    if old_row is not None:
+                        keyed_stats[old_row[ROW_LANGUAGE]] = keyed_stats.get(old_row[ROW_LANGUAGE], 0) - 1
+                    keyed_stats[cleaned_repo.language] = keyed_stats.get(cleaned_repo.language, 0) + 1
+                rows[key] = row
+                processed_repos.append(cleaned_repo)
             
-            return result
+            # 已删除仓库的语言计数（状态中有、本次没有的键）
+            if matched < len(old_rows):
+                for key, old_row in old_rows.items():
+                    if key not in rows:
+                        keyed_stats[old_row[ROW_LANGUAGE]] = keyed_stats.get(old_row[ROW_LANGUAGE], 0) - 1
+            keyed_stats = {lang: count for lang, count in keyed_stats.items() if count > 0}
+            
+            language_stats = dict(keyed_stats)
+            for lang, count in untracked_stats.items():
+                language_stats[lang] = language_stats.get(lang, 0) + count
+            
+            logger.info(f"增量处理: 复用 {reused} 个仓库，重新清洗 {len(processed_repos) - reused} 个仓库")
+            new_state = {'version': STATE_VERSION, 'records': rows, 'language_stats': keyed_stats}
+            return self._build_result(metadata, processed_repos, language_stats), new_state
             
         except Exception as e:
-            logger.error(f"数据处理过程中发生异常: {str(e)}")
+            logger.error(f"增量处理过程中发生异常: {str(e)}")
+            return None, None
+    
+    @timed()
+    def process_data_columnar(self, raw_data: Dict) -> Optional[Dict]:
+        """
+        以列式批量处理完整的数据集（适用于数万条以上的历史数据）
+        
+        先把仓库数据拆成按字段的列，再对整列执行数值转换、语言统计和排序，
+        最后按排序结果组装记录（显示文本和语言颜色由记录在读取时计算）。
+        结果与 process_data 完全一致。安装了NumPy时排序使用 numpy.argsort。
+        
+        Args:
+            raw_data: 原始数据
+            
+        Returns:
+            处理后的数据或None（处理失败时）
+        """
+        try:
+            if not self.validate_data(raw_data):
+                return None
+            
+            metadata = raw_data.get('metadata', {})
+            repositories = raw_data['repositories']
+            
+            # 字符串列（按列读取槽位，不逐条调用 get）
+            authors = list(map(str.strip, column(repositories, 'author', '')))
+            names = list(map(str.strip, column(repositories, 'name', '')))
+            urls = list(map(str.strip, column(repositories, 'url', '')))
+            descriptions = [self._clean_description(text) for text in column(repositories, 'description', '')]
+            languages = ['Unknown' if language == '' else language
+                         for language in column(repositories, 'language', 'Unknown')]
+            
+            # 数值列
+            stars = self._int_column(column(repositories, 'stars', 0))
+            forks = self._int_column(column(repositories, 'forks', 0))
+            period_stars = self._int_column(column(repositories, 'currentPeriodStars', 0))
+            
+            language_stats = dict(Counter(languages))
+            
+            # 按star数降序的稳定排序
+            if np is not None and len(stars):
+                order = np.argsort(-np.asarray(stars, dtype=np.int64), kind='stable').tolist()
+            else:
+                order = sorted(range(len(stars)), key=stars.__getitem__, reverse=True)
+            
+            # 显示文本和语言颜色由记录在读取时计算
+            processed_repos = [
+                RepositoryRecord.processed(
+                    authors[i], names[i], urls[i], descriptions[i], languages[i],
+                    stars[i], forks[i], period_stars[i]
+                )
+                for i in order
+            ]
+            
+            # 已按star数排序，_build_result 中的再次排序为线性时间
+            return self._build_result(metadata, processed_repos, language_stats)
+            
+        except Exception as e:
+            logger.error(f"列式处理过程中发生异常: {str(e)}")
+            return None
+    
+    @timed()
+    def process_data_parallel(self, raw_data: Dict, workers: Optional[int] = None,
+                              shard_size: Optional[int] = None) -> Optional[Dict]:
+        """
+        多进程分片处理完整的数据集
+        
+        仓库列表按顺序切成分片，由进程池中的工作进程分别清洗、统计语言并排序，
+        再用k路归并合并各分片的排序结果（相同star数时保持原有顺序，与 process_data 一致）。
+        
+        Args:
+            raw_data: 原始数据
+            workers: 工作进程数，默认为CPU核数
+            shard_size: 每个分片的仓库数，默认按工作进程数均分
+            
+        Returns:
+            处理后的数据或None（处理失败时）
+        """
+        try:
+            if not self.validate_data(raw_data):
+                return None
+            
+            metadata = raw_data.get('metadata', {})
+            repositories = raw_data['repositories']
+            workers = workers or os.cpu_count() or 1
+            
+            if workers <= 1 or len(repositories) < PARALLEL_MIN_REPOSITORIES:
+                logger.info("数据量较小，在当前进程中处理")
+                return self.process_data(raw_data)
+            
+            shard_size = shard_size or -(-len(repositories) // workers)
+            shards = [repositories[i:i + shard_size] for i in range(0, len(repositories), shard_size)]
+            logger.info(f"并行处理: {len(shards)} 个分片，{workers} 个工作进程")
+            
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(_process_shard, shards))
+            
+            # 合并语言计数
+            language_stats: Dict[str, int] = {}
+            for _, shard_stats in results:
+                for lang, count in shard_stats.items():
+                    language_stats[lang] = language_stats.get(lang, 0) + count
+            
+            # k路归并各分片的排序结果
+            processed_repos = list(heapq.merge(
+                *(cleaned_repos for cleaned_repos, _ in results),
+                key=lambda x: x['stars'], reverse=True
+            ))
+            
+            return self._build_result(metadata, processed_repos, language_stats)
+            
+        except Exception as e:
+            logger.error(f"并行处理过程中发生异常: {str(e)}")
             return None
     
-    def save_processed_data(self, processed_data: Dict, filename: str = "../data/processed_trending.json") -> bool:
+    @timed()
+    def process_file_stream(self, input_filename: str = "../data/trending.json",
+                            output_filename: str = "../data/processed_trending.json", payload: bool = False,
+                            shards: bool = False, search_index: bool = False) -> bool:
+        """
+        流式处理数据文件：逐条读取并清洗原始记录，排序后逐条写出
+        
+        原始数据不整体载入内存（每条原始记录清洗后即被丢弃），
+        只保留排序所需的清洗结果，输出与 process_data + save_processed_data 相同。
+        
+        Args:
+            input_filename: 原始数据文件名
+            output_filename: 输出文件名
+            payload: 是否同时写入供网页加载的紧凑载荷
+            shards: 是否同时写入分片文件及清单
+            search_index: 是否同时写入搜索索引
+            
+        Returns:
+            处理并保存是否成功
+        """
+        try:
+            reader = JSONStreamReader(input_filename)
+            processed_repos = []
+            language_stats = {}
+            
+            for i, repo in enumerate(self.storage.iter_repositories(input_filename, reader)):
+                if not isinstance(repo, (dict, RepositoryRecord)):
+                    logger.error(f"第{i}个仓库数据不是字典类型")
+                    return False
+                for field in self.required_fields:
+                    if field not in repo:
+                        logger.warning(f"第{i}个仓库缺少字段: {field}")
+                
+                cleaned_repo = self.clean_repository_data(repo)
+                processed_repos.append(cleaned_repo)
+                lang = cleaned_repo['language']
+                language_stats[lang] = language_stats.get(lang, 0) + 1
+            
+            # SQLite后端按行读取记录，不经过读取器，需单独读取元数据
+            fields = reader.fields or self.storage.load_fields(input_filename)
+            logger.info(f"数据验证通过，共{len(processed_repos)}个仓库")
+            
+            result = self._build_result(fields.get('metadata', {}), processed_repos, language_stats)
+            header = {'metadata': result['metadata']}
+            self.storage.save_stream(result['repositories'], output_filename, header=header,
+                                     trailer=lambda: {'languages': result['languages']})
+            if payload:
+                write_payload(result, payload_filename(output_filename))
+            if shards:
+                write_shards(result, shard_dirname(output_filename))
+            if search_index:
+                write_search_index(result, search_index_filename(output_filename))
+            
+            logger.info(f"处理后的数据已保存到: {output_filename}（流式写入）")
+            return True
+            
+        except Exception as e:
+            logger.error(f"流式处理数据失败: {str(e)}")
+            return False
+    
+    def _clean_description(self, description: Any) -> Any:
+        """清理描述文本"""
+        if description:
+            # 清理描述中的特殊字符和多余空格
+            description = description.replace('\n', ' ').replace('\r', ' ').strip()
+            # 限制描述长度
+            if len(description) > 200:
+                description = description[:197] + '...'
+        return description
+    
+    def _normalize_language(self, language: Any) -> Any:
+        """空字符串视为未知语言"""
+        return 'Unknown' if language == '' else language
+    
+    def _int_column(self, values: List[Any]) -> array:
+        """将一列值批量转换为64位整数数组（整数直接使用，其余走 _safe_int）"""
+        try:
+            # 整列都是整数时由 array 一次转换
+            return array('q', values)
+        except (TypeError, OverflowError):
+            return array('q', [value if type(value) is int else self._safe_int(value) for value in values])
+    
+    def _build_result(self, metadata: Dict, processed_repos: List[Dict], language_stats: Dict[str, int]) -> Dict:
+        """排序并构建处理后的数据结构"""
+        # 按star数排序
+        processed_repos.sort(key=lambda x: x['stars'], reverse=True)
+        
+        # 构建处理后的数据结构
+        result = {
+            'metadata': {
+                **metadata,
+                'processed_at': datetime.now().isoformat(),
+                'total_repositories': len(processed_repos),
+                'language_distribution': language_stats
+            },
+            'repositories': processed_repos,
+            'languages': sorted(language_stats.keys())
+        }
+        
+        REGISTRY.inc("hotweek_records_total", len(processed_repos), stage="processed")
+        logger.info(f"数据处理完成，共处理{len(processed_repos)}个仓库")
+        logger.info(f"语言分布: {language_stats}")
+        
+        return result
+    
+    def load_incremental_state(self, filename: str = STATE_FILE) -> Optional[Dict]:
+        """
+        加载增量处理状态
+        
+        Args:
+            filename: 状态文件名
+            
+        Returns:
+            增量状态或None（不存在或损坏时）
+        """
+        try:
+            with open(filename, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"增量状态文件无法读取，将全量处理: {str(e)}")
+            return None
+    
+    def save_incremental_state(self, state: Dict, filename: str = STATE_FILE) -> bool:
+        """
+        保存增量处理状态
+        
+        Args:
+            state: 增量状态
+            filename: 状态文件名
+            
+        Returns:
+            保存是否成功
+        """
+        try:
+            tmp_filename = f"{filename}.tmp"
+            with open(tmp_filename, 'w', encoding='utf-8') as f:
+                # 整体编码后一次写入（json.dump 分块写出，记录多时明显更慢）
+                f.write(json.dumps(state, ensure_ascii=False, separators=(',', ':')))
+            os.replace(tmp_filename, filename)
+            return True
+        except Exception as e:
+            logger.error(f"保存增量状态失败: {str(e)}")
+            return False
+    
+    @timed()
+    def save_processed_data(self, processed_data: Dict, filename: str = "../data/processed_trending.json",
+                            payload: bool = False, shards: bool = False, search_index: bool = False) -> bool:
         """
         保存处理后的数据
         
         Args:
             processed_data: 处理后的数据
             filename: 文件名
+            payload: 是否同时写入供网页加载的紧凑载荷（<文件名>.min.json 及其 .gz/.br）
+            shards: 是否同时写入按页和语言拆分的分片文件及清单（同目录下的 shards/）
+            search_index: 是否同时写入搜索索引（<文件名>.index.json）
             
         Returns:
             保存是否成功
         """
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(processed_data, f, ensure_ascii=False, indent=2)
+            self.storage.save(processed_data, filename)
+            if payload:
+                write_payload(processed_data, payload_filename(filename))
+            if shards:
+                write_shards(processed_data, shard_dirname(filename))
+            if search_index:
+                write_search_index(processed_data, search_index_filename(filename))
             
             logger.info(f"处理后的数据已保存到: {filename}")
             return True
@@ -265,8 +625,70 @@ class GitHubDataProcessor:
 
 def main():
     """主函数"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="GitHub热榜数据处理")
+    parser.add_argument(
+        "--columnar",
+        action="store_true",
+        help="全量处理时使用列式批量处理（适合大数据量）"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="全量处理时使用的工作进程数（大于1时启用多进程分片处理）"
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="流式全量处理（逐条读取原始数据，不整体载入内存）"
+    )
+    parser.add_argument(
+        "--no-payload",
+        action="store_true",
+        help="不生成供网页加载的紧凑载荷（processed_trending.min.json 及其预压缩文件）"
+    )
+    parser.add_argument(
+        "--no-shards",
+        action="store_true",
+        help="不生成按页和语言拆分的分片文件（data/shards/）"
+    )
+    parser.add_argument(
+        "--no-index",
+        action="store_true",
+        help="不生成搜索索引（processed_trending.index.json）"
+    )
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    
+    profiler = StageProfiler.from_args(args, "process_data")
+    atexit.register(profiler.finish)
+    
+    # 处理期间持有数据锁，避免读到其他任务写了一半的数据
+    try:
+        acquire_data_lock()
+    except LockTimeout as e:
+        logger.error(str(e))
+        return 1
+    
     # 创建数据处理器实例
     processor = GitHubDataProcessor()
+    profiler.instrument(processor, "load_data", "process_data", "process_data_columnar", "process_data_parallel",
+                        "process_file_stream", "save_processed_data")
+    
+    if args.stream:
+        if not processor.storage.exists("../data/trending.json"):
+            logger.error("无法加载原始数据")
+            return 1
+        if processor.process_file_stream(
+            payload=not args.no_payload, shards=not args.no_shards, search_index=not args.no_index
+        ):
+            processor.log_cache_stats()
+            logger.info("GitHub热榜数据处理完成！")
+            return 0
+        logger.error("数据处理失败！")
+        return 1
     
     # 加载原始数据
     raw_data = processor.load_data()
@@ -276,12 +698,21 @@ def main():
         return 1
     
     # 处理数据
-    processed_data = processor.process_data(raw_data)
+    if args.workers > 1:
+        processed_data = processor.process_data_parallel(raw_data, workers=args.workers)
+    elif args.columnar:
+        processed_data = processor.process_data_columnar(raw_data)
+    else:
+        processed_data = processor.process_data(raw_data)
     
     if processed_data:
         # 保存处理后的数据
-        success = processor.save_processed_data(processed_data)
+        success = processor.save_processed_data(
+            processed_data, payload=not args.no_payload, shards=not args.no_shards,
+            search_index=not args.no_index
+        )
         if success:
+            processor.log_cache_stats()
             logger.info("GitHub热榜数据处理完成！")
         else:
             logger.error("处理后的数据保存失败！")
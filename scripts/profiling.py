@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+阶段性能剖析
+
+功能：以 cProfile 和 tracemalloc 剖析获取、合并、处理、清理、保存等阶段，
+      每次运行把各阶段的 pstats、内存快照和分配统计写入剖析目录，
+      并输出耗时最多的函数和分配内存最多的代码位置。
+
+各脚本和调度器通过 --profile [目录] 启用；未指定目录时写入 ../logs/profiles/<时间>-<名称>/。
+输出文件：
+    <前缀>.<阶段>.pstats       cProfile统计（python -m pstats 或 snakeviz 查看）
+    <前缀>.<阶段>.tracemalloc  阶段结束时的内存快照（tracemalloc.Snapshot.load 读取）
+    <前缀>.allocations.json    各阶段的峰值内存和新增内存最多的代码位置
+    <前缀>.summary.txt         文本摘要
+"""
+
+import cProfile
+import functools
+import inspect
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILE_ROOT = "../logs/profiles"
+DEFAULT_TOP = 15
+
+
+def default_profile_dir(name: str, root: str = DEFAULT_PROFILE_ROOT) -> str:
+    """本次运行的剖析目录（<根目录>/<时间>-<名称>）"""
+    return os.path.join(root, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{name}")
+
+
+def add_profile_arguments(parser, help: Optional[str] = None) -> None:
+    """为脚本添加 --profile 和 --profile-top 参数"""
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="DIR",
+        help=help or f"以cProfile和tracemalloc剖析各阶段，结果写入DIR（默认 {DEFAULT_PROFILE_ROOT}/<时间>-<名称>/）"
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=DEFAULT_TOP,
+        help="剖析摘要中列出的函数和分配位置数量"
+    )
+
+
+class StageProfiler:
+    """按阶段剖析耗时和内存分配"""
+
+    def __init__(self, output_dir: Optional[str], prefix: str, top: int = DEFAULT_TOP, enabled: bool = True,
+                 log_summary: bool = True):
+        """
+        初始化剖析器
+
+        Args:
+            output_dir: 输出目录
+            prefix: 输出文件名前缀（通常为脚本名）
+            top: 摘要中列出的条目数
+            enabled: 为False时 stage() 不做任何事，可以无条件地插桩
+            log_summary: finish() 时是否输出摘要（由调用方合并输出时关闭）
+        """
+        self.output_dir = output_dir
+        self.prefix = prefix
+        self.top = top
+        self.enabled = enabled
+        self.log_summary = log_summary
+        self._lock = threading.Lock()
+        self._active: Optional[str] = None
+        self._profiles: Dict[str, cProfile.Profile] = {}
+        self._allocations: Dict[str, Dict[str, Any]] = {}
+        self._seconds: Dict[str, float] = {}
+        self._finished = False
+        self._started_tracemalloc = False
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+    @classmethod
+    def from_args(cls, args, name: str) -> 'StageProfiler':
+        """由 add_profile_arguments 添加的参数创建剖析器（未启用时返回不做任何事的剖析器）"""
+        if args.profile is None:
+            return cls(None, name, enabled=False)
+        return cls(args.profile or default_profile_dir(name), name, top=args.profile_top)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        剖析一个阶段
+
+        同一时间只剖析一个阶段：嵌套调用或其他线程中的调用直接执行，计入外层阶段（如果在同一线程）。
+        同名阶段多次执行时统计累加。
+        """
+        with self._lock:
+            owner = self.enabled and not self._finished and self._active is None
+            if owner:
+                self._active = name
+        if not owner:
+            yield
+            return
+
+        profile = self._profiles.setdefault(name, cProfile.Profile())
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        start_size = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            self._seconds[name] = self._seconds.get(name, 0.0) + time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1] - start_size
+            after = tracemalloc.take_snapshot()
+            self._record_allocations(name, before, after, peak)
+            if self.output_dir:
+                os.makedirs(self.output_dir, exist_ok=True)
+                after.dump(os.path.join(self.output_dir, f"{self.prefix}.{name}.tracemalloc"))
+            with self._lock:
+                self._active = None
+
+    def _record_allocations(self, name: str, before: tracemalloc.Snapshot, after: tracemalloc.Snapshot,
+                            peak: int) -> None:
+        """累加阶段内新增内存最多的代码位置"""
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        diff = after.filter_traces(filters).compare_to(before.filter_traces(filters), 'lineno')
+        entry = self._allocations.setdefault(name, {"peak_bytes": 0, "sites": {}})
+        entry["peak_bytes"] = max(entry["peak_bytes"], peak)
+        for stat in diff:
+            if stat.size_diff <= 0:
+                continue
+            frame = stat.traceback[0]
+            site = f"{frame.filename}:{frame.lineno}"
+            size, count = entry["sites"].get(site, (0, 0))
+            entry["sites"][site] = (size + stat.size_diff, count + stat.count_diff)
+
+    def instrument(self, obj: Any, *method_names: str) -> Any:
+        """
+        把对象的方法包装为同名阶段（对象没有的方法忽略）
+
+        包装后的方法保存在实例上，对象内部经 self 调用时同样会被剖析。
+
+        Returns:
+            对象本身
+        """
+        if not self.enabled:
+            return obj
+        for method_name in method_names:
+            method = getattr(obj, method_name, None)
+            if method is None:
+                continue
+            setattr(obj, method_name, self._wrap(method, method_name))
+        return obj
+
+    def _wrap(self, method, name: str):
+        if inspect.iscoroutinefunction(method):
+            @functools.wraps(method)
+            async def async_wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return await method(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            with self.stage(name):
+                return method(*args, **kwargs)
+        return wrapper
+
+    def finish(self) -> str:
+        """
+        写出各阶段的统计并输出摘要（可重复调用，只执行一次）
+
+        Returns:
+            摘要文本
+        """
+        with self._lock:
+            if not self.enabled or self._finished:
+                return ""
+            self._finished = True
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+        if not self._profiles:
+            return ""
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        for name, profile in self._profiles.items():
+            profile.dump_stats(os.path.join(self.output_dir, f"{self.prefix}.{name}.pstats"))
+
+        allocations = {
+            name: {
+                "seconds": round(self._seconds.get(name, 0.0), 6),
+                "peak_bytes": entry["peak_bytes"],
+                "top": [
+                    {"site": site, "size_diff": size, "count_diff": count}
+                    for site, (size, count) in sorted(entry["sites"].items(), key=lambda item: -item[1][0])[:self.top]
+                ]
+            }
+            for name, entry in self._allocations.items()
+        }
+        with open(os.path.join(self.output_dir, f"{self.prefix}.allocations.json"), 'w', encoding='utf-8') as f:
+            json.dump(allocations, f, ensure_ascii=False, indent=2)
+
+        summary = format_summary(self._stats(), allocations, self.top)
+        with open(os.path.join(self.output_dir, f"{self.prefix}.summary.txt"), 'w', encoding='utf-8') as f:
+            f.write(summary)
+        if self.log_summary:
+            logger.info(f"性能剖析结果已写入: {self.output_dir}\n{summary}")
+        return summary
+
+    def _stats(self) -> pstats.Stats:
+        profiles = list(self._profiles.values())
+        stats = pstats.Stats(profiles[0], stream=io.StringIO())
+        for profile in profiles[1:]:
+            stats.add(profile)
+        return stats
+
+
+def format_summary(stats: Optional[pstats.Stats], allocations: Dict[str, Dict], top: int = DEFAULT_TOP) -> str:
+    """
+    格式化剖析摘要
+
+    Args:
+        stats: 合并后的cProfile统计（为None时只输出内存部分）
+        allocations: 阶段 -> {seconds, peak_bytes, top: [{site, size_diff, count_diff}]}
+        top: 列出的条目数
+    """
+    lines: List[str] = ["== 各阶段 =="]
+    for name, entry in allocations.items():
+        lines.append(f"  {name}: {entry.get('seconds', 0):.3f}秒，峰值新增内存 {entry['peak_bytes'] / 1024 / 1024:.1f} MB")
+
+    if stats is not None:
+        stream = io.StringIO()
+        stats.stream = stream
+        # 不逐行列出合并的pstats文件
+        stats.files = []
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
+        lines.append(f"== 累计耗时最多的 {top} 个函数 ==")
+        lines.extend(line for line in stream.getvalue().splitlines() if line.strip())
+
+    sites: Dict[str, List] = {}
+    for name, entry in allocations.items():
+        for item in entry["top"]:
+            size, count, stages = sites.get(item["site"], (0, 0, []))
+            sites[item["site"]] = (size + item["size_diff"], count + item["count_diff"], stages + [name])
+    lines.append(f"== 新增内存最多的 {top} 个代码位置 ==")
+    for site, (size, count, stages) in sorted(sites.items(), key=lambda item: -item[1][0])[:top]:
+        lines.append(f"  {size / 1024:>10.1f} KB  {count:>8} 个对象  {site}  [{', '.join(stages)}]")
+    return "\n".join(lines) + "\n"
+
+
+def summarize_profiles(directory: str, top: int = DEFAULT_TOP) -> str:
+    """
+    合并目录中所有进程的剖析结果（调度器以子进程运行各脚本时使用）
+
+    Returns:
+        摘要文本（目录中没有剖析结果时为空字符串）
+    """
+    if not os.path.isdir(directory):
+        return ""
+    names = sorted(os.listdir(directory))
+    pstats_files = [os.path.join(directory, name) for name in names if name.endswith(".pstats")]
+    allocations: Dict[str, Dict] = {}
+    for name in names:
+        if name.endswith(".allocations.json"):
+            prefix = name[:-len(".allocations.json")]
+            with open(os.path.join(directory, name), 'r', encoding='utf-8') as f:
+                for stage, entry in json.load(f).items():
+                    allocations[f"{prefix}.{stage}"] = entry
+    if not pstats_files and not allocations:
+        return ""
+
+    stats = pstats.Stats(*pstats_files, stream=io.StringIO()) if pstats_files else None
+    summary = format_summary(stats, allocations, top)
+    with open(os.path.join(directory, "summary.txt"), 'w', encoding='utf-8') as f:
+        f.write(summary)
+    return summary
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+仓库索引
+
+功能：以规范化的仓库键（owner/name，小写）为键维护 键 -> 记录 的索引，
+      供合并、去重等操作以O(1)查找代替重复构建URL集合
+"""
+
+import hashlib
+import json
+import logging
+from typing import Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 计算内容哈希时忽略的易变字段（每次运行都会变化，但不代表数据变化）
+VOLATILE_FIELDS = ("first_seen", "last_seen", "seen_count", "last_updated")
+
+# 合并后的仓库列表按 last_seen 从新到旧排列，元数据 sorted_by 记录这一点（清理时可直接从尾部淘汰）
+SORTED_BY = "last_seen"
+
+
+def normalize_repo_key(repo: Dict) -> str:
+    """
+    获取仓库的规范化键
+
+    优先从URL解析 owner/name（忽略协议、www、大小写、末尾斜杠和.git后缀），
+    URL不可用时回退到 full_name 或 author/name。
+
+    Args:
+        repo: 仓库数据
+
+    Returns:
+        规范化键，无法确定时返回空字符串
+    """
+    url = (repo.get('url') or '').strip().lower()
+    if url:
+        path = url.split('://', 1)[-1]
+        if path.startswith('www.'):
+            path = path[4:]
+        if path.startswith('github.com/'):
+            path = path[len('github.com/'):]
+        path = path.split('?', 1)[0].split('#', 1)[0].strip('/')
+        if path.endswith('.git'):
+            path = path[:-4]
+        parts = path.split('/')
+        if len(parts) >= 2 and parts[0] and parts[1]:
+            return f"{parts[0]}/{parts[1]}"
+        if path:
+            return path
+
+    full_name = (repo.get('full_name') or '').strip().lower()
+    if full_name:
+        return full_name
+
+    author = (repo.get('author') or '').strip().lower()
+    name = (repo.get('name') or '').strip().lower()
+    if author and name:
+        return f"{author}/{name}"
+    return ''
+
+
+def content_hash(repo: Dict) -> str:
+    """
+    计算单条记录的内容哈希（忽略易变字段，与字段顺序无关）
+
+    Args:
+        repo: 仓库数据
+
+    Returns:
+        SHA-1十六进制摘要
+    """
+    stable = {key: value for key, value in repo.items() if key not in VOLATILE_FIELDS}
+    raw = json.dumps(stable, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+class RepositoryIndex:
+    """规范化键 -> 仓库记录 的索引"""
+
+    def __init__(self, repositories: Optional[Iterable[Dict]] = None):
+        """
+        初始化索引
+
+        Args:
+            repositories: 初始仓库列表（重复键保留首次出现的记录）
+        """
+        self._records: Dict[str, Dict] = {}
+        for repo in repositories or []:
+            self.add(repo)
+
+    def add(self, repo: Dict) -> bool:
+        """
+        添加记录
+
+        Returns:
+            是否为新记录（键为空或已存在时返回False）
+        """
+        key = normalize_repo_key(repo)
+        if not key or key in self._records:
+            return False
+        self._records[key] = repo
+        return True
+
+    def get(self, repo_or_key) -> Optional[Dict]:
+        """按记录或键查找已索引的记录"""
+        key = repo_or_key if isinstance(repo_or_key, str) else normalize_repo_key(repo_or_key)
+        return self._records.get(key)
+
+    def remove(self, repo_or_key) -> Optional[Dict]:
+        """按记录或键移除记录"""
+        key = repo_or_key if isinstance(repo_or_key, str) else normalize_repo_key(repo_or_key)
+        return self._records.pop(key, None)
+
+    def __contains__(self, repo_or_key) -> bool:
+        key = repo_or_key if isinstance(repo_or_key, str) else normalize_repo_key(repo_or_key)
+        return bool(key) and key in self._records
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self._records.values())
+
+    def filter_new(self, repositories: Iterable[Dict]) -> List[Dict]:
+        """
+        过滤出索引中不存在的记录（同时去除输入内部的重复）
+
+        没有可用键（URL、full_name 和 author/name 都缺失）的记录无法识别，跳过。
+
+        Args:
+            repositories: 待过滤的记录
+
+        Returns:
+            新记录列表（保持输入顺序）
+        """
+        seen = set()
+        unique = []
+        unkeyed = 0
+        for repo in repositories:
+            key = normalize_repo_key(repo)
+            if not key:
+                unkeyed += 1
+                continue
+            if key in self._records or key in seen:
+                continue
+            seen.add(key)
+            unique.append(repo)
+        if unkeyed:
+            logger.warning(f"跳过 {unkeyed} 个缺少URL和名称的项目")
+        return unique
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+仓库记录类型
+
+功能：以 __slots__ 对象代替每条仓库数据的dict，常用字段存放在固定槽位中，
+      语言和时间戳等高度重复的字符串做驻留，字段顺序以共享的元组记录；
+      显示用的派生字段（*_text、language_color）不存储，读取时计算，
+      计算结果由有容量上限的LRU缓存复用（命中统计见 cache_stats）。
+      记录支持dict式读写（get、[]、in、items等），可以直接交给按dict编写的代码使用，
+      序列化时按原始字段顺序还原为dict
+"""
+
+import sys
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from language_colors import DEFAULT_LANGUAGE_COLOR, load_language_colors
+
+# 语言 -> 颜色（模块加载时由数据文件读取一次，见 language_colors.py）
+LANGUAGE_COLORS: Dict[str, str] = load_language_colors()
+
+# 显示字段缓存的容量上限：数字取值分散，颜色只与语言有关
+FORMAT_CACHE_SIZE = 4096
+COLOR_CACHE_SIZE = 1024
+
+
+# typed=True：5 与 5.0 的格式化结果不同，不能共用缓存项
+@lru_cache(maxsize=FORMAT_CACHE_SIZE, typed=True)
+def format_number(num: int) -> str:
+    """格式化数字显示（结果有缓存）"""
+    if num >= 1000000:
+        return f"{num/1000000:.1f}M"
+    elif num >= 1000:
+        return f"{num/1000:.1f}K"
+    else:
+        return str(num)
+
+
+@lru_cache(maxsize=COLOR_CACHE_SIZE)
+def language_color(language: str) -> str:
+    """获取编程语言对应的颜色（结果有缓存）"""
+    return LANGUAGE_COLORS.get(language, DEFAULT_LANGUAGE_COLOR)
+
+
+def set_language_colors(colors: Dict[str, str], replace: bool = False) -> None:
+    """
+    扩充或替换颜色表，并清空颜色缓存
+
+    Args:
+        colors: 语言 -> 颜色
+        replace: 为True时以 colors 替换整个颜色表，否则合并到现有颜色表
+    """
+    if replace:
+        LANGUAGE_COLORS.clear()
+    LANGUAGE_COLORS.update(colors)
+    language_color.cache_clear()
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    """
+    显示字段缓存的命中统计
+
+    Returns:
+        缓存名称 -> {hits, misses, maxsize, currsize}
+    """
+    return {
+        name: func.cache_info()._asdict()
+        for name, func in (('format_number', format_number), ('language_color', language_color))
+    }
+
+
+def clear_caches() -> None:
+    """清空显示字段缓存（命中统计一并清零）"""
+    format_number.cache_clear()
+    language_color.cache_clear()
+
+
+# 字段名 -> 槽位名（原始数据中的 currentPeriodStars 与处理后的 current_period_stars 共用一个槽位）
+FIELD_SLOTS = {
+    'author': 'author',
+    'name': 'name',
+    'full_name': 'full_name',
+    'url': 'url',
+    'description': 'description',
+    'language': 'language',
+    'stars': 'stars',
+    'forks': 'forks',
+    'currentPeriodStars': 'current_period_stars',
+    'current_period_stars': 'current_period_stars',
+    'first_seen': 'first_seen',
+    'last_seen': 'last_seen',
+    'seen_count': 'seen_count'
+}
+
+# 共用槽位的字段名 -> 另一个字段名
+FIELD_ALIASES = {'currentPeriodStars': 'current_period_stars', 'current_period_stars': 'currentPeriodStars'}
+
+# 取值高度重复、需要驻留的字段
+INTERNED_FIELDS = frozenset(('language', 'first_seen', 'last_seen'))
+
+
+def _to_int(value: Any) -> int:
+    """转换为整数，无法转换时返回0"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+# 派生字段 -> 由记录计算取值的函数
+DERIVED_FIELDS: Dict[str, Callable[['RepositoryRecord'], Any]] = {
+    'stars_text': lambda record: format_number(_to_int(record.get('stars', 0))),
+    'forks_text': lambda record: format_number(_to_int(record.get('forks', 0))),
+    'trending_stars_text': lambda record: format_number(_to_int(record.get('current_period_stars', 0))),
+    'language_color': lambda record: language_color(record.get('language'))
+}
+
+# 处理后记录的字段顺序（与 clean_repository_data 的输出一致）
+PROCESSED_FIELDS = (
+    'author', 'name', 'full_name', 'url', 'description', 'language', 'stars', 'forks',
+    'current_period_stars', 'stars_text', 'forks_text', 'trending_stars_text', 'language_color'
+)
+
+# 字段顺序元组的驻留表：字段相同的记录共享同一个元组
+_FIELD_ORDERS: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+
+def _intern_fields(fields: Tuple[str, ...]) -> Tuple[str, ...]:
+    return _FIELD_ORDERS.setdefault(fields, fields)
+
+
+class RepositoryRecord:
+    """仓库记录"""
+
+    __slots__ = (
+        'author', 'name', 'full_name', 'url', 'description', 'language', 'stars', 'forks',
+        'current_period_stars', 'first_seen', 'last_seen', 'seen_count', '_fields', '_extra'
+    )
+
+    def __init__(self, data: Optional[Dict] = None):
+        """
+        初始化记录
+
+        Args:
+            data: 仓库数据（字段顺序会被保留）
+        """
+        self._fields: Tuple[str, ...] = ()
+        # 不在槽位中的字段，以及与计算结果不同的派生字段取值
+        self._extra: Optional[Dict[str, Any]] = None
+        if data:
+            for key, value in data.items():
+                self[key] = value
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'RepositoryRecord':
+        """由dict创建记录（已经是记录时原样返回）"""
+        return data if isinstance(data, cls) else cls(data)
+
+    @classmethod
+    def processed(cls, author: str, name: str, url: str, description: Any, language: str,
+                  stars: int, forks: int, current_period_stars: int) -> 'RepositoryRecord':
+        """
+        创建处理后的记录（字段与 clean_repository_data 的输出相同，显示字段读取时计算）
+        """
+        record = cls()
+        record.author = author
+        record.name = name
+        record.full_name = f"{author}/{name}"
+        record.url = url
+        record.description = description
+        record.language = sys.intern(language) if isinstance(language, str) else language
+        record.stars = stars
+        record.forks = forks
+        record.current_period_stars = current_period_stars
+        record._fields = _intern_fields(PROCESSED_FIELDS)
+        return record
+
+    def to_dict(self) -> Dict:
+        """按原始字段顺序转换为dict"""
+        return {key: self[key] for key in self._fields}
+
+    def _slot_value(self, key: str) -> Any:
+        """读取字段取值（字段必须存在）"""
+        slot = FIELD_SLOTS.get(key)
+        if slot is not None and (self._extra is None or key not in self._extra):
+            return getattr(self, slot)
+        if key in DERIVED_FIELDS and (self._extra is None or key not in self._extra):
+            return DERIVED_FIELDS[key](self)
+        return self._extra[key]
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._fields:
+            raise KeyError(key)
+        return self._slot_value(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        is_new = key not in self._fields
+        if is_new:
+            self._fields = _intern_fields(self._fields + (key,))
+
+        slot = FIELD_SLOTS.get(key)
+        # 同一槽位已被另一个字段名占用时（同时有 currentPeriodStars 和 current_period_stars），存入额外字段
+        if slot is not None and FIELD_ALIASES.get(key) not in self._fields:
+            if key in INTERNED_FIELDS and isinstance(value, str):
+                value = sys.intern(value)
+            setattr(self, slot, value)
+            return
+
+        if key in DERIVED_FIELDS and value == DERIVED_FIELDS[key](self):
+            # 与计算结果相同的派生字段不存储
+            if self._extra is not None:
+                self._extra.pop(key, None)
+            return
+
+        if self._extra is None:
+            self._extra = {}
+        self._extra[key] = value
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._fields
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._fields)
+
+    def __len__(self) -> int:
+        return len(self._fields)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, RepositoryRecord):
+            return self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"RepositoryRecord({self.to_dict()!r})"
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._slot_value(key) if key in self._fields else default
+
+    def setdefault(self, key: str, default: Any = None) -> Any:
+        if key not in self._fields:
+            self[key] = default
+        return self[key]
+
+    def keys(self) -> List[str]:
+        return list(self._fields)
+
+    def values(self) -> List[Any]:
+        return [self[key] for key in self._fields]
+
+    def items(self) -> List[Tuple[str, Any]]:
+        return [(key, self[key]) for key in self._fields]
+
+
+def column(records: Iterable[Any], key: str, default: Any = None) -> List[Any]:
+    """
+    批量读取一列字段（等价于 [record.get(key, default) for record in records]）
+
+    字段顺序相同的记录共享同一个 _fields 元组，每遇到一个新元组只判断一次字段是否存在，
+    之后直接读取槽位，不经过 get 的逐条查找；dict，以及同时带有共用槽位的两个字段名的记录仍使用 get。
+
+    Args:
+        records: 记录或dict的序列
+        key: 字段名
+        default: 字段不存在时的取值
+
+    Returns:
+        字段值列表
+    """
+    slot = FIELD_SLOTS.get(key)
+    alias = FIELD_ALIASES.get(key)
+    values = []
+    append = values.append
+    fields = present = direct = None
+    for record in records:
+        if slot is None or type(record) is not RepositoryRecord:
+            append(record.get(key, default))
+            continue
+        if record._fields is not fields:
+            fields = record._fields
+            present = key in fields
+            # 两个字段名都存在时，后出现的那个存放在额外字段中
+            direct = not (present and alias in fields)
+        if not direct:
+            append(record.get(key, default))
+        else:
+            append(getattr(record, slot) if present else default)
+    return values
+
+
+def missing_fields(records: Iterable[Any], required: Iterable[str]) -> List[Tuple[int, str]]:
+    """
+    列出记录缺少的必需字段
+
+    与 column 相同，字段元组相同的记录只检查一次。
+
+    Args:
+        records: 记录或dict的序列
+        required: 必需字段名
+
+    Returns:
+        按记录下标和字段顺序排列的 (下标, 字段名) 列表
+    """
+    required = list(required)
+    missing = []
+    fields = absent = None
+    for i, record in enumerate(records):
+        if type(record) is RepositoryRecord:
+            if record._fields is not fields:
+                fields = record._fields
+                absent = [field for field in required if field not in fields]
+            lacking = absent
+        else:
+            lacking = [field for field in required if field not in record]
+        for field in lacking:
+            missing.append((i, field))
+    return missing
+
+
+def records_from_dicts(repositories: Iterable[Any]) -> List[Any]:
+    """将仓库数据列表转换为记录列表（不是dict的元素原样保留，交给调用方校验）"""
+    return [RepositoryRecord(repo) if isinstance(repo, dict) else repo for repo in repositories]
+
+
+def load_records(data: Optional[Dict]) -> Optional[Dict]:
+    """将数据集中的 repositories 原地转换为记录列表，返回数据集本身"""
+    if data and isinstance(data.get('repositories'), list):
+        data['repositories'] = records_from_dicts(data['repositories'])
+    return data
+
+
+def json_default(value: Any) -> Any:
+    """供 json.dump(default=...) 使用：将记录序列化为dict"""
+    if isinstance(value, RepositoryRecord):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
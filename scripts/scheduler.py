@@ -4,6 +4,7 @@
 用于自动化执行数据获取、处理和清理任务
 """
 
+import json
 import os
 import time
 import schedule
@@ -11,11 +12,20 @@ import logging
 from datetime import datetime
 import subprocess
 import sys
+import threading
+from typing import Callable, List, Optional, Tuple
+
+from job_engine import DEFAULT_LOCK_DIR, DEFAULT_WORKERS, JobEngine, run_exclusive
+from locks import DATA_LOCK_TIMEOUT, data_lock
+from metrics import METRICS_FILE_ENV, REGISTRY, MetricsRegistry, load_snapshot, peak_rss_bytes, use_registry
+from polling import MAX_INTERVAL, MIN_INTERVAL, AdaptivePollingPlanner
+from profiling import (DEFAULT_PROFILE_ROOT, DEFAULT_TOP, StageProfiler, add_profile_arguments, default_profile_dir,
+                       summarize_profiles)
 
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
+    format='%(asctime)s - %(levelname)s - [%(threadName)s] %(message)s',
     handlers=[
         logging.FileHandler("../logs/scheduler.log"),
         logging.StreamHandler(sys.stdout)
@@ -23,60 +33,137 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 获取脚本在数据未变化时的退出码（与 fetch_trending.NO_CHANGES_EXIT_CODE 一致）
+NO_CHANGES_EXIT_CODE = 3
+
+# 脚本 -> 指标中的阶段名称（与进程内流水线的阶段对应）
+SCRIPT_STAGES = {
+    "fetch_trending.py": "fetch",
+    "process_data.py": "process",
+    "cleanup_data.py": "cleanup",
+    "storage.py": "export"
+}
+
+# 支持 --profile 的脚本
+PROFILED_SCRIPTS = ("fetch_trending.py", "process_data.py", "cleanup_data.py")
+
 
 class DataScheduler:
     """数据调度器"""
     
-    def __init__(self, scripts_dir: str = "."):
+    def __init__(self, scripts_dir: str = ".", pipeline: str = "subprocess",
+                 metrics_dir: str = "../logs/metrics", profile_root: Optional[str] = None,
+                 profile_top: int = DEFAULT_TOP, workers: int = DEFAULT_WORKERS,
+                 lock_dir: str = DEFAULT_LOCK_DIR, adaptive: bool = False,
+                 min_interval: float = MIN_INTERVAL, max_interval: float = MAX_INTERVAL):
         """
         初始化调度器
         
         Args:
             scripts_dir: 脚本目录路径
+            pipeline: 流水线模式（subprocess: 每个阶段运行独立脚本；inprocess: 在当前进程内执行并在内存中传递数据）
+            metrics_dir: 指标输出目录（Prometheus textfile 和JSON运行报告）
+            profile_root: 性能剖析结果的根目录（为None时不剖析；每次运行写入其下的 <时间>-<任务>/）
+            profile_top: 剖析摘要中列出的条目数
+            workers: 持续调度时的工作线程数（同时运行的任务数上限）
+            lock_dir: 任务锁文件目录
+            adaptive: 自适应轮询（按各查询结果的变化率决定何时获取，代替固定的每小时更新）
+            min_interval: 自适应轮询的最短间隔（秒）
+            max_interval: 自适应轮询的最长间隔（秒）
         """
         self.scripts_dir = scripts_dir
+        self.pipeline = pipeline
+        self.metrics_dir = metrics_dir
+        self.profile_root = profile_root
+        self.profile_top = profile_top
+        self.workers = workers
+        self.lock_dir = lock_dir
+        self.adaptive = adaptive
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        # 任务在各自的工作线程中运行，剖析目录和退出码按线程保存
+        self._local = threading.local()
+        self._report_lock = threading.Lock()
         self.setup_directories()
     
+    @property
+    def profile_dir(self) -> Optional[str]:
+        """当前线程中运行的任务的剖析目录（未剖析时为None）"""
+        return getattr(self._local, "profile_dir", None)
+    
+    @profile_dir.setter
+    def profile_dir(self, value: Optional[str]) -> None:
+        self._local.profile_dir = value
+    
+    @property
+    def last_returncode(self) -> Optional[int]:
+        """当前线程最近一次运行的脚本的退出码"""
+        return getattr(self._local, "last_returncode", None)
+    
+    @last_returncode.setter
+    def last_returncode(self, value: Optional[int]) -> None:
+        self._local.last_returncode = value
+    
     def setup_directories(self):
         """设置必要的目录"""
         os.makedirs("../logs", exist_ok=True)
         os.makedirs("../data", exist_ok=True)
+        os.makedirs(self.metrics_dir, exist_ok=True)
+        os.makedirs(self.lock_dir, exist_ok=True)
     
-    def run_script(self, script_name: str) -> bool:
+    def run_script(self, script_name: str, args: Optional[List[str]] = None,
+                   ok_codes: Tuple[int, ...] = (0,)) -> bool:
         """
         运行指定的Python脚本
         
         Args:
             script_name: 脚本文件名
+            args: 传给脚本的命令行参数
+            ok_codes: 视为成功的退出码（实际退出码保存在 last_returncode 中）
             
         Returns:
             运行是否成功
         """
+        self.last_returncode = None
         script_path = os.path.join(self.scripts_dir, script_name)
+        stage = SCRIPT_STAGES.get(script_name, os.path.splitext(script_name)[0])
         
         if not os.path.exists(script_path):
             logger.error(f"脚本文件不存在: {script_path}")
+            self.record_stage(stage, 0.0, False)
             return False
         
+        args = list(args or [])
+        if self.profile_dir and script_name in PROFILED_SCRIPTS:
+            args += ["--profile", os.path.abspath(self.profile_dir), "--profile-top", str(self.profile_top)]
+        
+        # 脚本退出时把自己的指标写入此文件，运行结束后合并
+        metrics_file = os.path.abspath(os.path.join(
+            self.metrics_dir, f".{stage}.{os.getpid()}.{threading.get_ident()}.json"
+        ))
+        start_time = time.time()
+        success = False
         try:
             logger.info(f"开始执行脚本: {script_name}")
-            start_time = time.time()
             
             # 运行脚本
             result = subprocess.run(
-                [sys.executable, script_path],
+                [sys.executable, script_path, *args],
                 cwd=self.scripts_dir,
                 capture_output=True,
                 text=True,
-                timeout=300  # 5分钟超时
+                timeout=300,  # 5分钟超时
+                env={**os.environ, METRICS_FILE_ENV: metrics_file}
             )
             
             execution_time = time.time() - start_time
+            self.last_returncode = result.returncode
             
-            if result.returncode == 0:
+            if result.returncode in ok_codes:
                 logger.info(f"脚本执行成功: {script_name} (耗时: {execution_time:.2f}秒)")
                 if result.stdout:
                     logger.debug(f"脚本输出:\n{result.stdout}")
+                success = True
                 return True
             else:
                 logger.error(f"脚本执行失败: {script_name} (退出码: {result.returncode})")
@@ -90,11 +177,29 @@ class DataScheduler:
         except Exception as e:
             logger.error(f"执行脚本时发生异常 {script_name}: {str(e)}")
             return False
+        finally:
+            self.record_stage(stage, time.time() - start_time, success)
+            if os.path.exists(metrics_file):
+                REGISTRY.merge(load_snapshot(metrics_file))
+                os.remove(metrics_file)
+    
+    def record_stage(self, stage: str, seconds: float, success: bool) -> None:
+        """记录阶段耗时和是否成功"""
+        REGISTRY.observe("hotweek_stage_seconds", seconds, stage=stage)
+        REGISTRY.set("hotweek_stage_success", 1 if success else 0, stage=stage)
     
     def fetch_trending_data(self) -> bool:
         """获取GitHub热榜数据"""
         logger.info("=== 开始获取GitHub热榜数据 ===")
-        return self.run_script("fetch_trending.py")
+        args = ["--signal-unchanged"]
+        if self.adaptive:
+            args += ["--adaptive", "--min-interval", f"{self.min_interval / 60:g}",
+                     "--max-interval", f"{self.max_interval / 60:g}"]
+        return self.run_script("fetch_trending.py", args, ok_codes=(0, NO_CHANGES_EXIT_CODE))
+    
+    def polling_planner(self) -> AdaptivePollingPlanner:
+        """读取最新的自适应轮询状态（获取脚本在子进程中更新状态文件）"""
+        return AdaptivePollingPlanner(min_interval=self.min_interval, max_interval=self.max_interval)
     
     def process_data(self) -> bool:
         """处理数据"""
@@ -106,11 +211,24 @@ class DataScheduler:
         logger.info("=== 开始清理数据 ===")
         return self.run_script("cleanup_data.py")
     
+    def export_data(self) -> bool:
+        """将存储中的数据导出为JSON文件（仅SQLite后端需要）"""
+        if os.environ.get("HOTWEEK_STORAGE", "json").lower() != "sqlite":
+            return True
+        logger.info("=== 开始导出数据 ===")
+        return self.run_script("storage.py")
+    
     def full_update(self) -> bool:
         """完整更新流程"""
+        if self.pipeline == "inprocess":
+            return self.run_pipeline()
+        
         logger.info("=== 开始完整数据更新流程 ===")
         
         success_fetch = self.fetch_trending_data()
+        if success_fetch and self.last_returncode == NO_CHANGES_EXIT_CODE:
+            logger.info("=== 数据未变化，跳过处理和清理 ===")
+            return True
         if not success_fetch:
             logger.warning("数据获取失败，但继续尝试处理现有数据")
         
@@ -119,6 +237,7 @@ class DataScheduler:
         # 只有在数据获取或处理成功时才进行清理
         if success_fetch or success_process:
             self.cleanup_data()
+            self.export_data()
         
         overall_success = success_fetch or success_process
         
@@ -129,42 +248,251 @@ class DataScheduler:
         
         return overall_success
     
-    def setup_schedule(self):
-        """设置定时任务"""
-        # 每小时执行一次完整更新
-        schedule.every().hour.do(self.full_update)
+    def run_pipeline(self) -> bool:
+        """
+        在当前进程内执行完整更新流程
+        
+        直接调用获取、处理、清理三个阶段，阶段之间在内存中传递数据，
+        只在最后写入一次文件，省去子进程启动和中间文件的读写。
+        
+        Returns:
+            运行是否成功
+        """
+        from circuit_breaker import CircuitBreaker
+        from cleanup_data import DataCleanup
+        from fetch_trending import GitHubTrendingFetcher, record_polls
+        from http_cache import HTTPCache
+        from process_data import GitHubDataProcessor
+        from snapshot_log import SnapshotLog
+        from storage import get_storage
+        
+        logger.info("=== 开始完整数据更新流程（进程内） ===")
+        start_time = time.time()
+        stage_start = start_time
+        stage = "init"
+        storage = get_storage()
+        lock = data_lock()
+        # 摘要由 run_job 合并输出
+        profiler = StageProfiler(self.profile_dir, "pipeline", self.profile_top,
+                                 enabled=self.profile_dir is not None, log_summary=False)
+        
+        try:
+            fetcher = GitHubTrendingFetcher(cache=HTTPCache(), storage=storage, snapshot_log=SnapshotLog(),
+                                            breaker=CircuitBreaker())
+            processor = GitHubDataProcessor(storage=storage)
+            cleanup = DataCleanup(storage=storage)
+            profiler.instrument(fetcher, "fetch_trending_repositories", "merge_data")
+            profiler.instrument(processor, "process_data", "save_processed_data")
+            profiler.instrument(cleanup, "clean_trending_data", "clean_processed_data", "compact_history")
+            profiler.instrument(storage, "load", "save", "export_all")
+            
+            # 获取
+            stage_start = time.time()
+            stage = "fetch"
+            planner = self.polling_planner() if self.adaptive else None
+            if planner is not None and not planner.is_due("", "weekly"):
+                self.record_stage(stage, time.time() - stage_start, True)
+                logger.info("=== 自适应轮询: 查询未到轮询时间，跳过本次更新 ===")
+                return True
+            fetched_data = fetcher.fetch_trending_repositories(language="", since="weekly")
+            if planner is not None:
+                record_polls(planner, {("", "weekly"): fetched_data}, stale=fetcher.stale_queries)
+            if not fetched_data:
+                if storage.exists(cleanup.trending_file):
+                    self.record_stage(stage, time.time() - stage_start, False)
+                    logger.warning("=== API调用失败且没有可用的缓存数据，保留现有数据 ===")
+                    return True
+                logger.warning("API调用失败，使用模拟数据进行演示")
+                fetched_data = fetcher.get_mock_data()
+            # 网络请求之后的读取、合并、写入期间持有数据锁，避免与清理任务同时改写数据文件
+            if not lock.acquire(timeout=DATA_LOCK_TIMEOUT):
+                raise TimeoutError(f"等待数据锁超时（{DATA_LOCK_TIMEOUT}秒）")
+            existing_data = fetcher.load_existing_data(cleanup.trending_file)
+            if fetcher.is_unchanged(fetched_data, existing_data):
+                self.record_stage(stage, time.time() - stage_start, True)
+                logger.info(f"=== 数据未变化，跳过处理、清理和写入 (耗时: {time.time() - start_time:.2f}秒) ===")
+                return True
+            trending_data = fetcher.merge_data(fetched_data, existing_data, upsert=True)
+            logger.info(f"获取阶段完成 (耗时: {time.time() - stage_start:.2f}秒)")
+            self.record_stage(stage, time.time() - stage_start, True)
+            
+            # 处理
+            stage_start = time.time()
+            stage = "process"
+            processed_data = processor.process_data(trending_data)
+            if not processed_data:
+                logger.error("数据处理失败，仍然保存获取到的数据")
+            logger.info(f"处理阶段完成 (耗时: {time.time() - stage_start:.2f}秒)")
+            self.record_stage(stage, time.time() - stage_start, processed_data is not None)
+            
+            # 清理
+            stage_start = time.time()
+            stage = "cleanup"
+            trending_data = cleanup.clean_trending_data(trending_data, max_days=30)
+            if processed_data:
+                processed_data = cleanup.clean_processed_data(processed_data, max_items=50)
+            logger.info(f"清理阶段完成 (耗时: {time.time() - stage_start:.2f}秒)")
+            self.record_stage(stage, time.time() - stage_start, True)
+            
+            # 写入
+            stage_start = time.time()
+            stage = "write"
+            fetcher.write_output(trending_data, fetched_data, cleanup.trending_file)
+            if processed_data:
+                processor.save_processed_data(processed_data, cleanup.processed_file,
+                                              payload=True, shards=True, search_index=True)
+            cleanup.compact_history(keep_days=7)
+            storage.export_all()
+            logger.info(f"写入阶段完成 (耗时: {time.time() - stage_start:.2f}秒)")
+            self.record_stage(stage, time.time() - stage_start, True)
+            
+        except Exception as e:
+            self.record_stage(stage, time.time() - stage_start, False)
+            logger.error(f"进程内更新流程异常: {str(e)}")
+            logger.error("=== 完整数据更新流程失败 ===")
+            return False
+        finally:
+            profiler.finish()
+            storage.close()
+            lock.release()
+        
+        logger.info(f"=== 完整数据更新流程完成 (耗时: {time.time() - start_time:.2f}秒) ===")
+        return True
+    
+    def run_job(self, job: str, func: Callable[[], bool]) -> bool:
+        """
+        执行一个任务并输出本次运行的指标
+        
+        每次运行使用独立的指标注册表（并发运行的任务互不影响），结束后写出
+        Prometheus textfile（hotweek_<任务>.prom）、最近一次的运行报告（<任务>.json），
+        并在 runs.jsonl 中追加一行。
+        
+        Args:
+            job: 任务名称
+            func: 任务函数
+            
+        Returns:
+            任务是否成功
+        """
+        with use_registry(MetricsRegistry()):
+            return self._run_job(job, func)
+    
+    def _run_job(self, job: str, func: Callable[[], bool]) -> bool:
+        started_at = datetime.now()
+        start_time = time.time()
+        success = False
+        if self.profile_root is not None:
+            self.profile_dir = default_profile_dir(job, self.profile_root)
+        try:
+            success = bool(func())
+            return success
+        finally:
+            if self.profile_dir:
+                summary = summarize_profiles(self.profile_dir, self.profile_top)
+                if summary:
+                    logger.info(f"性能剖析结果已写入: {self.profile_dir}\n{summary}")
+                self.profile_dir = None
+            duration = time.time() - start_time
+            REGISTRY.set("hotweek_run_seconds", duration)
+            REGISTRY.set("hotweek_run_success", 1 if success else 0)
+            REGISTRY.set("hotweek_last_run_timestamp_seconds", time.time())
+            rss = peak_rss_bytes()
+            if rss is not None:
+                REGISTRY.set("hotweek_peak_rss_bytes", rss, process="scheduler")
+            self.write_run_report(job, started_at, duration, success)
+    
+    def write_run_report(self, job: str, started_at: datetime, duration: float, success: bool) -> None:
+        """写出本次运行的 Prometheus textfile 和JSON运行报告"""
+        report = {
+            "job": job,
+            "pipeline": self.pipeline,
+            "started_at": started_at.isoformat(),
+            "finished_at": datetime.now().isoformat(),
+            "duration_seconds": round(duration, 3),
+            "success": success,
+            "metrics": REGISTRY.snapshot()
+        }
+        try:
+            REGISTRY.write_prometheus(os.path.join(self.metrics_dir, f"hotweek_{job}.prom"), hotweek_job=job)
+            report_file = os.path.join(self.metrics_dir, f"{job}.json")
+            with open(f"{report_file}.tmp", 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            os.replace(f"{report_file}.tmp", report_file)
+            # 并发结束的任务不交错写入同一行
+            with self._report_lock, open(os.path.join(self.metrics_dir, "runs.jsonl"), 'a', encoding='utf-8') as f:
+                f.write(json.dumps(report, ensure_ascii=False) + "\n")
+            logger.info(f"运行指标已写入: {self.metrics_dir}")
+        except OSError as e:
+            logger.error(f"写入运行指标失败: {str(e)}")
+    
+    def setup_schedule(self, engine: JobEngine):
+        """设置定时任务（到点时只触发任务，由执行引擎在工作线程中运行）"""
+        engine.add_job("full_update", lambda: self.run_job("full_update", self.full_update))
+        engine.add_job("cleanup", lambda: self.run_job("cleanup", self.cleanup_data))
+        
+        if self.adaptive:
+            # 按最短间隔检查，有查询到了轮询时间才执行完整更新
+            minutes = max(1, int(self.min_interval // 60))
+            schedule.every(minutes).minutes.do(self.trigger_if_due, engine)
+        else:
+            # 每小时执行一次完整更新
+            schedule.every().hour.do(engine.trigger, "full_update")
         
         # 每天凌晨2点执行数据清理
-        schedule.every().day.at("02:00").do(self.cleanup_data)
+        schedule.every().day.at("02:00").do(engine.trigger, "cleanup")
         
         logger.info("定时任务设置完成:")
-        logger.info("  - 每小时执行完整数据更新")
+        if self.adaptive:
+            logger.info(f"  - 自适应轮询：每 {minutes} 分钟检查一次，各查询间隔 "
+                        f"{self.min_interval / 60:g}~{self.max_interval / 60:g} 分钟")
+        else:
+            logger.info("  - 每小时执行完整数据更新")
         logger.info("  - 每天凌晨2点执行数据清理")
     
+    def trigger_if_due(self, engine: JobEngine) -> bool:
+        """自适应轮询：有查询到期时触发完整更新"""
+        planner = self.polling_planner()
+        if not planner.any_due():
+            return False
+        if planner.queries:
+            logger.info("自适应轮询状态:\n" + "\n".join(planner.describe()))
+        return engine.trigger("full_update")
+    
     def run_once(self):
-        """运行一次完整更新"""
+        """运行一次完整更新（调度器正在运行完整更新时跳过）"""
         logger.info("执行单次完整更新")
-        return self.full_update()
+        return bool(run_exclusive("full_update", lambda: self.run_job("full_update", self.full_update),
+                                  self.lock_dir))
     
-    def run_scheduler(self):
-        """运行调度器（持续运行）"""
-        logger.info("启动数据调度器")
-        self.setup_schedule()
+    def run_scheduler(self, poll_interval: float = 1.0):
+        """
+        运行调度器（持续运行）
+        
+        Args:
+            poll_interval: 检查定时任务的间隔（秒）；任务在工作线程中运行，检查本身不会被阻塞
+        """
+        logger.info(f"启动数据调度器（工作线程: {self.workers}）")
+        engine = JobEngine(max_workers=self.workers, lock_dir=self.lock_dir)
+        self.setup_schedule(engine)
         
         # 立即执行一次完整更新
-        self.full_update()
+        engine.trigger("full_update")
         
         logger.info("调度器开始运行，按Ctrl+C停止")
         
         try:
             while True:
                 schedule.run_pending()
-                time.sleep(60)  # 每分钟检查一次
+                time.sleep(poll_interval)
                 
         except KeyboardInterrupt:
-            logger.info("调度器已停止")
+            logger.info("调度器正在停止")
         except Exception as e:
             logger.error(f"调度器运行异常: {str(e)}")
+        finally:
+            schedule.clear()
+            engine.shutdown(wait=True)
+            logger.info("调度器已停止")
 
 
 def main():
@@ -178,10 +506,51 @@ def main():
         default="once",
         help="运行模式: once(单次运行) 或 scheduler(持续调度)"
     )
+    parser.add_argument(
+        "--metrics-dir",
+        default="../logs/metrics",
+        help="指标输出目录（Prometheus textfile 和JSON运行报告）"
+    )
+    add_profile_arguments(
+        parser, help=f"以cProfile和tracemalloc剖析每次运行的各阶段，结果写入DIR/<时间>-<任务>/（默认DIR为 {DEFAULT_PROFILE_ROOT}）"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help="持续调度时的工作线程数（不同任务可同时运行，同一任务不会重叠）"
+    )
+    parser.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="自适应轮询：按各查询结果的变化率决定获取时机（代替每小时更新）"
+    )
+    parser.add_argument(
+        "--min-interval",
+        type=float,
+        default=MIN_INTERVAL / 60,
+        help="自适应轮询的最短间隔（分钟）"
+    )
+    parser.add_argument(
+        "--max-interval",
+        type=float,
+        default=MAX_INTERVAL / 60,
+        help="自适应轮询的最长间隔（分钟）"
+    )
+    parser.add_argument(
+        "--pipeline",
+        choices=["subprocess", "inprocess"],
+        default="subprocess",
+        help="流水线模式: subprocess(每个阶段独立进程) 或 inprocess(进程内执行，内存中传递数据)"
+    )
     
     args = parser.parse_args()
     
-    scheduler = DataScheduler()
+    profile_root = None if args.profile is None else (args.profile or DEFAULT_PROFILE_ROOT)
+    scheduler = DataScheduler(pipeline=args.pipeline, metrics_dir=args.metrics_dir,
+                              profile_root=profile_root, profile_top=args.profile_top,
+                              workers=max(1, args.workers), adaptive=args.adaptive,
+                              min_interval=args.min_interval * 60, max_interval=args.max_interval * 60)
     
     if args.mode == "once":
         # 单次运行模式
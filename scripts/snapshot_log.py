@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+热榜历史快照日志
+
+功能：每次获取的数据以一行JSON追加到按天划分的日志段（segment-YYYYMMDD.jsonl），
+      追加只写入新数据且不改动已有内容；压缩任务把过期日志段折叠为
+      每个仓库一条的汇总（summary.json），再删除已折叠的日志段
+"""
+
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+from repo_index import normalize_repo_key
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".jsonl"
+SUMMARY_FILE = "summary.json"
+# 历史日志不放在 data/ 下：data/ 由工作流整体提交发布；工作流把该目录单独保存在 history 分支上
+DEFAULT_LOG_DIR = "../db/history"
+
+
+class SnapshotLog:
+    """追加写入的快照日志"""
+
+    def __init__(self, log_dir: str = DEFAULT_LOG_DIR, fsync: bool = True):
+        """
+        初始化快照日志
+
+        Args:
+            log_dir: 日志目录
+            fsync: 追加后是否fsync（保证进程或机器崩溃时已返回的追加不丢失）
+        """
+        self.log_dir = log_dir
+        self.fsync = fsync
+        self.summary_file = os.path.join(log_dir, SUMMARY_FILE)
+
+    def _segment_path(self, day: datetime) -> str:
+        """某一天对应的日志段路径"""
+        return os.path.join(self.log_dir, f"{SEGMENT_PREFIX}{day.strftime('%Y%m%d')}{SEGMENT_SUFFIX}")
+
+    def segments(self) -> List[str]:
+        """按时间顺序列出所有日志段文件名"""
+        if not os.path.isdir(self.log_dir):
+            return []
+        return sorted(
+            name for name in os.listdir(self.log_dir)
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)
+        )
+
+    def append(self, repositories: List[Dict], metadata: Optional[Dict] = None,
+               fetched_at: Optional[datetime] = None) -> str:
+        """
+        追加一次获取的快照
+
+        Args:
+            repositories: 本次获取到的仓库数据
+            metadata: 快照元数据（使用其中的 source）
+            fetched_at: 获取时间，默认当前时间
+
+        Returns:
+            写入的日志段路径
+        """
+        fetched_at = fetched_at or datetime.now()
+        record = {
+            "fetched_at": fetched_at.isoformat(),
+            "source": (metadata or {}).get('source'),
+            "repositories": [
+                {
+                    "full_name": normalize_repo_key(repo),
+                    "language": repo.get('language'),
+                    "stars": repo.get('stars'),
+                    "forks": repo.get('forks'),
+                    "current_period_stars": repo.get('currentPeriodStars')
+                }
+                for repo in repositories if normalize_repo_key(repo)
+            ]
+        }
+
+        os.makedirs(self.log_dir, exist_ok=True)
+        path = self._segment_path(fetched_at)
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n"
+
+        # 上次追加在写到一半时中断，补一个换行，避免新记录接在不完整的行后面
+        if self._missing_trailing_newline(path):
+            line = "\n" + line
+
+        # 单次write追加整行；崩溃时最多留下一行不完整的尾部，读取时会被跳过
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(line)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+
+        logger.info(f"快照已追加到: {path} ({len(record['repositories'])} 个项目)")
+        return path
+
+    @staticmethod
+    def _missing_trailing_newline(path: str) -> bool:
+        """非空文件是否缺少结尾换行"""
+        try:
+            with open(path, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell() == 0:
+                    return False
+                f.seek(-1, os.SEEK_END)
+                return f.read(1) != b"\n"
+        except FileNotFoundError:
+            return False
+
+    def read_segment(self, name: str) -> Iterator[Dict]:
+        """逐条读取日志段中的快照（跳过不完整或损坏的行）"""
+        path = os.path.join(self.log_dir, name)
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"跳过损坏的快照记录: {name} 第{line_no}行")
+
+    def load_summary(self) -> Dict:
+        """加载压缩汇总，不存在时返回空汇总"""
+        try:
+            with open(self.summary_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"compacted_segments": [], "snapshot_count": 0, "repositories": {}}
+
+    def compact(self, keep_days: int = 7, now: Optional[datetime] = None) -> int:
+        """
+        将早于 keep_days 天的日志段折叠进汇总
+
+        先原子写入汇总（记录已折叠的日志段名），再删除日志段；
+        若删除前中断，下次压缩会根据记录跳过这些日志段，不会重复计数。
+
+        Args:
+            keep_days: 保留原始日志段的天数
+            now: 当前时间，默认 datetime.now()
+
+        Returns:
+            折叠的日志段数量
+        """
+        now = now or datetime.now()
+        cutoff = self._segment_path(now - timedelta(days=keep_days))
+        cutoff_name = os.path.basename(cutoff)
+
+        summary = self.load_summary()
+        compacted = set(summary.get('compacted_segments', []))
+        candidates = [name for name in self.segments() if name < cutoff_name]
+        pending = [name for name in candidates if name not in compacted]
+
+        if not candidates:
+            logger.info("没有需要压缩的快照日志段")
+            return 0
+
+        repositories = summary.setdefault('repositories', {})
+        for name in pending:
+            for snapshot in self.read_segment(name):
+                summary['snapshot_count'] = summary.get('snapshot_count', 0) + 1
+                fetched_at = snapshot.get('fetched_at')
+                for item in snapshot.get('repositories', []):
+                    self._fold_item(repositories, item, fetched_at)
+            compacted.add(name)
+
+        summary['compacted_segments'] = sorted(compacted)
+        summary['compacted_at'] = now.isoformat()
+        self._write_summary(summary)
+
+        for name in candidates:
+            try:
+                os.remove(os.path.join(self.log_dir, name))
+            except FileNotFoundError:
+                pass
+
+        # 日志段已删除，不再需要记录其名称
+        summary['compacted_segments'] = []
+        self._write_summary(summary)
+
+        logger.info(f"快照日志压缩完成: 折叠 {len(pending)} 个日志段，汇总共 {len(repositories)} 个项目")
+        return len(pending)
+
+    def _fold_item(self, repositories: Dict[str, Dict], item: Dict, fetched_at: Optional[str]) -> None:
+        """将一条快照记录折叠进汇总"""
+        key = item.get('full_name')
+        if not key:
+            return
+
+        entry = repositories.get(key)
+        if entry is None:
+            entry = repositories[key] = {
+                "first_seen": fetched_at,
+                "last_seen": fetched_at,
+                "appearances": 0,
+                "max_stars": 0,
+                "max_current_period_stars": 0
+            }
+
+        entry['appearances'] += 1
+        if fetched_at and (not entry['first_seen'] or fetched_at < entry['first_seen']):
+            entry['first_seen'] = fetched_at
+        if fetched_at and (not entry['last_seen'] or fetched_at >= entry['last_seen']):
+            entry['last_seen'] = fetched_at
+            entry['language'] = item.get('language')
+            entry['stars'] = item.get('stars')
+            entry['forks'] = item.get('forks')
+        entry['max_stars'] = max(entry['max_stars'], self._to_int(item.get('stars')))
+        entry['max_current_period_stars'] = max(
+            entry['max_current_period_stars'], self._to_int(item.get('current_period_stars'))
+        )
+
+    def _write_summary(self, summary: Dict) -> None:
+        """原子写入汇总文件"""
+        tmp_file = f"{self.summary_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, separators=(',', ':'))
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_file, self.summary_file)
+
+    @staticmethod
+    def _to_int(value) -> int:
+        """转换为整数，无法转换时返回0"""
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return 0
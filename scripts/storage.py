@@ -0,0 +1,605 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据存储层
+
+功能：为获取、处理、清理三个脚本提供统一的数据读写接口，
+      支持JSON文件（默认）和SQLite两种后端。
+      SQLite后端按仓库逐行存储并记录每次获取的快照，
+      JSON文件作为导出产物生成（供网页读取）。
+
+后端通过环境变量选择：
+    HOTWEEK_STORAGE=json|sqlite   （默认json）
+    HOTWEEK_DB=<数据库路径>        （默认 ../db/hotweek.db）
+"""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from locks import LockTimeout, acquire_data_lock
+from metrics import REGISTRY
+from repo_index import normalize_repo_key
+from repo_record import json_default
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = "../db/hotweek.db"
+
+
+def dataset_name(filename: str) -> str:
+    """由文件名得到数据集名称（如 ../data/trending.json -> trending）"""
+    return os.path.splitext(os.path.basename(filename))[0]
+
+
+def write_json_file(data: Dict, filename: str) -> None:
+    """将数据写入JSON文件（先写临时文件再替换，避免写到一半的文件被读取）"""
+    directory = os.path.dirname(filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    tmp_filename = f"{filename}.tmp"
+    with REGISTRY.timer("hotweek_json_seconds", operation="encode", dataset=dataset_name(filename)):
+        with open(tmp_filename, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2, default=json_default)
+    os.replace(tmp_filename, filename)
+    record_file_size(filename)
+
+
+def record_file_size(filename: str) -> None:
+    """记录写出的数据文件大小"""
+    REGISTRY.set("hotweek_file_bytes", os.path.getsize(filename), file=os.path.basename(filename))
+
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class JSONStreamReader:
+    """
+    数据文件的流式读取器
+
+    按块读取顶层JSON对象，repositories 数组中的记录逐条解析并产出，
+    其他顶层字段（metadata、languages等）解析后存入 fields。
+    内存占用只与单条记录和读取块大小有关，与文件大小无关。
+    """
+
+    def __init__(self, filename: str, chunk_size: int = 64 * 1024):
+        """
+        初始化读取器
+
+        Args:
+            filename: 数据文件名
+            chunk_size: 每次读取的字符数
+        """
+        self.filename = filename
+        self.chunk_size = chunk_size
+        self.fields: Dict[str, Any] = {}
+        self._decoder = json.JSONDecoder()
+
+    def __iter__(self) -> Iterator[Dict]:
+        with open(self.filename, 'r', encoding='utf-8') as f:
+            self._file = f
+            self._buf = ''
+            self._pos = 0
+            self._eof = False
+            yield from self._parse_document()
+
+    def _fill(self) -> bool:
+        """读取下一块数据（丢弃已解析的部分），文件结束时返回False"""
+        if self._eof:
+            return False
+        chunk = self._file.read(self.chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        """跳过空白并返回下一个字符"""
+        while True:
+            self._pos = _WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                raise ValueError(f"文件意外结束: {self.filename}")
+
+    def _expect(self, chars: str) -> str:
+        """读取一个分隔符，不是预期字符时报错"""
+        char = self._peek()
+        if char not in chars:
+            raise ValueError(f"JSON格式错误: 期望 {chars!r}，实际为 {char!r} ({self.filename})")
+        self._pos += 1
+        return char
+
+    def _decode_value(self) -> Any:
+        """解析下一个完整的JSON值（数据不足时继续读取）"""
+        while True:
+            self._peek()
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # 值恰好在缓冲区末尾结束时可能被截断（如数字），读取更多数据后重新解析
+            if end >= len(self._buf) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def _parse_document(self) -> Iterator[Dict]:
+        """解析顶层对象，逐条产出 repositories 中的记录"""
+        self._expect('{')
+        if self._peek() == '}':
+            return
+
+        while True:
+            key = self._decode_value()
+            self._expect(':')
+            if key == 'repositories':
+                self._expect('[')
+                if self._peek() == ']':
+                    self._pos += 1
+                else:
+                    while True:
+                        yield self._decode_value()
+                        if self._expect(',]') == ']':
+                            break
+            else:
+                self.fields[key] = self._decode_value()
+
+            if self._expect(',}') == '}':
+                return
+
+
+def iter_json_repositories(filename: str) -> Iterator[Dict]:
+    """流式读取数据文件中的仓库记录"""
+    return iter(JSONStreamReader(filename))
+
+
+def write_json_stream(filename: str, repositories: Iterable[Dict], header: Optional[Dict] = None,
+                      trailer: Optional[Callable[[], Dict]] = None) -> int:
+    """
+    流式写入数据文件（逐条写入仓库记录，格式与 json.dump(indent=2) 相同）
+
+    Args:
+        filename: 文件名
+        repositories: 仓库记录（可以是生成器）
+        header: 写在 repositories 之前的顶层字段
+        trailer: 写完记录后调用，返回写在 repositories 之后的顶层字段（如依赖记录数的元数据）
+
+    Returns:
+        写入的记录数
+    """
+    directory = os.path.dirname(filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    def dump(value: Any, indent: str) -> str:
+        return json.dumps(value, ensure_ascii=False, indent=2, default=json_default).replace('\n', '\n' + indent)
+
+    count = 0
+    tmp_filename = f"{filename}.tmp"
+    with REGISTRY.timer("hotweek_json_seconds", operation="encode", dataset=dataset_name(filename)), \
+            open(tmp_filename, 'w', encoding='utf-8') as f:
+        separator = '{\n'
+        for key, value in (header or {}).items():
+            f.write(f"{separator}  {dump(key, '')}: {dump(value, '  ')}")
+            separator = ',\n'
+
+        f.write(f'{separator}  "repositories": [')
+        for repo in repositories:
+            f.write(('\n    ' if count == 0 else ',\n    ') + dump(repo, '    '))
+            count += 1
+        f.write('\n  ]' if count else ']')
+
+        for key, value in (trailer() if trailer else {}).items():
+            f.write(f",\n  {dump(key, '')}: {dump(value, '  ')}")
+        f.write('\n}')
+    os.replace(tmp_filename, filename)
+    record_file_size(filename)
+    return count
+
+
+class JSONStorage:
+    """JSON文件存储（每个数据集对应一个完整的JSON文件）"""
+
+    name = "json"
+
+    def exists(self, filename: str) -> bool:
+        """数据集是否存在"""
+        return os.path.exists(filename)
+
+    def load(self, filename: str) -> Dict:
+        """
+        加载数据集
+
+        Raises:
+            FileNotFoundError: 文件不存在
+            json.JSONDecodeError: 文件内容不是合法JSON
+        """
+        with REGISTRY.timer("hotweek_json_seconds", operation="decode", dataset=dataset_name(filename)):
+            with open(filename, 'r', encoding='utf-8') as f:
+                return json.load(f)
+
+    def save(self, data: Dict, filename: str) -> None:
+        """保存数据集"""
+        write_json_file(data, filename)
+
+    def iter_repositories(self, filename: str, reader: Optional[JSONStreamReader] = None) -> Iterator[Dict]:
+        """
+        流式读取数据集中的仓库记录
+
+        Args:
+            filename: 文件名
+            reader: 可选的读取器实例（迭代结束后可从其 fields 获取其他顶层字段）
+        """
+        return iter(reader or JSONStreamReader(filename))
+
+    def load_fields(self, filename: str) -> Dict:
+        """读取除 repositories 以外的顶层字段（流式跳过记录，不占用与记录数相关的内存）"""
+        reader = JSONStreamReader(filename)
+        for _ in reader:
+            pass
+        return reader.fields
+
+    def save_stream(self, repositories: Iterable[Dict], filename: str, header: Optional[Dict] = None,
+                    trailer: Optional[Callable[[], Dict]] = None) -> int:
+        """流式保存数据集，返回写入的记录数"""
+        return write_json_stream(filename, repositories, header, trailer)
+
+    def record_snapshot(self, repositories: List[Dict], metadata: Optional[Dict] = None) -> None:
+        """记录一次获取的快照（JSON后端不保存历史）"""
+
+    def export_all(self) -> int:
+        """导出所有数据集为JSON文件（JSON后端无需导出）"""
+        return 0
+
+    def close(self) -> None:
+        """释放资源"""
+
+
+class SQLiteStorage:
+    """SQLite存储（仓库逐行存储，保存每次获取的快照历史）"""
+
+    name = "sqlite"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS datasets (
+            name TEXT PRIMARY KEY,
+            filename TEXT,
+            metadata TEXT NOT NULL,
+            extra TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS repositories (
+            dataset TEXT NOT NULL,
+            full_name TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            language TEXT,
+            stars INTEGER,
+            data TEXT NOT NULL,
+            PRIMARY KEY (dataset, full_name)
+        );
+        CREATE INDEX IF NOT EXISTS idx_repositories_position ON repositories (dataset, position);
+        CREATE INDEX IF NOT EXISTS idx_repositories_language ON repositories (dataset, language);
+        CREATE INDEX IF NOT EXISTS idx_repositories_stars ON repositories (dataset, stars);
+        CREATE TABLE IF NOT EXISTS snapshots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fetched_at TEXT NOT NULL,
+            source TEXT,
+            count INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS snapshot_items (
+            snapshot_id INTEGER NOT NULL REFERENCES snapshots (id),
+            full_name TEXT NOT NULL,
+            language TEXT,
+            stars INTEGER,
+            forks INTEGER,
+            current_period_stars INTEGER,
+            PRIMARY KEY (snapshot_id, full_name)
+        );
+        CREATE INDEX IF NOT EXISTS idx_snapshot_items_full_name ON snapshot_items (full_name);
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, export_datasets: Optional[List[str]] = None):
+        """
+        初始化SQLite存储
+
+        Args:
+            db_path: 数据库文件路径
+            export_datasets: 保存时同步导出为JSON文件的数据集（默认只导出网页使用的processed_trending）
+        """
+        self.db_path = db_path
+        self.export_datasets = set(export_datasets if export_datasets is not None else ["processed_trending"])
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+
+    def exists(self, filename: str) -> bool:
+        """数据集是否存在（数据库中没有时，已有的JSON文件也算作存在）"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM datasets WHERE name = ?", (dataset_name(filename),)
+            ).fetchone()
+        return row is not None or os.path.exists(filename)
+
+    def load(self, filename: str) -> Dict:
+        """
+        加载数据集
+
+        数据库中还没有该数据集时，从已有的JSON文件导入（便于从JSON后端迁移）。
+
+        Raises:
+            FileNotFoundError: 数据集和JSON文件都不存在
+        """
+        name = dataset_name(filename)
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT metadata, extra FROM datasets WHERE name = ?", (name,)
+            ).fetchone()
+        if row is None:
+            data = JSONStorage().load(filename)
+            logger.info(f"从JSON文件导入数据集 {name}: {filename}")
+            self.save(data, filename)
+            return data
+
+        with self._lock:
+            repositories = [
+                json.loads(data) for (data,) in self.conn.execute(
+                    "SELECT data FROM repositories WHERE dataset = ? ORDER BY position", (name,)
+                )
+            ]
+
+        data = {"metadata": json.loads(row[0]), "repositories": repositories}
+        data.update(json.loads(row[1]))
+        return data
+
+    def save(self, data: Dict, filename: str) -> None:
+        """
+        保存数据集
+
+        只写入内容或位置发生变化的行，并删除不再存在的行。
+        """
+        header = {key: value for key, value in data.items() if key != 'repositories'}
+        self.save_stream(data.get('repositories', []), filename, header=header)
+
+    def iter_repositories(self, filename: str, reader: Optional[JSONStreamReader] = None,
+                          batch_size: int = 1000) -> Iterator[Dict]:
+        """
+        流式读取数据集中的仓库记录（按批从数据库读取）
+
+        使用独立的只读连接并在一个读事务中完成，读到的是开始读取时的一致快照，
+        因此可以边读取边通过 save_stream 写回同一数据集。
+        数据库中还没有该数据集时，流式读取已有的JSON文件。
+        """
+        name = dataset_name(filename)
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        try:
+            conn.execute("BEGIN")
+            exists = conn.execute("SELECT 1 FROM datasets WHERE name = ?", (name,)).fetchone()
+            if exists is None:
+                yield from JSONStorage().iter_repositories(filename, reader)
+                return
+
+            last_position = -1
+            while True:
+                rows = conn.execute(
+                    "SELECT position, data FROM repositories WHERE dataset = ? AND position > ? "
+                    "ORDER BY position LIMIT ?",
+                    (name, last_position, batch_size)
+                ).fetchall()
+                if not rows:
+                    return
+                for position, data in rows:
+                    yield json.loads(data)
+                last_position = rows[-1][0]
+        finally:
+            conn.close()
+
+    def load_fields(self, filename: str) -> Dict:
+        """读取除 repositories 以外的顶层字段"""
+        name = dataset_name(filename)
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT metadata, extra FROM datasets WHERE name = ?", (name,)
+            ).fetchone()
+        if row is None:
+            return JSONStorage().load_fields(filename)
+        fields = {"metadata": json.loads(row[0])}
+        fields.update(json.loads(row[1]))
+        return fields
+
+    def save_stream(self, repositories: Iterable[Dict], filename: str, header: Optional[Dict] = None,
+                    trailer: Optional[Callable[[], Dict]] = None) -> int:
+        """
+        流式保存数据集
+
+        记录逐条写入数据库（只写入内容或位置发生变化的行），写完后删除不再存在的行。
+
+        Returns:
+            写入的记录数
+        """
+        name = dataset_name(filename)
+        keys: List[str] = []
+        seen_keys = set()
+
+        def rows():
+            for position, repo in enumerate(repositories):
+                key = normalize_repo_key(repo) or f"#{position}"
+                if key in seen_keys:
+                    key = f"{key}#{position}"
+                seen_keys.add(key)
+                keys.append(key)
+                yield (
+                    name, key, position, repo.get('language'), self._to_int(repo.get('stars')),
+                    json.dumps(repo, ensure_ascii=False, default=json_default)
+                )
+
+        with self._lock, self.conn:
+            self.conn.executemany(
+                """
+                INSERT INTO repositories (dataset, full_name, position, language, stars, data)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (dataset, full_name) DO UPDATE SET
+                    position = excluded.position, language = excluded.language,
+                    stars = excluded.stars, data = excluded.data
+                WHERE repositories.position != excluded.position OR repositories.data != excluded.data
+                """,
+                rows()
+            )
+            self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS keep_keys (full_name TEXT PRIMARY KEY)")
+            self.conn.execute("DELETE FROM keep_keys")
+            self.conn.executemany("INSERT INTO keep_keys (full_name) VALUES (?)", ((key,) for key in keys))
+            self.conn.execute(
+                "DELETE FROM repositories WHERE dataset = ? AND full_name NOT IN (SELECT full_name FROM keep_keys)",
+                (name,)
+            )
+
+            fields = dict(header or {})
+            fields.update(trailer() if trailer else {})
+            extra = {key: value for key, value in fields.items() if key != 'metadata'}
+            self.conn.execute(
+                """
+                INSERT INTO datasets (name, filename, metadata, extra, updated_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (name) DO UPDATE SET
+                    filename = excluded.filename, metadata = excluded.metadata,
+                    extra = excluded.extra, updated_at = excluded.updated_at
+                """,
+                (name, filename, json.dumps(fields.get('metadata', {}), ensure_ascii=False),
+                 json.dumps(extra, ensure_ascii=False), datetime.now().isoformat())
+            )
+
+        if name in self.export_datasets:
+            self._export(filename)
+        return len(keys)
+
+    def _export(self, filename: str) -> None:
+        """将数据集流式导出为JSON文件"""
+        fields = self.load_fields(filename)
+        header = {"metadata": fields.pop("metadata", {})}
+        write_json_stream(filename, self.iter_repositories(filename), header=header, trailer=lambda: fields)
+
+    def record_snapshot(self, repositories: List[Dict], metadata: Optional[Dict] = None) -> None:
+        """
+        记录一次获取的快照
+
+        Args:
+            repositories: 本次获取到的仓库数据
+            metadata: 快照元数据（使用其中的 source）
+        """
+        items = {}
+        for repo in repositories:
+            key = normalize_repo_key(repo)
+            if key:
+                items[key] = (
+                    key, repo.get('language'), self._to_int(repo.get('stars')),
+                    self._to_int(repo.get('forks')), self._to_int(repo.get('currentPeriodStars'))
+                )
+
+        with self._lock, self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO snapshots (fetched_at, source, count) VALUES (?, ?, ?)",
+                (datetime.now().isoformat(), (metadata or {}).get('source'), len(items))
+            )
+            snapshot_id = cursor.lastrowid
+            self.conn.executemany(
+                """
+                INSERT INTO snapshot_items (snapshot_id, full_name, language, stars, forks, current_period_stars)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                ((snapshot_id, *item) for item in items.values())
+            )
+
+    def export_all(self) -> int:
+        """
+        将所有数据集导出为对应的JSON文件
+
+        Returns:
+            导出的数据集数量
+        """
+        with self._lock:
+            datasets = self.conn.execute("SELECT name, filename FROM datasets").fetchall()
+
+        exported = 0
+        for name, filename in datasets:
+            if not filename:
+                continue
+            self._export(filename)
+            logger.info(f"数据集 {name} 已导出到: {filename}")
+            exported += 1
+        return exported
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        self.conn.close()
+
+    @staticmethod
+    def _to_int(value) -> Optional[int]:
+        """转换为整数，无法转换时返回None"""
+        try:
+            if isinstance(value, str):
+                value = value.replace(',', '')
+            return int(float(value))
+        except (TypeError, ValueError):
+            return None
+
+
+def get_storage(backend: Optional[str] = None, db_path: Optional[str] = None):
+    """
+    根据配置创建存储后端
+
+    Args:
+        backend: 后端名称（json或sqlite），默认读取环境变量 HOTWEEK_STORAGE
+        db_path: SQLite数据库路径，默认读取环境变量 HOTWEEK_DB
+
+    Returns:
+        存储后端实例
+    """
+    backend = (backend or os.environ.get("HOTWEEK_STORAGE") or "json").lower()
+    if backend == "sqlite":
+        return SQLiteStorage(db_path or os.environ.get("HOTWEEK_DB") or DEFAULT_DB_PATH)
+    if backend != "json":
+        logger.warning(f"未知的存储后端: {backend}，使用JSON文件存储")
+    return JSONStorage()
+
+
+def main():
+    """主函数：将存储中的数据集导出为JSON文件"""
+    try:
+        acquire_data_lock()
+    except LockTimeout as e:
+        logger.error(str(e))
+        return 1
+    storage = get_storage()
+    try:
+        exported = storage.export_all()
+        logger.info(f"数据导出完成: {exported} 个数据集 (后端: {storage.name})")
+    except Exception as e:
+        logger.error(f"数据导出失败: {str(e)}")
+        return 1
+    finally:
+        storage.close()
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+测试公共夹具
+
+脚本都以 scripts/ 为工作目录、通过 ../data、../cache 等相对路径读写数据，
+测试在临时目录中建立同样的目录结构并切换到其中的 scripts/ 运行。
+"""
+
+import os
+import sys
+
+import pytest
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts")
+sys.path.insert(0, SCRIPTS_DIR)
+
+from mock_server import MockTrendingServer  # noqa: E402
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """临时的项目目录（工作目录为其中的 scripts/）"""
+    for name in ("scripts", "data", "cache", "logs"):
+        (tmp_path / name).mkdir()
+    monkeypatch.chdir(tmp_path / "scripts")
+    monkeypatch.delenv("HOTWEEK_STORAGE", raising=False)
+    return tmp_path
+
+
+@pytest.fixture
+def mock_server():
+    """在后台线程中运行的本地模拟热榜API"""
+    server = MockTrendingServer(count=25)
+    server.start_background()
+    yield server
+    server.shutdown()
+    server.server_close()
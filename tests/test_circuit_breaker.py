@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""熔断器状态转换：closed -> open -> half_open -> closed/open，状态跨实例（进程）保持"""
+
+import pytest
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, PROBE_LEASE, CircuitBreaker
+
+URL = "https://api.example.com/repositories?since=weekly"
+NOW = 1_700_000_000.0
+
+
+@pytest.fixture
+def state_file(tmp_path):
+    return str(tmp_path / "circuit_breaker.json")
+
+
+def make_breaker(state_file):
+    return CircuitBreaker(state_file, failure_threshold=3, reset_timeout=300, max_reset_timeout=1200)
+
+
+def trip(breaker, now=NOW):
+    for _ in range(3):
+        assert breaker.allow_request(URL, now=now)
+        breaker.record_failure(URL, "HTTP 503", now=now)
+
+
+def test_threshold_trips_and_open_fails_fast(state_file):
+    breaker = make_breaker(state_file)
+    breaker.allow_request(URL, now=NOW)
+    breaker.record_failure(URL, "HTTP 503", now=NOW)
+    breaker.record_failure(URL, "HTTP 503", now=NOW)
+    assert breaker.state(URL) == CLOSED
+
+    breaker.record_failure(URL, "HTTP 503", now=NOW)
+    assert breaker.state(URL) == OPEN
+    # 冷却期内直接拒绝，其他端点不受影响
+    assert not breaker.allow_request(URL, now=NOW + 299)
+    assert breaker.allow_request("https://other.example.com/", now=NOW + 1)
+    # 状态持久化，新实例（下一次运行）同样拒绝
+    assert not make_breaker(state_file).allow_request(URL, now=NOW + 299)
+
+
+def test_success_before_threshold_resets_count(state_file):
+    breaker = make_breaker(state_file)
+    breaker.record_failure(URL, now=NOW)
+    breaker.record_failure(URL, now=NOW)
+    breaker.record_success(URL)
+    breaker.record_failure(URL, now=NOW)
+    breaker.record_failure(URL, now=NOW)
+    assert breaker.state(URL) == CLOSED
+
+
+def test_half_open_allows_single_probe(state_file):
+    breaker = make_breaker(state_file)
+    trip(breaker)
+
+    assert breaker.allow_request(URL, now=NOW + 300)
+    assert breaker.state(URL) == HALF_OPEN
+    assert breaker.is_probe(URL)
+    # 探测进行中，其他请求被拒绝
+    assert not breaker.allow_request(URL, now=NOW + 301)
+
+
+def test_probe_failure_doubles_cooldown(state_file):
+    breaker = make_breaker(state_file)
+    trip(breaker)
+
+    assert breaker.allow_request(URL, now=NOW + 300)
+    breaker.record_failure(URL, "timeout", now=NOW + 300)
+    assert breaker.state(URL) == OPEN
+    assert not breaker.allow_request(URL, now=NOW + 300 + 599)
+    assert breaker.allow_request(URL, now=NOW + 300 + 600)
+
+    # 冷却时间不超过上限
+    breaker.record_failure(URL, "timeout", now=NOW + 900)
+    assert breaker.allow_request(URL, now=NOW + 900 + 1200)
+    breaker.record_failure(URL, "timeout", now=NOW + 2100)
+    assert not breaker.allow_request(URL, now=NOW + 2100 + 1199)
+    assert breaker.allow_request(URL, now=NOW + 2100 + 1200)
+
+
+def test_probe_success_closes_and_resets_cooldown(state_file):
+    breaker = make_breaker(state_file)
+    trip(breaker)
+    assert breaker.allow_request(URL, now=NOW + 300)
+    breaker.record_failure(URL, "timeout", now=NOW + 300)
+
+    assert breaker.allow_request(URL, now=NOW + 900)
+    breaker.record_success(URL)
+    assert breaker.state(URL) == CLOSED
+    assert not breaker.is_probe(URL)
+    assert breaker.allow_request(URL, now=NOW + 901)
+
+    # 再次熔断时冷却时间恢复为初始值
+    reloaded = make_breaker(state_file)
+    trip(reloaded, now=NOW + 1000)
+    assert reloaded.allow_request(URL, now=NOW + 1300)
+
+
+def test_probe_owned_across_processes(state_file):
+    # 两个实例共用状态文件，相当于同时运行的调度器和获取脚本
+    trip(make_breaker(state_file))
+    first = make_breaker(state_file)
+    second = make_breaker(state_file)
+
+    assert first.allow_request(URL, now=NOW + 300)
+    assert not second.allow_request(URL, now=NOW + 300)
+    assert not second.is_probe(URL)
+
+    # 探测成功后另一进程随即恢复
+    first.record_success(URL)
+    assert second.allow_request(URL, now=NOW + 301)
+    assert second.state(URL) == CLOSED
+
+
+def test_probe_lease_expires(state_file):
+    trip(make_breaker(state_file))
+    crashed = make_breaker(state_file)
+    other = make_breaker(state_file)
+
+    # 持有探测的进程没有记录结果就退出，租约到期前其他进程不探测
+    assert crashed.allow_request(URL, now=NOW + 300)
+    assert not other.allow_request(URL, now=NOW + 300 + PROBE_LEASE - 1)
+    assert other.allow_request(URL, now=NOW + 300 + PROBE_LEASE)
+    assert other.is_probe(URL)
+
+    # 探测失败同样在各进程间生效
+    other.record_failure(URL, "timeout", now=NOW + 400)
+    assert not make_breaker(state_file).allow_request(URL, now=NOW + 400 + 599)
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""fetch_trending 对本地模拟API的端到端测试"""
+
+import json
+import sys
+
+import pytest
+
+import fetch_trending
+from fetch_trending import GitHubTrendingFetcher
+
+
+def make_fetcher(server):
+    return GitHubTrendingFetcher(base_url=server.base_url, max_workers=2)
+
+
+def test_fetch_from_mock_server(workdir, mock_server):
+    fetcher = make_fetcher(mock_server)
+
+    repositories = fetcher.fetch_trending_repositories(language="Python", since="weekly")
+
+    assert len(repositories) == 25
+    assert all(repo["language"] == "Python" for repo in repositories)
+    assert mock_server.request_count == 1
+
+
+def test_fetch_batch_and_save(workdir, mock_server):
+    fetcher = make_fetcher(mock_server)
+
+    results = fetcher.fetch_trending_batch(languages=("", "Go"), periods=("daily", "weekly"))
+    data = results[("", "weekly")]
+    assert len(results) == 4
+    assert all(len(result) == 25 for result in results.values())
+
+    assert fetcher.save_to_file(data, upsert=True)
+    with open(workdir / "data" / "trending.json", encoding="utf-8") as f:
+        saved = json.load(f)
+    assert saved["metadata"]["new_added"] == 25
+    assert {repo["url"] for repo in saved["repositories"]} == {repo["url"] for repo in data}
+
+
+def test_refetch_after_upstream_update(workdir, mock_server):
+    fetcher = make_fetcher(mock_server)
+    first = fetcher.fetch_trending_repositories()
+    assert fetcher.save_to_file(first, upsert=True)
+
+    existing = fetcher.load_existing_data()
+    assert fetcher.is_unchanged(fetcher.fetch_trending_repositories(), existing)
+
+    mock_server.bump_revision()
+    second = fetcher.fetch_trending_repositories()
+    assert not fetcher.is_unchanged(second, existing)
+    assert fetcher.save_to_file(second, upsert=True)
+    assert fetcher.load_existing_data()["metadata"]["new_added"] > 0
+
+
+@pytest.mark.parametrize("periods", ["weekley", "daily,monthy", ","])
+def test_invalid_periods_rejected(workdir, monkeypatch, capsys, periods):
+    monkeypatch.setattr(sys, "argv", ["fetch_trending.py", "--periods", periods])
+    with pytest.raises(SystemExit) as excinfo:
+        fetch_trending.main()
+    assert excinfo.value.code == 2
+    assert "--periods" in capsys.readouterr().err
+    # 参数错误时不获取、不写入任何数据
+    assert not (workdir / "data" / "trending.json").exists()
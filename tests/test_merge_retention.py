@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""合并与清理的保留顺序：本次获取到的项目排在最前，按 last_seen 淘汰；无法识别的项目不合并"""
+
+import copy
+import json
+from datetime import datetime, timedelta
+
+from cleanup_data import DataCleanup
+from fetch_trending import GitHubTrendingFetcher
+from storage import JSONStorage
+
+
+def make_repo(i, last_seen=None):
+    repo = {
+        "author": f"a{i}",
+        "name": f"r{i}",
+        "url": f"https://github.com/a{i}/r{i}",
+        "stars": 1000 + i
+    }
+    if last_seen:
+        repo.update(first_seen=last_seen, last_seen=last_seen, seen_count=1)
+    return repo
+
+
+def make_existing(count):
+    """count 条现有记录，r0 最近出现，r<count-1> 最久未出现"""
+    base = datetime.now() - timedelta(days=1)
+    return {
+        "metadata": {"last_updated": base.isoformat(), "count": count, "sorted_by": "last_seen"},
+        "repositories": [make_repo(i, (base - timedelta(minutes=i)).isoformat()) for i in range(count)]
+    }
+
+
+def urls(data):
+    return [repo["url"] for repo in data["repositories"]]
+
+
+def test_refreshed_repo_survives_trim():
+    fetcher = GitHubTrendingFetcher(storage=JSONStorage())
+    existing = make_existing(100)
+    fetched = [make_repo(1000), make_repo(99)]
+
+    merged = fetcher.merge_data(fetched, existing, max_total=100, upsert=True)
+
+    assert len(merged["repositories"]) == 100
+    assert urls(merged)[:2] == [make_repo(1000)["url"], make_repo(99)["url"]]
+    # 淘汰的是最久未出现的 r98，而不是本次刚刷新的 r99
+    assert make_repo(98)["url"] not in urls(merged)
+    assert merged["metadata"]["sorted_by"] == "last_seen"
+
+
+def test_legacy_order_is_sorted_on_first_merge():
+    fetcher = GitHubTrendingFetcher(storage=JSONStorage())
+    existing = make_existing(10)
+    del existing["metadata"]["sorted_by"]
+    existing["repositories"].reverse()
+
+    merged = fetcher.merge_data([make_repo(50)], existing, upsert=True)
+
+    seen = [repo["last_seen"] for repo in merged["repositories"]]
+    assert seen == sorted(seen, reverse=True)
+
+
+def test_stream_merge_matches_merge_data(workdir):
+    filename = str(workdir / "data" / "trending.json")
+    existing = make_existing(30)
+    fetched = [make_repo(500), make_repo(29), make_repo(3), make_repo(501)]
+    storage = JSONStorage()
+    storage.save(copy.deepcopy(existing), filename)
+
+    in_memory = GitHubTrendingFetcher(storage=storage).merge_data(copy.deepcopy(fetched), copy.deepcopy(existing),
+                                                                   max_total=25, upsert=True)
+    assert GitHubTrendingFetcher(storage=storage).save_to_file_stream(copy.deepcopy(fetched), filename,
+                                                                      max_total=25, upsert=True)
+    with open(filename, encoding="utf-8") as f:
+        streamed = json.load(f)
+
+    assert urls(streamed) == urls(in_memory)
+    assert streamed["metadata"]["sorted_by"] == "last_seen"
+
+
+def test_unkeyed_repos_are_skipped(workdir):
+    fetcher = GitHubTrendingFetcher(storage=JSONStorage())
+    existing = make_existing(5)
+    junk = {"description": "no url or name", "stars": 1}
+    fetched = [make_repo(50), dict(junk), make_repo(51)]
+    expected = [make_repo(50)["url"], make_repo(51)["url"]]
+
+    assert [repo["url"] for repo in fetcher.remove_duplicates(copy.deepcopy(fetched), existing)] == expected
+    assert urls(fetcher.merge_data(copy.deepcopy(fetched), None)) == expected
+    assert urls(fetcher.merge_data(copy.deepcopy(fetched), None, upsert=True)) == expected
+    merged = fetcher.merge_data(copy.deepcopy(fetched), copy.deepcopy(existing), upsert=True)
+    assert urls(merged) == expected + urls(existing)
+    assert merged["metadata"]["new_added"] == 2
+
+    filename = str(workdir / "data" / "trending.json")
+    assert fetcher.save_to_file_stream(copy.deepcopy(fetched), filename)
+    assert fetcher.save_to_file_stream(copy.deepcopy(fetched), filename, upsert=True)
+    with open(filename, encoding="utf-8") as f:
+        assert urls(json.load(f)) == expected
+
+
+def test_cleanup_evicts_from_tail(workdir):
+    cleanup = DataCleanup(data_dir=str(workdir / "data"), storage=JSONStorage(),
+                          history_dir=str(workdir / "history"))
+    data = make_existing(20)
+    old = (datetime.now() - timedelta(days=40)).isoformat()
+    for repo in data["repositories"][15:]:
+        repo["last_seen"] = old
+
+    cleaned = cleanup.clean_trending_data(data, max_days=30, max_items=12)
+
+    assert urls(cleaned) == urls(make_existing(12))
+    assert cleaned["metadata"]["sorted_by"] == "last_seen"
+
+
+def test_stream_cleanup_matches_in_memory(workdir):
+    cleanup = DataCleanup(data_dir=str(workdir / "data"), storage=JSONStorage(),
+                          history_dir=str(workdir / "history"))
+    data = make_existing(20)
+    JSONStorage().save(copy.deepcopy(data), cleanup.trending_file)
+
+    assert cleanup.cleanup_trending_data_stream(max_days=30, max_items=7)
+    with open(cleanup.trending_file, encoding="utf-8") as f:
+        streamed = json.load(f)
+
+    assert urls(streamed) == urls(cleanup.clean_trending_data(data, max_days=30, max_items=7))
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""自适应轮询：按结果变化调整间隔，并在预期的榜单更新时刻之后轮询"""
+
+from datetime import datetime, timezone
+
+import pytest
+
+from polling import (BACKOFF_FACTOR, ROLLOVER_DELAY, TIGHTEN_FACTOR, AdaptivePollingPlanner, query_key)
+
+HOUR = 60 * 60
+
+
+def utc(day, hour, minute=0):
+    return datetime(2026, 1, day, hour, minute, tzinfo=timezone.utc).timestamp()
+
+
+# 距离每日更新时刻（UTC 0点）足够远，间隔不受更新时刻影响
+T0 = utc(5, 6)
+
+
+@pytest.fixture
+def planner(tmp_path):
+    return AdaptivePollingPlanner(str(tmp_path / "polling_state.json"), min_interval=15 * 60,
+                                  max_interval=12 * HOUR, initial_interval=HOUR)
+
+
+def state_of(planner):
+    return planner.queries[query_key("", "weekly")]
+
+
+def test_first_poll_and_backoff_when_unchanged(planner):
+    assert planner.is_due("", "weekly", now=T0)
+    assert planner.observe("", "weekly", "a", now=T0) is False
+    assert state_of(planner)["next_poll"] == T0 + HOUR
+    assert not planner.is_due("", "weekly", now=T0 + HOUR - 1)
+
+    assert planner.observe("", "weekly", "a", now=T0 + HOUR) is False
+    assert state_of(planner)["interval"] == HOUR * BACKOFF_FACTOR
+    assert state_of(planner)["next_poll"] == T0 + HOUR + HOUR * BACKOFF_FACTOR
+
+
+def test_backoff_clamped_to_max_interval(planner):
+    now = T0
+    for _ in range(10):
+        planner.observe("", "weekly", "a", now=now)
+        now += 10 * 60
+    assert state_of(planner)["interval"] == 12 * HOUR
+
+
+def test_tighten_on_change(planner):
+    planner.observe("", "weekly", "a", now=T0)
+    planner.observe("", "weekly", "a", now=T0 + HOUR)
+    planner.observe("", "weekly", "a", now=T0 + 2.5 * HOUR)
+
+    assert planner.observe("", "weekly", "b", now=T0 + 4 * HOUR) is True
+    state = state_of(planner)
+    # 1.5小时 * 1.5 * 0.5，未超过平均变化间隔（4小时）的一半
+    assert state["interval"] == HOUR * BACKOFF_FACTOR ** 2 * TIGHTEN_FACTOR
+    assert state["changes"] == 1
+    assert state["last_changed"] == T0 + 4 * HOUR
+
+
+def test_interval_capped_at_half_mean_change_interval(tmp_path):
+    planner = AdaptivePollingPlanner(str(tmp_path / "polling_state.json"), min_interval=15 * 60,
+                                     max_interval=12 * HOUR, initial_interval=8 * HOUR)
+    planner.observe("", "weekly", "a", now=T0)
+    planner.observe("", "weekly", "b", now=T0 + HOUR)
+    # 收紧后为4小时，但平均1小时变化一次，间隔不超过30分钟
+    assert state_of(planner)["interval"] == 30 * 60
+
+    # 之后结果不变时照常延长（平均变化间隔随时间增长）
+    planner.observe("", "weekly", "b", now=T0 + 2 * HOUR)
+    assert state_of(planner)["interval"] == 30 * 60 * BACKOFF_FACTOR
+
+
+def test_interval_clamped_to_min_interval(planner):
+    planner.observe("", "weekly", "a", now=T0)
+    planner.observe("", "weekly", "b", now=T0 + 16 * 60)
+    assert state_of(planner)["interval"] == 15 * 60
+    assert state_of(planner)["next_poll"] == T0 + 16 * 60 + 15 * 60
+
+
+def test_rollover_placement(planner):
+    # 22:30 观测：间隔1小时早于 0:05 的更新后轮询
+    evening = utc(5, 22, 30)
+    planner.observe("", "weekly", "a", now=evening)
+    assert state_of(planner)["next_poll"] == evening + HOUR
+
+    # 间隔延长后提前到更新时刻之后 ROLLOVER_DELAY
+    planner.observe("", "weekly", "a", now=utc(5, 23))
+    assert state_of(planner)["interval"] > HOUR
+    assert state_of(planner)["next_poll"] == utc(6, 0) + ROLLOVER_DELAY
+
+    # 距离更新时刻不足最短间隔时仍至少等待最短间隔
+    planner.observe("", "weekly", "a", now=utc(5, 23, 58))
+    assert state_of(planner)["next_poll"] == utc(5, 23, 58) + 15 * 60
+
+
+def test_learned_hot_hours(planner):
+    planner.observe("", "weekly", "a", now=utc(1, 13))
+    # 每天14点前后都有变化，14点成为预期更新时刻
+    for day in (2, 3, 4):
+        planner.observe("", "weekly", f"v{day}", now=utc(day, 14, 10))
+    state = state_of(planner)
+    assert planner.hot_hours(state) == [0, 14]
+
+    # 结果不再变化，间隔延长到上限后，下一次轮询提前到 14:05
+    for step in range(12):
+        planner.observe("", "weekly", "v4", now=utc(5, 1) + step * 10 * 60)
+    state = state_of(planner)
+    assert state["interval"] == 12 * HOUR
+    assert state["next_poll"] == utc(5, 14) + ROLLOVER_DELAY
+
+
+def test_failure_and_state_round_trip(planner, tmp_path):
+    planner.observe("", "weekly", "a", now=T0)
+    planner.record_failure("", "weekly", now=T0 + 60)
+    assert state_of(planner)["next_poll"] == T0 + 60 + 15 * 60
+    assert state_of(planner)["interval"] == HOUR
+
+    planner.save()
+    reloaded = AdaptivePollingPlanner(planner.state_file)
+    assert reloaded.queries == planner.queries
+    assert reloaded.due_queries([("", "weekly"), ("Python", "daily")], now=T0 + 60) == [("Python", "daily")]
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""增量处理：复用未变化仓库的清洗结果，结果与全量处理一致"""
+
+import copy
+import json
+
+from process_data import GitHubDataProcessor
+from repo_record import json_default, load_records
+from storage import JSONStorage
+
+
+def make_dataset(count=20):
+    return {
+        "metadata": {"last_updated": "2026-01-01T00:00:00"},
+        "repositories": [
+            {
+                "author": f" a{i} ",
+                "name": f"r{i}",
+                "url": f"https://github.com/a{i}/r{i}",
+                "description": f"line1\nline2 {i}" + "x" * (i * 20),
+                "language": ["Python", "Go", ""][i % 3],
+                "stars": f"{1000 + i * 7:,}",
+                "forks": 10 + i,
+                "currentPeriodStars": i,
+                "last_seen": f"2026-01-01T00:00:{i:02d}"
+            }
+            for i in range(count)
+        ]
+    }
+
+
+def as_json(data):
+    metadata = {k: v for k, v in data["metadata"].items() if k != "processed_at"}
+    # 增量处理修正的语言分布与全量统计的计数相同，但键的顺序可能不同
+    metadata["language_distribution"] = dict(sorted(metadata["language_distribution"].items()))
+    return json.dumps({**data, "metadata": metadata}, default=json_default, ensure_ascii=False)
+
+
+def test_incremental_matches_full_and_reuses_unchanged(monkeypatch):
+    processor = GitHubDataProcessor(storage=JSONStorage())
+    dataset = make_dataset()
+
+    full = processor.process_data(load_records(copy.deepcopy(dataset)))
+    first, state = processor.process_data_incremental(load_records(copy.deepcopy(dataset)), None)
+    assert as_json(first) == as_json(full)
+
+    # 状态经过JSON往返（与状态文件相同）
+    state = json.loads(json.dumps(state))
+    changed = copy.deepcopy(dataset)
+    repos = changed["repositories"]
+    # 只刷新出现时间的仓库内容不变；其余修改不改变 last_seen 也应被发现
+    repos[1]["last_seen"] = "2026-01-02T00:00:00"
+    repos[2]["seen_count"] = 5
+    repos[3]["stars"] = 99999
+    repos[4]["description"] = "changed"
+    repos[6]["language"] = "Rust"
+    repos[7]["currentPeriodStars"] = 42
+    del repos[5]
+    repos.append({**dataset["repositories"][0], "author": "new", "url": "https://github.com/new/r0"})
+
+    cleaned = []
+    clean = processor.clean_repository_data
+    monkeypatch.setattr(processor, "clean_repository_data", lambda repo: cleaned.append(repo) or clean(repo))
+    second, state = processor.process_data_incremental(load_records(copy.deepcopy(changed)), state)
+    # 只重新清洗变化和新增的仓库
+    assert sorted(repo["url"] for repo in cleaned) == [
+        "https://github.com/a3/r3", "https://github.com/a4/r4", "https://github.com/a6/r6",
+        "https://github.com/a7/r7", "https://github.com/new/r0"
+    ]
+    monkeypatch.undo()
+    expected = processor.process_data(load_records(copy.deepcopy(changed)))
+    assert as_json(second) == as_json(expected)
+    # 语言分布由保存的计数修正得到
+    assert state["language_stats"] == expected["metadata"]["language_distribution"]
+    assert len(state["records"]) == 20
+
+
+def test_incremental_untracked_records():
+    processor = GitHubDataProcessor(storage=JSONStorage())
+    dataset = make_dataset(5)
+    repos = dataset["repositories"]
+    repos.append(dict(repos[0]))
+    repos.append({"author": "", "name": "", "language": "Go"})
+
+    _, state = processor.process_data_incremental(load_records(copy.deepcopy(dataset)), None)
+    result, state = processor.process_data_incremental(load_records(copy.deepcopy(dataset)), state)
+    expected = processor.process_data(load_records(copy.deepcopy(dataset)))
+    assert as_json(result) == as_json(expected)
+    # 无键和重复的仓库不进入状态，也不计入保存的语言计数
+    assert len(state["records"]) == 5
+    assert sum(state["language_stats"].values()) == 5
+
+
+def test_state_file_round_trip(workdir):
+    processor = GitHubDataProcessor(storage=JSONStorage())
+    _, state = processor.process_data_incremental(load_records(make_dataset()), None)
+
+    assert processor.save_incremental_state(state)
+    assert processor.load_incremental_state() == json.loads(json.dumps(state))
+    # 旧格式的状态（按 last_seen 判断变化）不被复用
+    old_state = {"version": 2, "records": {"https://github.com/a0/r0": ["x", 0, "a0", "r0", "", "", "Go", 0, 0, 0]}}
+    result, _ = processor.process_data_incremental(load_records(make_dataset()), old_state)
+    assert result["metadata"]["total_repositories"] == 20
+    assert result["metadata"]["language_distribution"]["Python"] == 7
+
+
+def test_columnar_matches_full():
+    processor = GitHubDataProcessor(storage=JSONStorage())
+    dataset = make_dataset()
+    dataset["repositories"][4] = {"author": "b", "name": "legacy", "current_period_stars": 3}
+
+    full = processor.process_data(load_records(copy.deepcopy(dataset)))
+    columnar = processor.process_data_columnar(load_records(copy.deepcopy(dataset)))
+    assert as_json(columnar) == as_json(full)
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+"""调度器：导入的库模块不抢先配置日志"""
+
+import os
+import subprocess
+import sys
+
+from conftest import SCRIPTS_DIR
+
+
+def test_scheduler_logging_config(workdir):
+    # 在子进程中导入，避免测试进程中已有的日志处理器使 basicConfig 失效
+    code = (
+        "import logging, scheduler\n"
+        "print(sorted(type(h).__name__ for h in logging.getLogger().handlers))\n"
+    )
+    env = {**os.environ, "PYTHONPATH": SCRIPTS_DIR}
+    output = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True).stdout
+    assert output.strip() == "['FileHandler', 'StreamHandler']"
+    assert (workdir / "logs" / "scheduler.log").exists()
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""获取结果未变化时的短路：清理后获取指纹仍然保留"""
+
+import json
+
+import fetch_trending
+from cleanup_data import DataCleanup
+from fetch_trending import GitHubTrendingFetcher
+
+
+def read_metadata(workdir):
+    with open(workdir / "data" / "trending.json", encoding="utf-8") as f:
+        return json.load(f)["metadata"]
+
+
+def test_cleanup_keeps_fetch_fingerprint(workdir, mock_server):
+    fetcher = GitHubTrendingFetcher(base_url=mock_server.base_url)
+    assert fetcher.save_to_file(fetcher.fetch_trending_repositories(), upsert=True)
+    fingerprint = read_metadata(workdir)["fetch_fingerprint"]
+
+    cleanup = DataCleanup()
+    assert cleanup.cleanup_trending_data(max_days=30, max_items=10)
+    assert read_metadata(workdir)["cleaned_count"] == 10
+    assert read_metadata(workdir)["fetch_fingerprint"] == fingerprint
+
+    assert cleanup.cleanup_trending_data_stream(max_days=30, max_items=5)
+    assert read_metadata(workdir)["fetch_fingerprint"] == fingerprint
+
+    refetched = fetcher.fetch_trending_repositories()
+    assert fetcher.is_unchanged(refetched, fetcher.load_existing_data())
+
+
+def test_pipeline_short_circuits_second_run(workdir, mock_server, monkeypatch):
+    # scheduler 导入时在 ../logs 下创建日志文件，需在切换到临时目录后导入
+    from scheduler import DataScheduler
+
+    defaults = GitHubTrendingFetcher.__init__.__defaults__
+    monkeypatch.setattr(fetch_trending.GitHubTrendingFetcher.__init__, "__defaults__",
+                        (mock_server.base_url,) + defaults[1:])
+    scheduler = DataScheduler(pipeline="inprocess")
+
+    assert scheduler.run_pipeline()
+    first = read_metadata(workdir)
+    assert first["cleaned"] and first["fetch_fingerprint"]
+
+    assert scheduler.run_pipeline()
+    # 第二次运行在获取后短路，不再合并、处理和写入
+    assert read_metadata(workdir) == first